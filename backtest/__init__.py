@@ -0,0 +1,3 @@
+from backtest.replay import Listing, ReplayEngine, load_listings
+
+__all__ = ["Listing", "ReplayEngine", "load_listings"]
@@ -0,0 +1,241 @@
+"""
+Replays recorded listings through the real Bot on a virtual clock.
+
+    python -m backtest.replay --data data/ticks --broker BINANCE --stop-loss 10 --tsl-percent 5
+"""
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from bot import Bot
+from broker import SimulatedBroker
+from recorder import TickFile
+from util import Config
+from util.models import BrokerType, Order, Sold, Ticker
+
+
+class Listing:
+    """
+    The recorded ticks of one symbol from the moment it was detected
+    """
+
+    def __init__(self, broker: BrokerType, symbol: str, ticks: np.ndarray) -> NoReturn:
+        self.broker = broker
+        self.symbol = symbol
+        self.ticks = ticks
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def __repr__(self) -> str:
+        return f"Listing({self.broker}, {self.symbol}, {len(self)} ticks)"
+
+    @property
+    def listed_at(self) -> datetime:
+        return datetime.fromtimestamp(float(self.ticks["timestamp"][0]))
+
+    def ticker(self, quote_ticker: str) -> Ticker:
+        if "/" in self.symbol:
+            base, quote = self.symbol.split("/", 1)
+        elif self.symbol.endswith(quote_ticker):
+            base, quote = self.symbol[: -len(quote_ticker)], quote_ticker
+        else:
+            base, quote = self.symbol, ""
+        return Ticker(ticker=self.symbol, base_ticker=base, quote_ticker=quote)
+
+
+def find_listings(
+    directory: Path, broker: Optional[BrokerType] = None
+) -> Dict[Tuple[str, str], List[Path]]:
+    """
+    Groups the tick files under directory by (broker, symbol), oldest day first
+    """
+    groups: Dict[Tuple[str, str], List[Path]] = {}
+    for path in sorted(Path(directory).rglob("*.tick")):
+        header = TickFile.read_header(path)
+        if broker is None or header.broker == broker:
+            groups.setdefault((header.broker, header.symbol), []).append(path)
+    return groups
+
+
+def load_listing(broker: BrokerType, symbol: str, paths: List[Path]) -> Listing:
+    arrays = [TickFile.read(p)[1] for p in paths]
+    ticks = arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+    return Listing(broker, symbol, ticks)
+
+
+def load_listings(directory: Path, broker: Optional[BrokerType] = None) -> List[Listing]:
+    """
+    Loads every recorded symbol under directory, joining its day-rotated files.  Ticks are
+    memory-mapped unless a symbol spans several files.
+    """
+    listings = [
+        load_listing(broker_type, symbol, paths)
+        for (broker_type, symbol), paths in find_listings(directory, broker).items()
+    ]
+    listings = [l for l in listings if len(l) > 0]
+    return sorted(listings, key=lambda l: float(l.ticks["timestamp"][0]))
+
+
+class ListingResult(BaseModel):
+    broker: str
+    symbol: str
+    listed_at: datetime
+    ticks: int
+    entry: Optional[Order]
+    sold: List[Sold]
+    fees: float
+    pnl: float
+    pnl_percent: float
+
+
+class ReplayEngine:
+    """
+    Drives Bot.check_new_tickers / Bot.update_open_orders (and through them
+    process_new_ticker, update and close_trade) with a SimulatedBroker.  Each listing gets
+    a fresh Bot with its state files in a temporary directory.
+
+    detection_delay: seconds between the first recorded tick and the buy
+    poll_interval: minimum virtual seconds between exit checks, 0 checks on every tick
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        broker_type: BrokerType = "BINANCE",
+        fee_percent: float = 0.0,
+        slippage_percent: float = 0.0,
+        detection_delay: float = 0.0,
+        poll_interval: float = 0.0,
+        quiet: bool = True,
+    ) -> NoReturn:
+        self.config = config
+        self.broker_type = broker_type
+        self.fee_percent = fee_percent
+        self.slippage_percent = slippage_percent
+        self.detection_delay = detection_delay
+        self.poll_interval = poll_interval
+        self.quiet = quiet
+
+    def run(self, listings: List[Listing]) -> List[ListingResult]:
+        test, Config.TEST = Config.TEST, True
+        if self.quiet:
+            logging.disable(logging.CRITICAL)
+        try:
+            return [self.replay(listing) for listing in listings]
+        finally:
+            Config.TEST = test
+            if self.quiet:
+                logging.disable(logging.NOTSET)
+
+    def replay(self, listing: Listing) -> ListingResult:
+        broker = SimulatedBroker(
+            self.broker_type,
+            fee_percent=self.fee_percent,
+            slippage_percent=self.slippage_percent,
+        )
+        ticker = listing.ticker(self.config.QUOTE_TICKER)
+        timestamps = listing.ticks["timestamp"]
+        prices = listing.ticks["price"]
+
+        with tempfile.TemporaryDirectory() as state_dir:
+            bot = Bot(
+                self.broker_type, client=broker, config=self.config, state_dir=Path(state_dir)
+            )
+
+            start = int(np.searchsorted(timestamps, timestamps[0] + self.detection_delay))
+            entry = None
+            if start < len(listing):
+                broker.set_time(float(timestamps[start]))
+                broker.list_ticker(ticker, float(prices[start]))
+                bot.check_new_tickers()
+                entry = bot.open_orders.get(ticker.ticker)
+
+            next_check = float(timestamps[min(start, len(listing) - 1)]) + self.poll_interval
+            for i in range(start + 1, len(listing)):
+                if len(bot.open_orders) == 0:
+                    break
+                if timestamps[i] < next_check:
+                    continue
+                next_check = float(timestamps[i]) + self.poll_interval
+
+                broker.set_time(float(timestamps[i]))
+                broker.set_price(ticker.ticker, float(prices[i]))
+                bot.update_open_orders()
+
+            # mark anything still open to the last recorded price
+            for order in list(bot.open_orders.values()):
+                bot.close_trade(order, float(prices[-1]), order.price, "END_OF_REPLAY")
+
+        sold = list(bot.sold.values())
+        cost = entry.price * entry.size if entry is not None else 0.0
+        pnl = sum(s.price * s.size for s in sold) - cost - broker.fees
+
+        return ListingResult(
+            broker=listing.broker,
+            symbol=listing.symbol,
+            listed_at=listing.listed_at,
+            ticks=len(listing),
+            entry=entry,
+            sold=sold,
+            fees=broker.fees,
+            pnl=pnl,
+            pnl_percent=pnl / cost * 100 if cost else 0.0,
+        )
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", type=Path, default=Config.RECORDER_DIR)
+    parser.add_argument("--broker", default="BINANCE")
+    parser.add_argument("--quote", default="USDT")
+    parser.add_argument("--quantity", type=float, default=30)
+    parser.add_argument("--stop-loss", type=float, default=20)
+    parser.add_argument("--take-profit", type=float, default=30)
+    parser.add_argument("--disable-tsl", action="store_true")
+    parser.add_argument("--tsl-activation", type=float, default=35)
+    parser.add_argument("--tsl-percent", type=float, default=10)
+    parser.add_argument("--fee", type=float, default=0.1, help="percent per fill")
+    parser.add_argument("--slippage", type=float, default=0.0, help="percent per fill")
+    parser.add_argument("--delay", type=float, default=0.0, help="detection delay, seconds")
+    parser.add_argument("--poll", type=float, default=0.0, help="exit check interval, seconds")
+    args = parser.parse_args()
+
+    config = Config.offline(
+        args.broker,
+        QUOTE_TICKER=args.quote,
+        QUANTITY=args.quantity,
+        STOP_LOSS_PERCENT=args.stop_loss,
+        TAKE_PROFIT_PERCENT=args.take_profit,
+        ENABLE_TRAILING_STOP_LOSS=not args.disable_tsl,
+        TRAILING_STOP_LOSS_ACTIVATION=args.tsl_activation,
+        TRAILING_STOP_LOSS_PERCENT=args.tsl_percent,
+    )
+    engine = ReplayEngine(
+        config,
+        args.broker,
+        fee_percent=args.fee,
+        slippage_percent=args.slippage,
+        detection_delay=args.delay,
+        poll_interval=args.poll,
+    )
+    results = engine.run(load_listings(args.data, args.broker))
+
+    print(f"{'listed':<20} {'symbol':<14} {'ticks':>8} {'reason':<24} {'pnl':>10} {'pnl %':>8}")
+    for r in results:
+        reason = ",".join(s.reason for s in r.sold) or "NOT_BOUGHT"
+        print(
+            f"{r.listed_at:%Y-%m-%d %H:%M:%S}  {r.symbol:<14} {r.ticks:>8} {reason:<24} "
+            f"{r.pnl:>10.4f} {r.pnl_percent:>8.2f}"
+        )
+    print(f"TOTAL PNL: {sum(r.pnl for r in results):.4f} over [{len(results)}] listings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Runs the scheduling logic of main.forever (util.scheduling) on a virtual clock to estimate
+detection delay, weight use and rate limit hits for polling configs, and searches for the
+config with the lowest p95 detection delay that never hits the limit.
+
+    python -m backtest.scheduling --days 1 --frequency 1:10:1 --frontload true,false \\
+        --frontload-start 54:59:1 --frontload-duration 3:12:3 --intervention 60,75,90
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NoReturn, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from backtest.sweep import parse_bools, parse_range
+from util import Config
+from util.scheduling import get_sleep_time, in_frontload
+
+# the Config values the scheduler reads and writes
+SCHEDULER_STATE = [
+    "FREQUENCY_SECONDS",
+    "FRONTLOAD_ENABLED",
+    "FRONTLOAD_START",
+    "FRONTLOAD_DURATION",
+    "RATE_INTERVENTION_PERCENTAGE",
+    "AUTO_INCREASE_FREQUENCY",
+    "AUTO_INCREASE_AMOUNT",
+    "auto_rate_current_weight",
+    "auto_rate_limit",
+    "auto_rate_increased_minute",
+    "auto_rate_base_frequency",
+    "auto_rate_minute",
+    "auto_rate_peak_weight",
+]
+
+# Saturday 2021-12-04 00:00 local time, the date only matters for datetime arithmetic
+EPOCH = datetime(2021, 12, 4).timestamp()
+
+
+class SchedulerConfig(BaseModel):
+    frequency_seconds: int = 5
+    frontload_enabled: bool = True
+    frontload_start: int = 57
+    frontload_duration: int = 7
+    rate_intervention_percentage: float = 75
+    auto_increase_frequency: bool = True
+    auto_increase_amount: int = 1
+
+    def apply(self, rate_limit: int) -> NoReturn:
+        Config.FREQUENCY_SECONDS = self.frequency_seconds
+        Config.FRONTLOAD_ENABLED = self.frontload_enabled
+        Config.FRONTLOAD_START = self.frontload_start
+        Config.FRONTLOAD_DURATION = self.frontload_duration
+        Config.RATE_INTERVENTION_PERCENTAGE = self.rate_intervention_percentage
+        Config.AUTO_INCREASE_FREQUENCY = self.auto_increase_frequency
+        Config.AUTO_INCREASE_AMOUNT = self.auto_increase_amount
+        Config.auto_rate_current_weight = 0
+        Config.auto_rate_limit = rate_limit
+        Config.auto_rate_increased_minute = 0
+        Config.auto_rate_base_frequency = None
+        Config.auto_rate_minute = None
+        Config.auto_rate_peak_weight = 0
+
+    def label(self) -> str:
+        frontload = (
+            f"FL {self.frontload_start}+{self.frontload_duration}" if self.frontload_enabled else "FL off"
+        )
+        auto = f"+{self.auto_increase_amount}" if self.auto_increase_frequency else "fixed"
+        return f"{self.frequency_seconds}s {frontload} RI {self.rate_intervention_percentage:g}% {auto}"
+
+
+class SchedulerResult(BaseModel):
+    config: SchedulerConfig
+    polls: int
+    rejected: int
+    detection_p50: float
+    detection_p95: float
+    detection_max: float
+    mean_utilization: float
+    max_utilization: float
+    limit_hit_minutes: float
+    final_frequency: int
+
+    @property
+    def safe(self) -> bool:
+        return self.rejected == 0
+
+
+def listing_times(
+    days: float, samples: int, distribution: str = "minute", seed: int = 0
+) -> np.ndarray:
+    """
+    Seconds after EPOCH at which symbols go live.  "minute" lists near the start of a minute
+    (the usual exchange behaviour), "uniform" anywhere.
+    """
+    rng = np.random.default_rng(seed)
+    minutes = rng.integers(0, int(days * 1440), samples) * 60.0
+    if distribution == "uniform":
+        return np.sort(minutes + rng.uniform(0, 60, samples))
+    return np.sort(minutes + np.clip(rng.exponential(1.0, samples), 0, 59.9))
+
+
+def simulate(
+    config: SchedulerConfig,
+    days: float = 1.0,
+    rate_limit: int = 1200,
+    poll_weight: int = 10,
+    loop_seconds: float = 0.25,
+    listings: Optional[np.ndarray] = None,
+) -> SchedulerResult:
+    """
+    Each poll costs poll_weight against a per-calendar-minute budget of rate_limit, takes
+    loop_seconds and sees the exchange as it was halfway through.  A poll over the limit is
+    rejected and detects nothing.
+    """
+    saved = {k: getattr(Config, k) for k in SCHEDULER_STATE}
+    level = logging.root.manager.disable
+    logging.disable(logging.CRITICAL)
+    config.apply(rate_limit)
+
+    observed: List[float] = []
+    completed: List[float] = []
+    minute_weight: Dict[int, int] = {}
+    rejected_minutes = set()
+    rejected = 0
+    end = days * 86400
+
+    def poll(t: float) -> float:
+        nonlocal rejected
+        minute = int((EPOCH + t) // 60)
+        weight = minute_weight.get(minute, 0) + poll_weight
+        minute_weight[minute] = weight
+        Config.auto_rate_current_weight = weight
+        if weight > rate_limit:
+            rejected += 1
+            rejected_minutes.add(minute)
+        else:
+            observed.append(t + loop_seconds / 2)
+            completed.append(t + loop_seconds)
+        return t + loop_seconds
+
+    try:
+        t = 0.0
+        while t < end:
+            current = t
+            if Config.FRONTLOAD_ENABLED:
+                while t < end and in_frontload(datetime.fromtimestamp(EPOCH + current)):
+                    t = poll(t)
+                    current = t
+            t = poll(current)
+            t += get_sleep_time(datetime.fromtimestamp(EPOCH + current))
+        final_frequency = Config.FREQUENCY_SECONDS
+    finally:
+        for k, v in saved.items():
+            setattr(Config, k, v)
+        logging.disable(level)
+
+    if listings is None:
+        listings = listing_times(days, 10000)
+    observed_arr, completed_arr = np.array(observed), np.array(completed)
+    idx = np.searchsorted(observed_arr, listings)
+    seen = idx < len(observed_arr)
+    delays = completed_arr[idx[seen]] - listings[seen]
+    if len(delays) == 0:
+        delays = np.array([np.inf])
+
+    minutes = int(np.ceil(end / 60))
+    peaks = np.array(list(minute_weight.values())) / rate_limit
+    return SchedulerResult(
+        config=config,
+        polls=len(completed) + rejected,
+        rejected=rejected,
+        detection_p50=float(np.percentile(delays, 50)),
+        detection_p95=float(np.percentile(delays, 95)),
+        detection_max=float(delays.max()),
+        mean_utilization=float(peaks.sum() / minutes),
+        max_utilization=float(peaks.max()),
+        limit_hit_minutes=len(rejected_minutes) / minutes,
+        final_frequency=final_frequency,
+    )
+
+
+def _simulate_many(configs: List[SchedulerConfig], kwargs: Dict) -> List[SchedulerResult]:
+    return [simulate(c, **kwargs) for c in configs]
+
+
+def search(
+    configs: List[SchedulerConfig], workers: Optional[int] = None, **kwargs
+) -> List[SchedulerResult]:
+    """
+    Simulates every config; safe configs first, then by p95 detection delay
+    """
+    if "listings" not in kwargs:
+        kwargs["listings"] = listing_times(kwargs.get("days", 1.0), 10000)
+    workers = min(workers or os.cpu_count() or 1, len(configs))
+    if workers <= 1:
+        results = _simulate_many(configs, kwargs)
+    else:
+        batches = [configs[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(
+                itertools.chain.from_iterable(pool.map(_simulate_many, batches, [kwargs] * workers))
+            )
+    return sorted(results, key=lambda r: (not r.safe, r.detection_p95, r.mean_utilization))
+
+
+def grid(
+    frequency: List[float],
+    frontload: List[bool],
+    frontload_start: List[float],
+    frontload_duration: List[float],
+    intervention: List[float],
+    auto_increase: List[bool],
+    auto_increase_amount: List[float],
+) -> List[SchedulerConfig]:
+    configs = set()
+    for f, fl, start, duration, ri, auto, amount in itertools.product(
+        frequency, frontload, frontload_start, frontload_duration, intervention, auto_increase,
+        auto_increase_amount,
+    ):
+        # settings that have no effect are collapsed
+        configs.add(
+            (
+                int(f), fl, int(start) if fl else 57, int(duration) if fl else 7, ri, auto,
+                int(amount) if auto else 1,
+            )
+        )
+    keys = list(SchedulerConfig.__fields__)
+    return [SchedulerConfig(**dict(zip(keys, c))) for c in sorted(configs)]
+
+
+def table(results: List[SchedulerResult], top: int = 25) -> str:
+    lines = [
+        f"{'config':<34}{'p50 s':>8}{'p95 s':>8}{'max s':>8}{'util':>7}{'peak':>7}"
+        f"{'limit min':>10}{'rejected':>10}{'freq':>6}"
+    ]
+    for r in results[:top]:
+        lines.append(
+            f"{r.config.label():<34}{r.detection_p50:>8.2f}{r.detection_p95:>8.2f}"
+            f"{r.detection_max:>8.2f}{r.mean_utilization:>7.0%}{r.max_utilization:>7.0%}"
+            f"{r.limit_hit_minutes:>10.1%}{r.rejected:>10}{r.final_frequency:>6}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=int, default=1200)
+    parser.add_argument("--poll-weight", type=int, default=10, help="weight of one ticker poll")
+    parser.add_argument("--loop-seconds", type=float, default=0.25, help="duration of one poll")
+    parser.add_argument("--listings", choices=["minute", "uniform"], default="minute")
+    parser.add_argument("--frequency", type=parse_range, default=[1, 2, 3, 5, 8])
+    parser.add_argument("--frontload", type=parse_bools, default=[True, False])
+    parser.add_argument("--frontload-start", type=parse_range, default=[55, 57, 59])
+    parser.add_argument("--frontload-duration", type=parse_range, default=[3, 5, 7, 9])
+    parser.add_argument("--intervention", type=parse_range, default=[75])
+    parser.add_argument("--auto-increase", type=parse_bools, default=[True])
+    parser.add_argument("--auto-increase-amount", type=parse_range, default=[1])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    configs = grid(
+        args.frequency, args.frontload, args.frontload_start, args.frontload_duration,
+        args.intervention, args.auto_increase, args.auto_increase_amount,
+    )
+    results = search(
+        configs,
+        workers=args.workers,
+        days=args.days,
+        rate_limit=args.rate_limit,
+        poll_weight=args.poll_weight,
+        loop_seconds=args.loop_seconds,
+        listings=listing_times(args.days, 10000, args.listings),
+    )
+    print(f"[{len(configs)}] configs over [{args.days}] simulated days")
+    print(table(results, args.top))
+    best = next((r for r in results if r.safe), None)
+    if best is None:
+        print("\nevery config hit the rate limit")
+    else:
+        print(f"\nbest under the limit: {best.config.label()} (p95 {best.detection_p95:.2f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Evaluates every combination of exit settings against every recorded listing.
+
+    python -m backtest.sweep --data data/ticks --stop-loss 5:30:5 --tsl-activation 10:50:10 \
+        --tsl-percent 2:20:2 --take-profit 10:100:10 --tsl true,false --workers 8
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, NoReturn, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backtest.replay import find_listings, load_listing
+from bot.position_book import PRICE_ABOVE_TP, PRICE_BELOW_SL, PRICE_BELOW_TSL
+from recorder import TickFile
+from util import Config
+from util.models import BrokerType
+
+END_OF_REPLAY = 5
+
+# combos x ticks booleans evaluated at once, keeps a worker at a few hundred MB
+CHUNK_CELLS = 4_000_000
+
+
+class Grid:
+    """
+    Columns of exit settings, one row per combination.  Settings that have no effect
+    (TP with the trailing stop loss on, activation/TSL percent with it off) are collapsed
+    so no combination is evaluated twice.
+    """
+
+    def __init__(
+        self,
+        stop_loss: Sequence[float],
+        take_profit: Sequence[float],
+        trailing_stop_loss: Sequence[bool],
+        activation: Sequence[float],
+        trailing_percent: Sequence[float],
+    ) -> NoReturn:
+        rows = set()
+        for enabled in trailing_stop_loss:
+            if enabled:
+                rows.update(
+                    (sl, float("inf"), True, act, tsl)
+                    for sl, act, tsl in itertools.product(stop_loss, activation, trailing_percent)
+                )
+            else:
+                rows.update(
+                    (sl, tp, False, 0.0, 0.0)
+                    for sl, tp in itertools.product(stop_loss, take_profit)
+                )
+        rows = sorted(rows, key=lambda r: (not r[2], r[0], r[1], r[3], r[4]))
+
+        self.stop_loss = np.array([r[0] for r in rows], dtype=np.float64)
+        self.take_profit = np.array([r[1] for r in rows], dtype=np.float64)
+        self.trailing_stop_loss = np.array([r[2] for r in rows], dtype=bool)
+        self.activation = np.array([r[3] for r in rows], dtype=np.float64)
+        self.trailing_percent = np.array([r[4] for r in rows], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.stop_loss)
+
+    def config(self, i: int, broker: BrokerType = "BINANCE", **options) -> Config:
+        enabled = bool(self.trailing_stop_loss[i])
+        return Config.offline(
+            broker,
+            STOP_LOSS_PERCENT=float(self.stop_loss[i]),
+            TAKE_PROFIT_PERCENT=float(self.take_profit[i]),
+            ENABLE_TRAILING_STOP_LOSS=enabled,
+            TRAILING_STOP_LOSS_ACTIVATION=float(self.activation[i]),
+            TRAILING_STOP_LOSS_PERCENT=float(self.trailing_percent[i]),
+            **options,
+        )
+
+
+def percent_change(value, percent):
+    # Util.percent_change, kept here so arrays go through the exact same operations
+    return (percent / 100 * value) + value
+
+
+def check_points(
+    timestamps: np.ndarray, detection_delay: float, poll_interval: float
+) -> np.ndarray:
+    """
+    Indices of the ticks ReplayEngine evaluates: the entry tick first, then every tick
+    at least poll_interval after the previously evaluated one
+    """
+    start = int(np.searchsorted(timestamps, timestamps[0] + detection_delay))
+    if start >= len(timestamps):
+        return np.zeros(0, dtype=np.int64)
+    if poll_interval <= 0:
+        return np.arange(start, len(timestamps))
+
+    points = [start]
+    i = start
+    while True:
+        i = int(np.searchsorted(timestamps, timestamps[i] + poll_interval, side="left"))
+        if i <= points[-1]:
+            i = points[-1] + 1
+        if i >= len(timestamps):
+            break
+        points.append(i)
+    return np.array(points, dtype=np.int64)
+
+
+def evaluate_path(
+    prices: np.ndarray,
+    grid: Grid,
+    quantity: float,
+    fee_percent: float = 0.0,
+    slippage_percent: float = 0.0,
+    last_price: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Vectorized Bot._update over a whole price path for every grid row at once.
+    prices[0] is the entry tick.  Returns (pnl, exit index into prices, reason code).
+    """
+    last_price = prices[-1] if last_price is None else last_price
+    n = len(grid)
+    pnl = np.zeros(n)
+    exit_index = np.full(n, -1, dtype=np.int64)
+    reason = np.full(n, END_OF_REPLAY, dtype=np.int8)
+
+    entry = percent_change(prices[0], slippage_percent)
+    size = quantity / entry
+    path = prices[1:]
+    steps = max(len(path), 1)
+    chunk = max(CHUNK_CELLS // steps, 1)
+
+    for lo in range(0, n, chunk):
+        hi = min(lo + chunk, n)
+        sl = percent_change(entry, -grid.stop_loss[lo:hi])[:, None]
+        tp = percent_change(entry, grid.take_profit[lo:hi])[:, None]
+        act = percent_change(entry, grid.activation[lo:hi])[:, None]
+        tsl_pct = grid.trailing_percent[lo:hi][:, None]
+        enabled = grid.trailing_stop_loss[lo:hi][:, None]
+        rows = hi - lo
+
+        never = np.full(rows, len(path), dtype=np.int64)
+
+        def first(mask: np.ndarray) -> np.ndarray:
+            return np.where(mask.any(axis=1), mask.argmax(axis=1), never)
+
+        sl_at = first(path < sl)
+        tp_at = np.where(enabled[:, 0], never, first(path > tp))
+
+        # activation is the first UPDATE_TRAILING_STOP_LOSS; afterwards the trailing max is
+        # the running max of the path (never below the entry price) and a tick sells once it
+        # drops below the stop derived from the max of the ticks before it
+        activated_at = np.where(enabled[:, 0], first(path > act), never)
+        cols = np.arange(len(path))[None, :]
+        running = np.maximum.accumulate(
+            np.where(cols >= activated_at[:, None], np.maximum(path, entry), -np.inf), axis=1
+        )
+        previous_max = np.concatenate(
+            [np.full((rows, 1), -np.inf), running[:, :-1]], axis=1
+        )
+        with np.errstate(invalid="ignore"):
+            # -inf before activation turns into NaN, which never compares true
+            tsl_at = first(
+                (cols > activated_at[:, None])
+                & (path < percent_change(previous_max, -tsl_pct))
+            )
+        # on the same tick the SL wins, as it is the first check in Bot._update
+        at = np.minimum(sl_at, np.minimum(tsl_at, tp_at))
+        ended = at == len(path)
+        code = np.select(
+            [ended, at == sl_at, at == tsl_at],
+            [END_OF_REPLAY, PRICE_BELOW_SL, PRICE_BELOW_TSL],
+            PRICE_ABOVE_TP,
+        )
+        exit_market = np.full(rows, last_price, dtype=np.float64)
+        exit_market[~ended] = path[at[~ended]]
+        exit_price = percent_change(exit_market, -slippage_percent)
+
+        fees = entry * size * fee_percent / 100 + exit_price * size * fee_percent / 100
+        pnl[lo:hi] = exit_price * size - entry * size - fees
+        exit_index[lo:hi] = np.where(ended, -1, at + 1)
+        reason[lo:hi] = code
+
+    return pnl, exit_index, reason
+
+
+def _evaluate_listings(
+    jobs: List[Tuple[str, str, List[str]]],
+    grid: Grid,
+    quantity: float,
+    fee_percent: float,
+    slippage_percent: float,
+    detection_delay: float,
+    poll_interval: float,
+) -> np.ndarray:
+    """
+    Worker body.  Tick files are memory-mapped here, so every worker reads the same
+    page-cache pages instead of receiving pickled copies.
+    """
+    out = np.zeros((len(grid), len(jobs)))
+    for j, (broker, symbol, paths) in enumerate(jobs):
+        listing = load_listing(broker, symbol, [Path(p) for p in paths])
+        points = check_points(listing.ticks["timestamp"], detection_delay, poll_interval)
+        if len(points) == 0:
+            continue
+        prices = np.ascontiguousarray(listing.ticks["price"][points])
+        out[:, j] = evaluate_path(
+            prices,
+            grid,
+            quantity,
+            fee_percent,
+            slippage_percent,
+            last_price=float(listing.ticks["price"][-1]),
+        )[0]
+    return out
+
+
+class SweepResult:
+    def __init__(self, grid: Grid, listings: List[str], pnl: np.ndarray, quantity: float) -> NoReturn:
+        self.grid = grid
+        self.listings = listings
+        # combos x listings
+        self.pnl = pnl
+
+        equity = np.cumsum(pnl, axis=1)
+        peak = np.maximum.accumulate(np.maximum(equity, 0), axis=1)
+        self.total = pnl.sum(axis=1)
+        self.mean_percent = pnl.mean(axis=1) / quantity * 100 if pnl.shape[1] else np.zeros(len(grid))
+        self.max_drawdown = (peak - equity).max(axis=1) if pnl.shape[1] else np.zeros(len(grid))
+        self.hit_rate = (pnl > 0).mean(axis=1) if pnl.shape[1] else np.zeros(len(grid))
+
+    def ranked(self) -> np.ndarray:
+        return np.lexsort((self.max_drawdown, -self.total))
+
+    def table(self, top: Optional[int] = None) -> str:
+        lines = [
+            f"{'rank':>4} {'SL %':>6} {'TP %':>6} {'TSL':>5} {'ACT %':>6} {'TSL %':>6} "
+            f"{'total pnl':>11} {'avg %':>8} {'max dd':>9} {'hit rate':>8}"
+        ]
+        g = self.grid
+        for rank, i in enumerate(self.ranked()[:top], 1):
+            lines.append(
+                f"{rank:>4} {g.stop_loss[i]:>6g} {g.take_profit[i]:>6g} {str(g.trailing_stop_loss[i]):>5} "
+                f"{g.activation[i]:>6g} {g.trailing_percent[i]:>6g} {self.total[i]:>11.4f} "
+                f"{self.mean_percent[i]:>8.2f} {self.max_drawdown[i]:>9.4f} {self.hit_rate[i]:>8.1%}"
+            )
+        return "\n".join(lines)
+
+    def to_csv(self, file: Path) -> NoReturn:
+        g = self.grid
+        with open(file, "w") as f:
+            f.write("stop_loss,take_profit,trailing_stop_loss,activation,trailing_percent,"
+                    "total_pnl,mean_pnl_percent,max_drawdown,hit_rate\n")
+            for i in self.ranked():
+                f.write(
+                    f"{g.stop_loss[i]},{g.take_profit[i]},{g.trailing_stop_loss[i]},{g.activation[i]},"
+                    f"{g.trailing_percent[i]},{self.total[i]},{self.mean_percent[i]},"
+                    f"{self.max_drawdown[i]},{self.hit_rate[i]}\n"
+                )
+
+
+def sweep(
+    directory: Path,
+    grid: Grid,
+    broker: Optional[BrokerType] = None,
+    quantity: float = 30,
+    fee_percent: float = 0.0,
+    slippage_percent: float = 0.0,
+    detection_delay: float = 0.0,
+    poll_interval: float = 0.0,
+    workers: Optional[int] = None,
+) -> SweepResult:
+    groups = find_listings(directory, broker)
+    # chronological order, so the drawdown follows the equity curve
+    jobs = sorted(
+        ((b, s, [str(p) for p in paths]) for (b, s), paths in groups.items()),
+        key=lambda job: _first_timestamp(job[2][0]),
+    )
+    workers = workers or os.cpu_count() or 1
+    args = (grid, quantity, fee_percent, slippage_percent, detection_delay, poll_interval)
+
+    if workers == 1 or len(jobs) <= 1:
+        pnl = _evaluate_listings(jobs, *args)
+    else:
+        batches = [jobs[i::workers] for i in range(workers)]
+        pnl = np.zeros((len(grid), len(jobs)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_evaluate_listings, batches, *[[a] * workers for a in args])
+            for i, result in enumerate(results):
+                pnl[:, i::workers] = result
+
+    return SweepResult(grid, [f"{b}:{s}" for b, s, _ in jobs], pnl, quantity)
+
+
+def _first_timestamp(path: str) -> float:
+    ticks = TickFile.read(path)[1]
+    return float(ticks["timestamp"][0]) if len(ticks) else 0.0
+
+
+def parse_range(value: str) -> List[float]:
+    """
+    "5:30:5" -> 5, 10, ... 30 (inclusive), "5,7.5,10" -> 5, 7.5, 10
+    """
+    if ":" in value:
+        start, stop, step = (float(v) for v in value.split(":"))
+        return [round(v, 10) for v in np.arange(start, stop + step / 2, step)]
+    return [float(v) for v in value.split(",")]
+
+
+def parse_bools(value: str) -> List[bool]:
+    return [v.strip().lower() in ["true", "1", "yes", "on"] for v in value.split(",")]
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", type=Path, default=Config.RECORDER_DIR)
+    parser.add_argument("--broker", default=None)
+    parser.add_argument("--quantity", type=float, default=30)
+    parser.add_argument("--stop-loss", type=parse_range, default=[20])
+    parser.add_argument("--take-profit", type=parse_range, default=[30])
+    parser.add_argument("--tsl", type=parse_bools, default=[True])
+    parser.add_argument("--tsl-activation", type=parse_range, default=[35])
+    parser.add_argument("--tsl-percent", type=parse_range, default=[10])
+    parser.add_argument("--fee", type=float, default=0.1, help="percent per fill")
+    parser.add_argument("--slippage", type=float, default=0.0, help="percent per fill")
+    parser.add_argument("--delay", type=float, default=0.0, help="detection delay, seconds")
+    parser.add_argument("--poll", type=float, default=0.0, help="exit check interval, seconds")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--csv", type=Path, default=None)
+    args = parser.parse_args()
+
+    grid = Grid(args.stop_loss, args.take_profit, args.tsl, args.tsl_activation, args.tsl_percent)
+    result = sweep(
+        args.data,
+        grid,
+        broker=args.broker,
+        quantity=args.quantity,
+        fee_percent=args.fee,
+        slippage_percent=args.slippage,
+        detection_delay=args.delay,
+        poll_interval=args.poll,
+        workers=args.workers,
+    )
+    print(f"[{len(grid)}] combinations x [{len(result.listings)}] listings")
+    print(result.table(args.top))
+    if args.csv is not None:
+        result.to_csv(args.csv)
+
+
+if __name__ == "__main__":
+    main()
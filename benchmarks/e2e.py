@@ -0,0 +1,218 @@
+"""
+Listing-to-order latency of the real main.forever loop against a local MockExchange.
+
+    python -m benchmarks.e2e --brokers BINANCE FTX --frequency 1 5 --frontload on off \\
+        --output data/benchmarks/e2e.json --compare data/benchmarks/e2e_baseline.json
+
+Detection is the time from a symbol going live on the mock exchange to the bot seeing it
+(EntryTrace.observed).  Order is the time until the buy request reaches the exchange, as
+timestamped by the exchange.  In TEST mode FTX never sends the buy request, so its order
+column falls back to EntryTrace.sent.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NoReturn, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from benchmarks.mock_exchange import MockExchange
+from bot import Bot
+from broker.broker import Binance, FTX
+from main import forever
+from util import Config
+
+PERCENTILES = [50, 90, 100]
+
+
+class Scenario(BaseModel):
+    broker: str
+    frequency_seconds: int
+    frontload: bool
+
+    @property
+    def name(self) -> str:
+        return f"{self.broker}-{self.frequency_seconds}s-{'frontload' if self.frontload else 'standard'}"
+
+
+class ScenarioResult(BaseModel):
+    scenario: Scenario
+    listings: int
+    detection_ms: List[float]
+    order_ms: List[float]
+    loops: int
+    rejected: int
+
+    def percentiles(self, values: List[float]) -> List[Optional[float]]:
+        if not values:
+            return [None] * len(PERCENTILES)
+        return [float(v) for v in np.percentile(values, PERCENTILES)]
+
+    def summary(self) -> Dict:
+        return {
+            "detected": len(self.detection_ms),
+            "ordered": len(self.order_ms),
+            **{f"detection_p{p}": v for p, v in zip(PERCENTILES, self.percentiles(self.detection_ms))},
+            **{f"order_p{p}": v for p, v in zip(PERCENTILES, self.percentiles(self.order_ms))},
+        }
+
+
+def make_client(broker: str, exchange: MockExchange):
+    if broker == "FTX":
+        return FTX(subaccount=None, key="bench", secret="bench", api_url=exchange.url("FTX"))
+    return Binance(subaccount="", key="bench", secret="bench", api_url=exchange.url("BINANCE"))
+
+
+async def _run_for(bots: List[Bot], seconds: float) -> NoReturn:
+    try:
+        await asyncio.wait_for(forever(bots), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+def run_scenario(
+    scenario: Scenario,
+    listings: int = 5,
+    spacing: float = 7,
+    lead: float = 3,
+    existing_tickers: int = 200,
+    quiet: bool = True,
+) -> ScenarioResult:
+    exchange = MockExchange(
+        listings=[(lead + i * spacing, f"NEW{i}") for i in range(listings)],
+        existing_tickers=existing_tickers,
+    ).start()
+
+    saved = {
+        k: getattr(Config, k)
+        for k in [
+            "TEST", "PAPER_TRADING", "RECORDER_ENABLED", "FREQUENCY_SECONDS", "FRONTLOAD_ENABLED",
+            "AUTO_INCREASE_FREQUENCY", "auto_rate_current_weight", "total_iter", "total_time",
+        ]
+    }
+    Config.TEST = True
+    Config.PAPER_TRADING = False
+    Config.RECORDER_ENABLED = False
+    Config.FREQUENCY_SECONDS = scenario.frequency_seconds
+    Config.FRONTLOAD_ENABLED = scenario.frontload
+    Config.AUTO_INCREASE_FREQUENCY = False
+    Config.auto_rate_current_weight = 0
+    Config.total_iter = 0
+    if quiet:
+        logging.disable(logging.CRITICAL)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            bot = Bot(
+                scenario.broker,
+                client=make_client(scenario.broker, exchange),
+                config=Config.offline(scenario.broker),
+                state_dir=Path(tmp),
+            )
+            duration = lead + (listings - 1) * spacing + scenario.frequency_seconds + 5
+            asyncio.run(_run_for([bot], duration))
+            loops = Config.total_iter
+    finally:
+        for k, v in saved.items():
+            setattr(Config, k, v)
+        if quiet:
+            logging.disable(logging.NOTSET)
+        exchange.stop()
+
+    arrivals = {}
+    for received, _, symbol, side in exchange.orders:
+        if side.upper() == "BUY":
+            arrivals.setdefault(symbol, received)
+
+    detection, order = [], []
+    for base, listed_at in exchange.listed_at.items():
+        symbol = exchange.symbol(scenario.broker, base)
+        position = bot.open_orders.get(symbol) or bot.sold.get(symbol)
+        if position is None or position.entry_trace is None:
+            continue
+        trace = position.entry_trace
+        detection.append((trace.observed.timestamp() - listed_at) * 1000)
+        if symbol in arrivals:
+            order.append((arrivals[symbol] - listed_at) * 1000)
+        elif trace.sent is not None:
+            order.append((trace.sent.timestamp() - listed_at) * 1000)
+
+    return ScenarioResult(
+        scenario=scenario,
+        listings=len(exchange.listed_at),
+        detection_ms=detection,
+        order_ms=order,
+        loops=loops,
+        rejected=exchange.rejected,
+    )
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:>9.1f}" if value is not None else f"{'-':>9}"
+
+
+def report(results: List[ScenarioResult], baseline: Optional[Dict[str, Dict]] = None) -> str:
+    columns = [f"detection_p{p}" for p in PERCENTILES] + [f"order_p{p}" for p in PERCENTILES]
+    lines = [f"{'scenario':<28}{'found':>7}{'loops':>7}" + "".join(f"{c:>15}" for c in columns)]
+    for r in results:
+        summary = r.summary()
+        line = f"{r.scenario.name:<28}{summary['detected']:>3}/{r.listings:<3}{r.loops:>7}"
+        for c in columns:
+            cell = _fmt(summary[c])
+            old = (baseline or {}).get(r.scenario.name, {}).get(c)
+            if old is not None and summary[c] is not None:
+                cell += f"({summary[c] - old:+.0f})"
+            line += f"{cell:>15}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--brokers", nargs="+", default=["BINANCE", "FTX"])
+    parser.add_argument("--frequency", nargs="+", type=int, default=[1, 5])
+    parser.add_argument("--frontload", nargs="+", choices=["on", "off"], default=["off"])
+    parser.add_argument("--listings", type=int, default=5)
+    parser.add_argument("--spacing", type=float, default=7, help="seconds between listings")
+    parser.add_argument("--existing", type=int, default=200, help="symbols listed before start")
+    parser.add_argument("--output", type=Path, default=Config.ROOT_DIR.joinpath("data", "benchmarks", "e2e.json"))
+    parser.add_argument("--compare", type=Path, help="previous --output to diff against")
+    args = parser.parse_args()
+
+    results = []
+    for broker in args.brokers:
+        for frequency in args.frequency:
+            for frontload in args.frontload:
+                scenario = Scenario(broker=broker, frequency_seconds=frequency, frontload=frontload == "on")
+                print(f"running {scenario.name}..", flush=True)
+                results.append(
+                    run_scenario(scenario, args.listings, args.spacing, existing_tickers=args.existing)
+                )
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)["summary"]
+    print(report(results, baseline))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "created": datetime.now().isoformat(),
+                "summary": {r.scenario.name: r.summary() for r in results},
+                "results": [json.loads(r.json()) for r in results],
+            },
+            f,
+            indent=2,
+        )
+    print(f"saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
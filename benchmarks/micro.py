@@ -0,0 +1,291 @@
+"""
+Times the bot's hot functions on synthetic fixtures and compares them against a stored
+baseline.
+
+    python -m benchmarks.micro --save              # record a baseline
+    python -m benchmarks.micro --check             # exit 1 on any regression
+    python -m benchmarks.micro --check -k update   # only benchmarks containing "update"
+
+Timings are divided by a fixed pure-Python calibration loop before being compared, so a
+baseline taken on one machine stays roughly meaningful on another.  Still, re-save the
+baseline when moving to different hardware.
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NoReturn, Tuple
+
+from bot import Bot
+from broker import SimulatedBroker
+from broker.broker import Binance, FTX
+from notification.notification import pretty_format_close, pretty_format_entry
+from util import Config, Util
+from util.models import EntryTrace, ExitTrace, Order, Sold, Ticker
+
+BASELINE = Config.ROOT_DIR.joinpath("data", "benchmarks", "micro_baseline.json")
+
+
+# fixtures
+def binance_exchange_info(n: int, quote: str = "USDT") -> Dict:
+    quotes = [quote, "BTC", "ETH", "BNB"]
+    return {
+        "rateLimits": [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "limit": 1200}],
+        "symbols": [
+            {
+                "symbol": f"COIN{i}{quotes[i % 4]}",
+                "status": "TRADING",
+                "baseAsset": f"COIN{i}",
+                "quoteAsset": quotes[i % 4],
+                "isSpotTradingAllowed": i % 10 != 0,
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": "0.00010000"},
+                    {"filterType": "PERCENT_PRICE", "multiplierUp": "5"},
+                    {"filterType": "LOT_SIZE", "stepSize": "0.01000000"},
+                    {"filterType": "MIN_NOTIONAL", "minNotional": "10.00000000"},
+                ],
+            }
+            for i in range(n)
+        ],
+    }
+
+
+def ftx_markets(n: int, quote: str = "USDT") -> List[Dict]:
+    quotes = [quote, "USD", "BTC"]
+    return [
+        {
+            "name": f"COIN{i}/{quotes[i % 3]}",
+            "type": "spot" if i % 5 else "future",
+            "enabled": True,
+            "baseCurrency": f"COIN{i}",
+            "quoteCurrency": quotes[i % 3],
+        }
+        for i in range(n)
+    ]
+
+
+def make_order(i: int, rnd: random.Random, broker: str = "BINANCE") -> Order:
+    price = rnd.uniform(0.01, 1000)
+    now = datetime.now()
+    return Order(
+        broker=broker,
+        ticker=Ticker(ticker=f"COIN{i}USDT", base_ticker=f"COIN{i}", quote_ticker="USDT"),
+        purchase_datetime=now,
+        price=price,
+        side="BUY",
+        size=30 / price,
+        type="market",
+        status="TEST_MODE",
+        take_profit=Util.percent_change(price, 30),
+        stop_loss=Util.percent_change(price, -20),
+        trailing_stop_loss_activated=False,
+        trailing_stop_loss_max=Util.percent_change(price, 35),
+        trailing_stop_loss=Util.percent_change(price, -10),
+        entry_trace=EntryTrace(observed=now, decided=now, sent=now, acked=now, filled=now),
+    )
+
+
+def make_sold(order: Order) -> Sold:
+    return Sold(
+        **order.dict(),
+        profit=1.0,
+        profit_percent=3.3,
+        reason="PRICE_BELOW_SL",
+        sold_datetime=order.purchase_datetime,
+        exit_trace=ExitTrace(
+            triggered=order.purchase_datetime, sent=order.purchase_datetime, acked=order.purchase_datetime
+        ),
+    )
+
+
+def make_bot(n_tickers: int, n_orders: int, state_dir: Path) -> Bot:
+    broker = SimulatedBroker("BINANCE")
+    rnd = random.Random(0)
+    for i in range(n_tickers):
+        broker.list_ticker(
+            Ticker(ticker=f"COIN{i}USDT", base_ticker=f"COIN{i}", quote_ticker="USDT"),
+            rnd.uniform(0.01, 1000),
+        )
+    bot = Bot("BINANCE", client=broker, config=Config.offline("BINANCE"), state_dir=state_dir)
+    bot.open_orders = {f"COIN{i}USDT": make_order(i, rnd) for i in range(n_orders)}
+    return bot
+
+
+def offline_binance(exchange_info: Dict) -> Binance:
+    """
+    Binance instance that answers exchangeInfo from a fixture instead of the API
+    """
+    binance = Binance.__new__(Binance)
+    binance.brokerType = "BINANCE"
+    binance.session = None
+    binance.get_exchange_info = lambda: exchange_info
+    return binance
+
+
+# benchmarks, each returns a no-argument callable to time
+def bench_get_new_tickers(n: int, tmp: Path) -> Callable:
+    bot = make_bot(n, 0, tmp)
+    seen = dict(bot.ticker_seen_dict)
+    for i in range(0, n, max(n // 5, 1)):
+        seen.pop(f"COIN{i}USDT")
+
+    def run():
+        bot.ticker_seen_dict = dict(seen)
+        bot.get_new_tickers()
+
+    return run
+
+
+def bench_binance_parse_tickers(n: int, tmp: Path) -> Callable:
+    info = binance_exchange_info(n)
+    return lambda: Binance.parse_tickers(info, "USDT")
+
+
+def bench_ftx_parse_tickers(n: int, tmp: Path) -> Callable:
+    markets = ftx_markets(n)
+    return lambda: FTX.parse_tickers(markets, "USDT")
+
+
+def bench_evaluate(n: int, tmp: Path) -> Callable:
+    bot = make_bot(n, n, tmp)
+    orders = list(bot.open_orders.values())
+    return lambda: [bot._update(o, o.price) for o in orders]
+
+
+def bench_update(n: int, tmp: Path) -> Callable:
+    bot = make_bot(n, n, tmp)
+    items = list(bot.open_orders.items())
+    return lambda: [bot.update(k, o, current_price=o.price) for k, o in items]
+
+
+def bench_dump_json(n: int, tmp: Path) -> Callable:
+    rnd = random.Random(0)
+    history = [{f"COIN{i}USDT": make_order(i, rnd)} for i in range(n)]
+    path = tmp.joinpath("order_history.json")
+    return lambda: Util.dump_json(path, history)
+
+
+def bench_load_json(n: int, tmp: Path) -> Callable:
+    rnd = random.Random(0)
+    path = tmp.joinpath("load_order_history.json")
+    Util.dump_json(path, [{f"COIN{i}USDT": make_order(i, rnd)} for i in range(n)])
+    return lambda: Util.load_json(path, Order)
+
+
+def bench_binance_convert_size(n: int, tmp: Path) -> Callable:
+    binance = offline_binance(binance_exchange_info(1))
+    config = Config.offline("BINANCE")
+    ticker = Ticker(ticker="COIN0USDT", base_ticker="COIN0", quote_ticker="USDT")
+    return lambda: [binance.convert_size(config, ticker, 1.2345) for _ in range(n)]
+
+
+def bench_format_entry(n: int, tmp: Path) -> Callable:
+    rnd = random.Random(0)
+    orders = [make_order(i, rnd) for i in range(n)]
+    return lambda: [pretty_format_entry(o) for o in orders]
+
+
+def bench_format_close(n: int, tmp: Path) -> Callable:
+    rnd = random.Random(0)
+    sold = [make_sold(make_order(i, rnd)) for i in range(n)]
+    return lambda: [pretty_format_close(s) for s in sold]
+
+
+BENCHMARKS: List[Tuple[str, Callable, List[int]]] = [
+    ("get_new_tickers", bench_get_new_tickers, [2000, 20000]),
+    ("binance_parse_tickers", bench_binance_parse_tickers, [2000, 20000]),
+    ("ftx_parse_tickers", bench_ftx_parse_tickers, [2000, 20000]),
+    ("evaluate", bench_evaluate, [1, 50, 500]),
+    ("update", bench_update, [1, 50, 500]),
+    ("dump_json", bench_dump_json, [10000]),
+    ("load_json", bench_load_json, [10000]),
+    ("binance_convert_size", bench_binance_convert_size, [100]),
+    ("format_entry", bench_format_entry, [100]),
+    ("format_close", bench_format_close, [100]),
+]
+
+
+def calibrate() -> float:
+    return min(timeit.repeat("sum(i * i for i in range(10000))", number=20, repeat=5)) / 20
+
+
+def time_call(fn: Callable, budget: float = 0.2, repeat: int = 5) -> float:
+    """
+    Best per-call time over repeat rounds of about budget / repeat seconds each
+    """
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(int(number * budget / repeat / max(elapsed, 1e-9)), 1)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(selected: str = "") -> Dict[str, float]:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, factory, sizes in BENCHMARKS:
+            for n in sizes:
+                key = f"{name}[{n}]"
+                if selected and selected not in key:
+                    continue
+                results[key] = time_call(factory(n, Path(tmp)))
+                print(f"{key:<32}{results[key] * 1e6:>14.1f} us", flush=True)
+    return results
+
+
+def compare(
+    results: Dict[str, float], calibration: float, baseline: Dict, tolerance: float
+) -> List[str]:
+    """
+    Names of the benchmarks slower than the baseline by more than tolerance percent
+    """
+    regressions = []
+    scale = calibration / baseline["calibration"]
+    print(f"\n{'benchmark':<32}{'baseline':>14}{'now':>14}{'change':>10}")
+    for key, value in results.items():
+        if key not in baseline["results"]:
+            continue
+        expected = baseline["results"][key] * scale
+        change = (value / expected - 1) * 100
+        flag = " REGRESSION" if change > tolerance else ""
+        print(f"{key:<32}{expected * 1e6:>11.1f} us{value * 1e6:>11.1f} us{change:>+9.1f}%{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=25, help="percent slower allowed")
+    args = parser.parse_args()
+
+    Config.TEST = True
+    calibration = calibrate()
+    results = run(args.k)
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline = {"created": datetime.now().isoformat(), "calibration": calibration, "results": results}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+
+    elif args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, calibration, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.tolerance}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Local HTTP stand-in for the Binance and FTX REST endpoints the bot uses.  Runs on its own
+thread and event loop so the bot's blocking requests never stall it.
+
+    exchange = MockExchange(listings=[(5, "MOON")]).start()
+    Binance(subaccount="", key="k", secret="s", api_url=exchange.url("BINANCE"))
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+from aiohttp import web
+
+# request weights, following Binance's
+WEIGHTS = {"ping": 1, "exchangeInfo": 10, "price": 1, "order": 1, "trades": 1}
+
+
+class MockExchange:
+    """
+    Serves both brokers from one symbol table.  listings are (seconds after start, base ticker)
+    and go live at exactly that time, which is recorded in listed_at.  Every order request is
+    timestamped on arrival in orders.  Binance requests are charged against a per-minute
+    weight budget and answered with the x-mbx-used-weight-1m header, or 429 once it is spent.
+    """
+
+    def __init__(
+        self,
+        listings: Optional[List[Tuple[float, str]]] = None,
+        existing_tickers: int = 200,
+        quote_ticker: str = "USDT",
+        rate_limit: int = 1200,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> NoReturn:
+        self.listings = sorted(listings or [])
+        self.quote_ticker = quote_ticker
+        self.rate_limit = rate_limit
+        self.host = host
+        self.port = port
+
+        self.bases: List[str] = [f"COIN{i}" for i in range(existing_tickers)]
+        self.start_time: Optional[float] = None
+        self.listed_at: Dict[str, float] = {}
+        self.orders: List[Tuple[float, str, str, str]] = []
+        self.used_weight = 0
+        self.rejected = 0
+        self._weight_minute = None
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    # symbols
+    def _list_due(self, now: float) -> NoReturn:
+        while self.listings and self.start_time + self.listings[0][0] <= now:
+            offset, base = self.listings.pop(0)
+            self.bases.append(base)
+            self.listed_at[base] = self.start_time + offset
+
+    def symbol(self, broker: str, base: str) -> str:
+        return f"{base}/{self.quote_ticker}" if broker == "FTX" else f"{base}{self.quote_ticker}"
+
+    @staticmethod
+    def price(base: str) -> float:
+        return 1.0 + (sum(map(ord, base)) % 100) / 10
+
+    def _base(self, symbol: str) -> str:
+        return symbol.replace("/", "")[: -len(self.quote_ticker)]
+
+    # lifecycle
+    def url(self, broker: str) -> str:
+        if broker == "FTX":
+            return f"http://{self.host}:{self.port}/ftx/api/"
+        return f"http://{self.host}:{self.port}/binance/api"
+
+    def start(self) -> "MockExchange":
+        self._thread = threading.Thread(target=self._serve, name="mock-exchange", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> NoReturn:
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _serve(self) -> NoReturn:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes(
+            [
+                web.get("/binance/api/v3/ping", self.binance_ping),
+                web.get("/binance/api/v3/exchangeInfo", self.binance_exchange_info),
+                web.get("/binance/api/v3/ticker/price", self.binance_price),
+                web.get("/binance/api/v3/trades", self.binance_trades),
+                web.post("/binance/api/v3/order/test", self.binance_order),
+                web.post("/binance/api/v3/order", self.binance_order),
+                web.get("/ftx/api/markets", self.ftx_markets),
+                web.get("/ftx/api/markets/{base}/{quote}", self.ftx_market),
+                web.get("/ftx/api/markets/{base}/{quote}/trades", self.ftx_trades),
+                web.post("/ftx/api/orders", self.ftx_order),
+            ]
+        )
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = self._runner.addresses[0][1]
+        self.start_time = time.time()
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.Response:
+        now = time.time()
+        self._list_due(now)
+        request["received"] = now
+
+        if not request.path.startswith("/binance"):
+            return await handler(request)
+
+        minute = int(now // 60)
+        if minute != self._weight_minute:
+            self._weight_minute = minute
+            self.used_weight = 0
+        endpoint = request.path.rsplit("/", 1)[-1]
+        self.used_weight += WEIGHTS.get(endpoint, WEIGHTS["order"])
+        headers = {"x-mbx-used-weight-1m": str(self.used_weight)}
+
+        if self.used_weight > self.rate_limit:
+            self.rejected += 1
+            headers["Retry-After"] = str(int(60 - now % 60) + 1)
+            return web.json_response(
+                {"code": -1003, "msg": "Too many requests"}, status=429, headers=headers
+            )
+
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    # Binance
+    async def binance_ping(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def binance_exchange_info(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "timezone": "UTC",
+                "serverTime": int(request["received"] * 1000),
+                "rateLimits": [
+                    {"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "limit": self.rate_limit}
+                ],
+                "symbols": [
+                    {
+                        "symbol": self.symbol("BINANCE", base),
+                        "status": "TRADING",
+                        "baseAsset": base,
+                        "quoteAsset": self.quote_ticker,
+                        "isSpotTradingAllowed": True,
+                        "filters": [
+                            {"filterType": "PRICE_FILTER", "tickSize": "0.00010000"},
+                            {"filterType": "PERCENT_PRICE", "multiplierUp": "5"},
+                            {"filterType": "LOT_SIZE", "stepSize": "0.01000000"},
+                            {"filterType": "MIN_NOTIONAL", "minNotional": "10.00000000"},
+                        ],
+                    }
+                    for base in self.bases
+                ],
+            }
+        )
+
+    async def binance_price(self, request: web.Request) -> web.Response:
+        symbol = request.query["symbol"]
+        return web.json_response({"symbol": symbol, "price": str(self.price(self._base(symbol)))})
+
+    async def binance_trades(self, request: web.Request) -> web.Response:
+        symbol = request.query["symbol"]
+        return web.json_response(
+            [
+                {
+                    "id": int(request["received"] * 1000),
+                    "price": str(self.price(self._base(symbol))),
+                    "qty": "1",
+                    "time": int(request["received"] * 1000),
+                }
+            ]
+        )
+
+    async def binance_order(self, request: web.Request) -> web.Response:
+        params = await request.post() or request.query
+        self.orders.append((request["received"], "BINANCE", params["symbol"], params["side"]))
+        return web.json_response({})
+
+    # FTX
+    async def ftx_markets(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"success": True, "result": [self._ftx_market(base) for base in self.bases]}
+        )
+
+    async def ftx_market(self, request: web.Request) -> web.Response:
+        return web.json_response({"success": True, "result": self._ftx_market(request.match_info["base"])})
+
+    async def ftx_trades(self, request: web.Request) -> web.Response:
+        base = request.match_info["base"]
+        return web.json_response(
+            {
+                "success": True,
+                "result": [
+                    {
+                        "id": int(request["received"] * 1000),
+                        "price": self.price(base),
+                        "size": 1,
+                        "time": request["received"],
+                    }
+                ],
+            }
+        )
+
+    async def ftx_order(self, request: web.Request) -> web.Response:
+        params = await request.json()
+        self.orders.append((request["received"], "FTX", params["market"], params["side"]))
+        return web.json_response({"success": True, "result": {**params, "createdAt": request["received"]}})
+
+    def _ftx_market(self, base: str) -> Dict:
+        return {
+            "name": self.symbol("FTX", base),
+            "type": "spot",
+            "enabled": True,
+            "baseCurrency": base,
+            "quoteCurrency": self.quote_ticker,
+            "last": self.price(base),
+        }
@@ -0,0 +1,75 @@
+"""
+Compares the per-order Bot._update path against PositionBook.evaluate.
+
+    python -m benchmarks.position_book --positions 10 50 500
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, NoReturn, Tuple
+
+import numpy as np
+
+from bot import Bot, PositionBook
+from util import Util
+from util.models import Order, Ticker
+
+
+def make_orders(n: int, seed: int = 0) -> Tuple[Dict[str, Order], Dict[str, float]]:
+    rnd = random.Random(seed)
+    orders, prices = {}, {}
+    for i in range(n):
+        price = rnd.uniform(0.01, 1000)
+        symbol = f"COIN{i}USDT"
+        orders[symbol] = Order(
+            broker="BINANCE",
+            ticker=Ticker(ticker=symbol, base_ticker=f"COIN{i}", quote_ticker="USDT"),
+            purchase_datetime=datetime.now(),
+            price=price,
+            side="BUY",
+            size=30 / price,
+            type="market",
+            status="TEST_MODE",
+            take_profit=Util.percent_change(price, 30),
+            stop_loss=Util.percent_change(price, -20),
+            trailing_stop_loss_activated=rnd.random() < 0.5,
+            trailing_stop_loss_max=Util.percent_change(price, 35),
+            trailing_stop_loss=Util.percent_change(price, -10),
+        )
+        prices[symbol] = price * rnd.uniform(0.7, 1.5)
+    return orders, prices
+
+
+def run(positions: List[int], number: int) -> NoReturn:
+    config = SimpleNamespace(ENABLE_TRAILING_STOP_LOSS=True, TRAILING_STOP_LOSS_PERCENT=10)
+    bot = SimpleNamespace(config=config)
+
+    print(f"{'positions':>10} {'per-order (us)':>16} {'book (us)':>12} {'speedup':>9}")
+    for n in positions:
+        orders, prices = make_orders(n)
+        book = PositionBook.from_orders(orders, config)
+        price_array = book.prices_for(prices)
+
+        expected = [Bot._update(bot, orders[k], prices[k]) for k in book.keys]
+        assert book.action_names(book.evaluate(price_array)) == dict(zip(book.keys, expected))
+
+        per_order = timeit.timeit(
+            lambda: [Bot._update(bot, o, prices[k]) for k, o in orders.items()],
+            number=number,
+        ) / number * 1e6
+        vectorized = timeit.timeit(
+            lambda: book.evaluate(price_array), number=number
+        ) / number * 1e6
+
+        print(f"{n:>10} {per_order:>16.2f} {vectorized:>12.2f} {per_order / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--positions", type=int, nargs="+", default=[1, 10, 50, 500])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    np.seterr(invalid="ignore")
+    run(args.positions, args.number)
@@ -1,3 +1,4 @@
 from bot.bot import Bot
+from bot.position_book import PositionBook
 
-__all__ = ["Bot"]
+__all__ = ["Bot", "PositionBook"]
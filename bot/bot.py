@@ -1,27 +1,86 @@
+import asyncio
 import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import List, Dict, NoReturn, Tuple
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import List, Dict, NoReturn, Optional, Set, Tuple
 
 import math
-from util.exceptions import  TradingBotException
+from util.exceptions import  CircuitOpenException, RateLimitExceededException, TradingBotException
 from broker import Broker
+from broker.armed import ArmedOrder
+from broker.cache import BrokerCache
+from broker.transport import HedgedSession
 from notification.notification import pretty_entry, pretty_close
+from recorder import Recorder
 from util import Config
 from util import Util
-from util.models import BrokerType, Ticker, Order, Sold
+from util.flight_recorder import FlightRecorder
+from util.decorators import RateLimiter
+from util.latency import LatencyMode
+from util.listing_window import ListingWindow
+from util.metrics import Metrics
+from util.models import BrokerType, Ticker, Order, Sold, EntryTrace, ExitTrace
+
+# raised while a broker wants to be left alone, the next iteration tries again
+BACKING_OFF = (CircuitOpenException, RateLimitExceededException)
 
 
 class Bot:
-    def __init__(self, broker: BrokerType) -> NoReturn:
-        self.broker = Broker.factory(broker)
-        self.config = Config(self.broker.brokerType)
+    def __init__(
+        self,
+        broker: BrokerType,
+        client: Optional[Broker] = None,
+        config: Optional[Config] = None,
+        state_dir: Optional[Path] = None,
+        account: Optional[str] = None,
+        detect: bool = True,
+    ) -> NoReturn:
+        """
+        client, config and state_dir default to the live broker, config.yml and the
+        project root.  Replays pass their own so they never touch live state, flight recorder
+        dumps included, which go to state_dir/logs.
+        account names one of the broker's ACCOUNTS, with its own keys and state files.  A bot
+        that does not detect only buys what its detector hands it, see add_follower.
+        """
+        if client is None:
+            subaccount = config.SUBACCOUNT if config is not None and config.SUBACCOUNT != "None" else None
+            client = Broker.factory(broker, subaccount=subaccount, account=account)
+        self.broker = client
+        self.account = account
+        self.detect = detect
+        self.config = config if config is not None else Config(self.broker.brokerType)
+        # every quote is detected from the same poll
+        self.quote_configs: Dict[str, Config] = self.config.quote_configs()
 
         self.broker.verify_quantity(self.config)
 
         self._pending_remove = []
+        self.flight = FlightRecorder(
+            self.name, out_dir=state_dir.joinpath("logs") if state_dir is not None else None
+        )
+        # when each new ticker was first seen, until it is processed
+        self._observed: Dict[str, datetime] = {}
+        # second of the minute new tickers go live at, feeds the adaptive FRONTLOAD window
+        self.listing_window = ListingWindow(
+            (state_dir or Config.ROOT_DIR).joinpath(f"{self.name}_listing_window.json")
+        )
+        self._last_poll: Optional[datetime] = None
+        # buys prepared for PRE_TRADING symbols, sent as soon as they trade
+        self.armed: Dict[str, ArmedOrder] = {}
+        # symbols that could not be armed, left to the regular poll
+        self.arm_failed: Set[str] = set()
+        # accounts buying every listing this bot detects
+        self.followers: List["Bot"] = []
+        self._fan_out: Optional[ThreadPoolExecutor] = None
+        self.order_limiter = RateLimiter(Config.FAN_OUT_ORDERS_PER_SECOND)
 
         self.ticker_seen_dict = []
-        self.all_tickers, self.ticker_seen_dict = self.get_starting_tickers()
+        if detect:
+            self.all_tickers, self.ticker_seen_dict = self.get_starting_tickers()
+        else:
+            self.all_tickers, self.ticker_seen_dict = [], {}
 
         # create / load files
         self.open_orders: Dict[str, Order] = {}
@@ -34,7 +93,7 @@ class Bot:
         self.order_history_file = None
 
         for f in ["open_orders", "sold", "order_history"]:
-            file = Config.ROOT_DIR.joinpath(f"{self.broker.brokerType}_{f}.json")
+            file = (state_dir or Config.ROOT_DIR).joinpath(f"{self.name}_{f}.json")
             self.__setattr__(f"{f}_file", file)
             if file.exists():
                 self.__setattr__(
@@ -44,55 +103,215 @@ class Bot:
                     ),
                 )
 
+        # record price history of new listings on a dedicated client
+        self.recorder = (
+            Recorder(Broker.factory(broker, role="recorder")) if Config.RECORDER_ENABLED and detect else None
+        )
+
         # Meta info
         self.time = datetime.now()
         self.periodic_update_sent = False
 
-    async def run_async(self) -> NoReturn:
+        # last known state, exported by util.exporter
+        self.rate_weight: Optional[int] = None
+        self.last_prices: Dict[str, float] = {}
+        self.last_saved: Optional[datetime] = None
+
+    @property
+    def name(self) -> str:
         """
-        Sells, adjusts TP and SL according to trailing values
-        and buys new tickers
+        Prefix of the state files, the broker followed by the account if there is one
+        """
+        if self.account is None:
+            return self.broker.brokerType
+        return f"{self.broker.brokerType}_{self.account}"
+
+    def add_follower(self, follower: "Bot") -> NoReturn:
+        self.followers.append(follower)
+        if self._fan_out is not None:
+            self._fan_out.shutdown(wait=False)
+        self._fan_out = ThreadPoolExecutor(
+            max_workers=len(self.followers) + 1, thread_name_prefix=f"fan-out-{self.name}"
+        )
+
+    def dispatch(self, new_tickers: List[Ticker]) -> NoReturn:
+        """
+        Buys new_tickers with this bot and all of its followers.  Each account places its
+        orders on its own client, in parallel, and raises on its own.
         """
         try:
-            self.periodic_update()
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if not self.followers:
+            self._buy(new_tickers, loop)
+            return
 
-            # basically the sell block and update TP and SL logic
-            if len(self.open_orders) > 0:
-                Config.NOTIFICATION_SERVICE.debug(
-                    f"[{self.broker.brokerType}]\tActive Order Tickers: [{self.open_orders}]"
+        for follower in self.followers:
+            for new_ticker in new_tickers:
+                follower.ticker_seen_dict[new_ticker.ticker] = True
+                if new_ticker.ticker in self._observed:
+                    follower._observed[new_ticker.ticker] = self._observed[new_ticker.ticker]
+
+        futures = [
+            self._fan_out.submit(bot._buy, new_tickers, loop) for bot in [self, *self.followers]
+        ]
+        wait(futures)
+        for bot, future in zip([self, *self.followers], futures):
+            if future.exception() is not None and bot is not self:
+                Config.NOTIFICATION_SERVICE.error(
+                    f"[{bot.name}]\tBuying {new_tickers} failed: {future.exception()!r}"
                 )
+        futures[0].result()
+
+    def _buy(self, new_tickers: List[Ticker], loop: Optional[asyncio.AbstractEventLoop]) -> NoReturn:
+        """
+        Buys new_tickers as fast as FAN_OUT_ORDERS_PER_SECOND allows.  Orders over the rate are
+        scheduled on loop instead of waited for, so neither the loop nor the fan out is held up.
+        """
+        rest, delay = self._buy_all(new_tickers)
+        if not rest:
+            return
+        Config.NOTIFICATION_SERVICE.info(
+            f"[{self.name}]\tOrder rate reached, buying {[t.ticker for t in rest]} in [{delay:.2f}] seconds"
+        )
+        if loop is None:
+            # replays and tests without a loop to come back on
+            sleep(delay)
+            self._buy(rest, None)
+        else:
+            loop.call_soon_threadsafe(loop.call_later, delay, self._buy, rest, loop)
 
-                for key, stored_order in self.open_orders.items():
-                    if key not in self.sold:
-                        self.update(key, stored_order)
+    def _buy_all(self, new_tickers: List[Ticker]) -> Tuple[List[Ticker], float]:
+        """
+        Buys new_tickers until the order rate of the account is reached, returns the tickers
+        left and the seconds until the next may be bought
+        """
+        with LatencyMode.hold():
+            for i, new_ticker in enumerate(new_tickers):
+                delay = self.order_limiter.reserve()
+                if delay > 0:
+                    return new_tickers[i:], delay
+                self.process_new_ticker(new_ticker)
+        return [], 0.0
 
-            # remove pending removals
-            [self.open_orders.pop(o) for o in self._pending_remove]
-            self._pending_remove = []
+    async def run_async(self) -> NoReturn:
+        """
+        Sells, adjusts TP and SL according to trailing values
+        and buys new tickers
+        """
+        self._run(exits=True, detect=self.detect)
 
-            # check if new tickers are listed
-            new_tickers = self.get_new_tickers()
+    async def run_exits(self) -> NoReturn:
+        """
+        The sell half of run_async, main.monitor_exits runs it on its own schedule
+        """
+        self._run(exits=True, detect=False)
 
-            if len(new_tickers) > 0:
-                Config.NOTIFICATION_SERVICE.info(
-                    f"[{self.broker.brokerType}]\tNew tickers detected: {new_tickers}"
-                )
+    async def run_detection(self) -> NoReturn:
+        """
+        The buy half of run_async, nothing for followers
+        """
+        if self.detect:
+            self._run(exits=False, detect=True)
+
+    def _run(self, exits: bool, detect: bool) -> NoReturn:
+        start = perf_counter()
+        self.flight.iteration += 1
+        self.flight.record("ITER_START", value=len(self.open_orders))
+        # an exit check that changed nothing has nothing to save
+        changed = True
+        try:
+            if exits:
+                self.periodic_update()
+                changed = self.update_open_orders()
+            if detect:
+                self.check_new_tickers()
+                changed = True
 
-                for new_ticker in new_tickers:
-                    self.process_new_ticker(new_ticker)
-            else:
-                Config.NOTIFICATION_SERVICE.debug(
-                    f"[{self.broker.brokerType}]\tNo new tickers found"
-                )
+        except BACKING_OFF as e:
+            self._backing_off(e)
 
         except Exception as e:
             self.save()
             Config.NOTIFICATION_SERVICE.error(traceback.format_exc())
+            self.flight.record("ERROR", detail=repr(e))
+            self.flight.dump("EXCEPTION")
 
         finally:
-            self.save()
+            if changed:
+                self.save()
+            elapsed = perf_counter() - start
+            Metrics.record(self.broker.brokerType, "iteration", elapsed)
+            self.flight.record("ITER_END", value=elapsed)
+
+    def _backing_off(self, e: BaseException, symbol: str = "") -> NoReturn:
+        Config.NOTIFICATION_SERVICE.warning(f"[{self.broker.brokerType}]\t{e.message}")
+        event = "CIRCUIT_OPEN" if isinstance(e, CircuitOpenException) else "THROTTLED"
+        self.flight.record(event, symbol, detail=e.message)
+
+    def update_open_orders(self) -> bool:
+        """
+        The sell block: sells and updates TP and SL for every open order.  True if any was.
+        """
+        changed = False
+        if len(self.open_orders) > 0:
+            Config.NOTIFICATION_SERVICE.debug(
+                f"[{self.broker.brokerType}]\tActive Order Tickers: {list(self.open_orders)}"
+            )
 
-    def _update(self, order, current_price) -> str:
+            for key, stored_order in self.open_orders.items():
+                if key not in self.sold:
+                    try:
+                        changed = self.update(key, stored_order) is not None or changed
+                    except BACKING_OFF as e:
+                        # the price endpoint is backing off, still look for new tickers
+                        self._backing_off(e, key)
+                        break
+
+        # remove pending removals
+        [self.open_orders.pop(o) for o in self._pending_remove]
+        [self.last_prices.pop(o, None) for o in self._pending_remove]
+        self._pending_remove = []
+        return changed
+
+    def position_ages(self) -> List[float]:
+        """
+        Seconds since each open order was bought
+        """
+        now = self.broker.get_time().timestamp()
+        return [now - o.purchase_datetime.timestamp() for o in self.open_orders.values()]
+
+    def check_new_tickers(self) -> NoReturn:
+        """
+        Buys every newly listed ticker
+        """
+        new_tickers = self.get_new_tickers()
+
+        if len(new_tickers) > 0:
+            Config.NOTIFICATION_SERVICE.info(
+                f"[{self.broker.brokerType}]\tNew tickers detected: {new_tickers}"
+            )
+
+            self.dispatch(new_tickers)
+
+            if self.recorder is not None:
+                for new_ticker in new_tickers:
+                    self.recorder.watch(new_ticker)
+        else:
+            Config.NOTIFICATION_SERVICE.debug(
+                f"[{self.broker.brokerType}]\tNo new tickers found"
+            )
+
+    def config_for(self, ticker: Ticker) -> Config:
+        """
+        Settings of the quote asset of ticker
+        """
+        return self.quote_configs.get(ticker.quote_ticker, self.config)
+
+    def _update(self, order, current_price, config: Optional[Config] = None) -> str:
+        config = config if config is not None else self.config
         # if the price is decreasing and is below the stop loss
         if current_price < order.stop_loss:
             return "PRICE_BELOW_SL"
@@ -100,14 +319,14 @@ class Bot:
         # if the price is increasing and is higher than the old stop-loss maximum, update trailing stop loss
         elif (
             current_price > order.trailing_stop_loss_max
-            and self.config.ENABLE_TRAILING_STOP_LOSS
+            and config.ENABLE_TRAILING_STOP_LOSS
         ):
             return "UPDATE_TRAILING_STOP_LOSS"
 
         # if the price is decreasing and has fallen below the trailing stop loss minimum
         elif (
             current_price < order.trailing_stop_loss
-            and self.config.ENABLE_TRAILING_STOP_LOSS
+            and config.ENABLE_TRAILING_STOP_LOSS
             and order.trailing_stop_loss_activated is True
         ):
             return "PRICE_BELOW_TSL"
@@ -115,25 +334,32 @@ class Bot:
         # if price is increasing and is higher than the take profit maximum
         elif (
             current_price > order.take_profit
-            and self.config.ENABLE_TRAILING_STOP_LOSS is False
+            and config.ENABLE_TRAILING_STOP_LOSS is False
         ):
             return "PRICE_ABOVE_TP"
 
-    def update(self, ticker, order, **kwargs) -> NoReturn:
+    def update(self, ticker, order, **kwargs) -> Optional[str]:
         # This is for testing
-        current_price = kwargs.get(
-            "current_price", self.broker.get_current_price(order.ticker)
-        )
+        if "current_price" in kwargs:
+            current_price = kwargs["current_price"]
+        else:
+            with Metrics.time(self.broker.brokerType, "price_fetch"):
+                current_price = self.broker.get_current_price(order.ticker)
+        triggered = self.broker.get_time()
+        self.last_prices[ticker] = current_price
 
-        action = self._update(order, current_price)
+        with Metrics.time(self.broker.brokerType, "exit_evaluation"):
+            action = self._update(order, current_price, self.config_for(order.ticker))
+        self.flight.record("PRICE", ticker, current_price, action or "")
 
         if action in ["PRICE_BELOW_SL", "PRICE_ABOVE_TP", "PRICE_BELOW_TSL"]:
-            self.close_trade(order, current_price, order.price, action)
+            self.close_trade(order, current_price, order.price, action, triggered=triggered)
 
         elif action == "UPDATE_TRAILING_STOP_LOSS":
             self.open_orders[ticker] = self.update_trailing_stop_loss(
                 order, current_price
             )
+        return action
 
     def upgrade_update(self) -> NoReturn:
         try:
@@ -158,6 +384,11 @@ class Bot:
             Config.NOTIFICATION_SERVICE.info(
                 f"[{self.broker.brokerType}] ORDERS UPDATE:\n\t{self.open_orders}"
             )
+            if isinstance(getattr(self.broker, "session", None), HedgedSession):
+                Config.NOTIFICATION_SERVICE.info(self.broker.session.report())
+            if isinstance(getattr(self.broker, "cache", None), BrokerCache):
+                Config.NOTIFICATION_SERVICE.info(f"[{self.broker.brokerType}] {self.broker.cache.report()}")
+            Config.NOTIFICATION_SERVICE.info(Metrics.report(self.broker.brokerType, reset=True))
             Config.NOTIFICATION_SERVICE.info(f"[{self.broker.brokerType}]\tSaving..")
             self.save()
             self.upgrade_update()
@@ -174,7 +405,7 @@ class Bot:
         All the new tickers detected during the loop will have a value of False.
         """
 
-        tickers, headers = self.broker.get_tickers(self.config.QUOTE_TICKER)
+        tickers, headers = self.broker.get_tickers(list(self.quote_configs))
 
         self.config.RATE_LIMIT = self.broker.get_rate_limit()
         ticker_seen_dict: Dict[str, bool] = {}
@@ -193,10 +424,21 @@ class Bot:
         Config.NOTIFICATION_SERVICE.debug(
             f"[{self.broker.brokerType}]\tGetting all tickers"
         )
-        all_tickers_recheck, headers = self.broker.get_tickers(self.config.QUOTE_TICKER)
-
-        Config.auto_rate_current_weight = int(headers['x-mbx-used-weight-1m'])
+        with Metrics.time(self.broker.brokerType, "ticker_fetch"):
+            all_tickers_recheck, headers = self.broker.get_tickers(list(self.quote_configs))
+        observed = self.broker.get_time()
+
+        # only Binance reports the used weight
+        if "x-mbx-used-weight-1m" in headers:
+            Config.auto_rate_current_weight = int(headers['x-mbx-used-weight-1m'])
+            self.rate_weight = Config.auto_rate_current_weight
+        self.flight.record(
+            "TICKERS",
+            value=len(all_tickers_recheck) if all_tickers_recheck is not None else -1,
+            detail=f"weight={self.rate_weight}",
+        )
 
+        start = perf_counter()
         if (
             all_tickers_recheck is not None
             and len(all_tickers_recheck) != self.ticker_seen_dict
@@ -207,16 +449,110 @@ class Bot:
 
             for new_ticker in new_tickers:
                 self.ticker_seen_dict[new_ticker.ticker] = True
+                self._observed[new_ticker.ticker] = observed
+                self.flight.record("NEW", new_ticker.ticker)
+
+            if new_tickers and self.listing_window.record(
+                self._last_poll, observed, len(new_tickers)
+            ):
+                self.listing_window.save()
+        if all_tickers_recheck is not None:
+            self._last_poll = observed
+        Metrics.record(self.broker.brokerType, "diff", perf_counter() - start)
+
+        if Config.ARMED_ORDERS_ENABLED and hasattr(self.broker, "arm_order"):
+            self.arm_pre_trading()
 
         return new_tickers
 
+    def arm_pre_trading(self) -> NoReturn:
+        """
+        Arms a buy for every new symbol the broker lists as PRE_TRADING
+        """
+        for ticker in self.broker.get_pre_trading(list(self.quote_configs)):
+            if (
+                ticker.ticker in self.armed
+                or ticker.ticker in self.ticker_seen_dict
+                or ticker.ticker in self.open_orders
+            ):
+                continue
+            for bot in [self, *self.followers]:
+                bot.arm(ticker)
+
+    def arm(self, ticker: Ticker) -> NoReturn:
+        if ticker.ticker in self.arm_failed:
+            return
+        try:
+            self.armed[ticker.ticker] = self.broker.arm_order(self.config_for(ticker), ticker)
+        except (Exception, TradingBotException) as e:
+            self.arm_failed.add(ticker.ticker)
+            Config.NOTIFICATION_SERVICE.warning(
+                f"[{self.name}]\tArming {ticker.ticker} failed, buying it when it is detected: {e!r}"
+            )
+            self.flight.record("ARM_FAILED", ticker.ticker, detail=repr(e))
+        else:
+            Config.NOTIFICATION_SERVICE.info(
+                f"[{self.name}]\t{ticker.ticker} is PRE_TRADING, buy armed"
+            )
+            self.flight.record("ARMED", ticker.ticker)
+
+    def poll_armed(self) -> NoReturn:
+        """
+        Buys the armed symbols that started trading, drops those that are no longer listed
+        """
+        if not self.armed or not self.detect:
+            return
+        with Metrics.time(self.broker.brokerType, "armed_fetch"):
+            statuses = self.broker.get_trading_status(list(self.armed))
+        observed = self.broker.get_time()
+        headers = getattr(getattr(self.broker, "response", None), "headers", {})
+        if "x-mbx-used-weight-1m" in headers:
+            Config.auto_rate_current_weight = int(headers["x-mbx-used-weight-1m"])
+            self.rate_weight = Config.auto_rate_current_weight
+
+        trading = []
+        for symbol, armed in list(self.armed.items()):
+            status = statuses.get(symbol)
+            if status == "TRADING":
+                self.ticker_seen_dict[symbol] = True
+                self._observed[symbol] = observed
+                self.flight.record("NEW", symbol, detail="armed")
+                trading.append(armed.ticker)
+            elif status != "PRE_TRADING":
+                for bot in [self, *self.followers]:
+                    bot.armed.pop(symbol, None)
+                self.flight.record("DISARMED", symbol, detail=str(status))
+
+        if trading:
+            Config.NOTIFICATION_SERVICE.info(
+                f"[{self.broker.brokerType}]\tArmed tickers are trading: {trading}"
+            )
+            self.dispatch(trading)
+            for bot in [self, *self.followers]:
+                bot.save()
+            if self.recorder is not None:
+                for ticker in trading:
+                    self.recorder.watch(ticker)
+
+    async def run_armed(self) -> NoReturn:
+        """
+        poll_armed between the regular iterations
+        """
+        try:
+            self.poll_armed()
+        except BACKING_OFF as e:
+            self._backing_off(e)
+        except Exception as e:
+            Config.NOTIFICATION_SERVICE.error(traceback.format_exc())
+            self.flight.record("ERROR", detail=repr(e))
+
     def update_trailing_stop_loss(self, order: Order, current_price: float) -> Order:
 
         # increase as absolute value for TP
         order.trailing_stop_loss_activated = True
         order.trailing_stop_loss_max = max(current_price, order.price)
         order.trailing_stop_loss = Util.percent_change(
-            order.trailing_stop_loss_max, -self.config.TRAILING_STOP_LOSS_PERCENT
+            order.trailing_stop_loss_max, -self.config_for(order.ticker).TRAILING_STOP_LOSS_PERCENT
         )
 
         Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
@@ -229,7 +565,12 @@ class Bot:
         return order
 
     def close_trade(
-        self, order: Order, current_price: float, stored_price: float, reason: str
+        self,
+        order: Order,
+        current_price: float,
+        stored_price: float,
+        reason: str,
+        triggered: Optional[datetime] = None,
     ) -> NoReturn:
         Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
             "CLOSING Order:\n{}".format(order.json())
@@ -241,16 +582,23 @@ class Bot:
             "Stored Price:\t{}".format(stored_price)
         )
 
+        trace = ExitTrace(triggered=triggered or self.broker.get_time())
         try:
-            sell: Order = self.broker.place_order(
-                self.config,
-                ticker=order.ticker,
-                side="sell",
-                size=order.size,
-                current_price=current_price,
-            )
-        except TradingBotException:
+            trace.sent = self.broker.get_time()
+            with LatencyMode.hold(), Metrics.time(self.broker.brokerType, "order_placement"):
+                sell: Order = self.broker.place_order(
+                    self.config_for(order.ticker),
+                    ticker=order.ticker,
+                    side="sell",
+                    size=order.size,
+                    current_price=current_price,
+                )
+        except TradingBotException as e:
+            self.flight.record("SELL_FAILED", order.ticker.ticker, current_price, str(e))
+            self.flight.dump_once("ORDER_FAILED", order.ticker.ticker, str(e))
             return
+        trace.acked = self.broker.get_time()
+        self.flight.record("SELL", order.ticker.ticker, sell.price, reason)
 
         # pending remove order from json file
         self.order_history.append({order.ticker.ticker: order})
@@ -277,9 +625,12 @@ class Bot:
             * 100,
             sold_datetime=sell.purchase_datetime,
             reason=reason,
+            entry_trace=order.entry_trace,
+            exit_trace=trace,
         )
 
-        Config.NOTIFICATION_SERVICE.message("CLOSE", pretty_close, (sold,))
+        with Metrics.time(self.broker.brokerType, "notification"):
+            Config.NOTIFICATION_SERVICE.message("CLOSE", pretty_close, (sold,))
         Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
             "SOLD:\n{}".format(sold.json())
         )
@@ -296,10 +647,13 @@ class Bot:
             "PROCESSING NEW TICKER:\n{}".format(new_ticker.json())
         )
 
+        trace = EntryTrace(observed=self._observed.pop(new_ticker.ticker, None))
+        config = self.config_for(new_ticker)
         if (
             new_ticker.ticker not in self.open_orders
-            and self.config.QUOTE_TICKER in new_ticker.quote_ticker
+            and new_ticker.quote_ticker in self.quote_configs
         ):
+            trace.decided = self.broker.get_time()
             Config.NOTIFICATION_SERVICE.info(
                 f"[{self.broker.brokerType}]\tPreparing to buy {new_ticker.ticker}"
             )
@@ -317,44 +671,63 @@ class Bot:
                 )
 
                 if self.broker.brokerType == "FTX":
-                    price = self.broker.get_current_price(new_ticker)
+                    with Metrics.time(self.broker.brokerType, "price_fetch"):
+                        price = self.broker.get_current_price(new_ticker)
                     size = self.broker.convert_size(
-                        config=self.config, ticker=new_ticker, price=price
+                        config=config, ticker=new_ticker, price=price
                     )
 
-                    order = self.broker.place_order(
-                        self.config, ticker=new_ticker, side="BUY", size=size, **kwargs
-                    )
+                    trace.sent = self.broker.get_time()
+                    with Metrics.time(self.broker.brokerType, "order_placement"):
+                        order = self.broker.place_order(
+                            config, ticker=new_ticker, side="BUY", size=size, **kwargs
+                        )
 
                 else:
-                    order = self.broker.place_order(
-                        self.config, ticker=new_ticker, side="BUY", **kwargs
-                    )
+                    armed = self.armed.pop(new_ticker.ticker, None)
+                    if armed is not None:
+                        kwargs["armed"] = armed
+                    trace.sent = self.broker.get_time()
+                    with Metrics.time(self.broker.brokerType, "order_placement"):
+                        order = self.broker.place_order(
+                            config, ticker=new_ticker, side="BUY", **kwargs
+                        )
+                trace.acked = self.broker.get_time()
+                # the fill time, if the exchange reported one
+                if order.entry_trace is not None:
+                    trace.filled = order.entry_trace.filled
+                order.entry_trace = trace
 
                 Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
                     "ORDER RESPONSE:\n{}".format(order.json())
                 )
                 self.open_orders[new_ticker.ticker] = order
+                self.flight.record("BUY", new_ticker.ticker, order.price, order.status)
                 if not Config.TEST and Config.SHARE_DATA:
                     Util.post_pipedream(order)
 
-                Config.NOTIFICATION_SERVICE.message("ENTRY", pretty_entry, (order,))
+                with Metrics.time(self.broker.brokerType, "notification"):
+                    Config.NOTIFICATION_SERVICE.message("ENTRY", pretty_entry, (order,))
             except Exception as e:
                 Config.NOTIFICATION_SERVICE.error(traceback.format_exc())
+                self.flight.record("BUY_FAILED", new_ticker.ticker, detail=repr(e))
+                self.flight.dump("ORDER_FAILED")
             finally:
                 self.save()
 
         else:
             Config.NOTIFICATION_SERVICE.error(
                 f"[{self.broker.brokerType}]\tNew new_ticker detected, but {new_ticker.ticker} is currently in "
-                f"portfolio, or {self.config.QUOTE_TICKER} does not match"
+                f"portfolio, or {'/'.join(self.quote_configs)} does not match"
             )
             Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
                 f"[{self.broker.brokerType}]\tNew new_ticker detected, but {new_ticker.ticker} is currently in "
-                f"portfolio, or {self.config.QUOTE_TICKER} does not match.\n{new_ticker.json()}"
+                f"portfolio, or {'/'.join(self.quote_configs)} does not match.\n{new_ticker.json()}"
             )
 
     def save(self) -> NoReturn:
-        Util.dump_json(self.open_orders_file, obj=self.open_orders)
-        Util.dump_json(self.order_history_file, obj=self.order_history)
-        Util.dump_json(self.sold_file, obj=self.sold)
+        with Metrics.time(self.broker.brokerType, "save"):
+            Util.dump_json(self.open_orders_file, obj=self.open_orders)
+            Util.dump_json(self.order_history_file, obj=self.order_history)
+            Util.dump_json(self.sold_file, obj=self.sold)
+        self.last_saved = datetime.now()
@@ -0,0 +1,183 @@
+from typing import Dict, List, NoReturn, Optional, Union
+
+import numpy as np
+
+from util import Config
+from util.models import Order
+
+# Action codes returned by PositionBook.evaluate.  The index into ACTIONS is the
+# string returned by Bot._update for the same decision.
+NO_ACTION = 0
+PRICE_BELOW_SL = 1
+UPDATE_TRAILING_STOP_LOSS = 2
+PRICE_BELOW_TSL = 3
+PRICE_ABOVE_TP = 4
+
+ACTIONS = [
+    None,
+    "PRICE_BELOW_SL",
+    "UPDATE_TRAILING_STOP_LOSS",
+    "PRICE_BELOW_TSL",
+    "PRICE_ABOVE_TP",
+]
+
+CLOSE_ACTIONS = (PRICE_BELOW_SL, PRICE_BELOW_TSL, PRICE_ABOVE_TP)
+
+
+class PositionBook:
+    """
+    Columnar view of open positions.  Every exit value lives in its own NumPy array so the
+    SL -> TSL update -> TSL -> TP decision chain of Bot._update can be evaluated for every
+    position in one pass.  Each position carries the exit settings of the Config it was
+    added with, so positions from different brokers/accounts can share one book.
+    """
+
+    def __init__(self, capacity: int = 64) -> NoReturn:
+        self.keys: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity: int) -> NoReturn:
+        self.capacity = capacity
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.stop_loss = np.zeros(capacity, dtype=np.float64)
+        self.take_profit = np.zeros(capacity, dtype=np.float64)
+        self.trailing_stop_loss_max = np.zeros(capacity, dtype=np.float64)
+        self.trailing_stop_loss = np.zeros(capacity, dtype=np.float64)
+        self.trailing_stop_loss_activated = np.zeros(capacity, dtype=bool)
+        self.trailing_stop_loss_enabled = np.zeros(capacity, dtype=bool)
+        self.trailing_stop_loss_percent = np.zeros(capacity, dtype=np.float64)
+
+    def _columns(self) -> List[np.ndarray]:
+        return [
+            self.price,
+            self.stop_loss,
+            self.take_profit,
+            self.trailing_stop_loss_max,
+            self.trailing_stop_loss,
+            self.trailing_stop_loss_activated,
+            self.trailing_stop_loss_enabled,
+            self.trailing_stop_loss_percent,
+        ]
+
+    def _grow(self) -> NoReturn:
+        old = self._columns()
+        self._allocate(self.capacity * 2)
+        for new_col, old_col in zip(self._columns(), old):
+            new_col[: len(old_col)] = old_col
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    @classmethod
+    def from_orders(cls, orders: Dict[str, Order], config: Config) -> "PositionBook":
+        book = cls(capacity=len(orders))
+        for key, order in orders.items():
+            book.add(key, order, config)
+        return book
+
+    def add(self, key: str, order: Order, config: Config) -> NoReturn:
+        if key in self._index:
+            i = self._index[key]
+        else:
+            if len(self.keys) == self.capacity:
+                self._grow()
+            i = len(self.keys)
+            self.keys.append(key)
+            self._index[key] = i
+
+        self.price[i] = order.price
+        self.stop_loss[i] = order.stop_loss
+        self.take_profit[i] = order.take_profit
+        self.trailing_stop_loss_max[i] = order.trailing_stop_loss_max
+        self.trailing_stop_loss[i] = order.trailing_stop_loss
+        self.trailing_stop_loss_activated[i] = order.trailing_stop_loss_activated is True
+        self.trailing_stop_loss_enabled[i] = bool(config.ENABLE_TRAILING_STOP_LOSS)
+        self.trailing_stop_loss_percent[i] = config.TRAILING_STOP_LOSS_PERCENT
+
+    def remove(self, key: str) -> NoReturn:
+        """
+        Removes a position by moving the last row into its slot
+        """
+        i = self._index.pop(key)
+        last = len(self.keys) - 1
+        last_key = self.keys.pop()
+
+        if i != last:
+            for col in self._columns():
+                col[i] = col[last]
+            self.keys[i] = last_key
+            self._index[last_key] = i
+
+    def prices_for(self, prices: Dict[str, float]) -> np.ndarray:
+        """
+        Aligns a {key: price} snapshot with the book.  Missing prices become NaN, which
+        never triggers an action.
+        """
+        return np.fromiter(
+            (prices.get(key, np.nan) for key in self.keys),
+            dtype=np.float64,
+            count=len(self.keys),
+        )
+
+    def evaluate(self, current_price: Union[np.ndarray, Dict[str, float]]) -> np.ndarray:
+        """
+        Returns an action code for every position, in the same order as self.keys.
+        Mirrors Bot._update: the first matching rule wins.
+        """
+        n = len(self.keys)
+        if isinstance(current_price, dict):
+            current_price = self.prices_for(current_price)
+        p = np.asarray(current_price, dtype=np.float64)[:n]
+
+        enabled = self.trailing_stop_loss_enabled[:n]
+
+        # lowest priority first, so each later rule overwrites the earlier ones
+        actions = np.where(
+            (p > self.take_profit[:n]) & ~enabled, PRICE_ABOVE_TP, NO_ACTION
+        ).astype(np.int8)
+        actions[
+            (p < self.trailing_stop_loss[:n]) & enabled & self.trailing_stop_loss_activated[:n]
+        ] = PRICE_BELOW_TSL
+        actions[(p > self.trailing_stop_loss_max[:n]) & enabled] = UPDATE_TRAILING_STOP_LOSS
+        actions[p < self.stop_loss[:n]] = PRICE_BELOW_SL
+        return actions
+
+    def apply_trailing_stop_loss(
+        self, current_price: np.ndarray, actions: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Applies Bot.update_trailing_stop_loss to every position flagged
+        UPDATE_TRAILING_STOP_LOSS and returns the mask of updated rows.
+        """
+        n = len(self.keys)
+        p = np.asarray(current_price, dtype=np.float64)[:n]
+        if actions is None:
+            actions = self.evaluate(p)
+
+        mask = actions == UPDATE_TRAILING_STOP_LOSS
+        new_max = np.maximum(p[mask], self.price[:n][mask])
+
+        self.trailing_stop_loss_activated[:n][mask] = True
+        self.trailing_stop_loss_max[:n][mask] = new_max
+        # same operation order as Util.percent_change so results are bit-identical
+        self.trailing_stop_loss[:n][mask] = (
+            -self.trailing_stop_loss_percent[:n][mask] / 100 * new_max
+        ) + new_max
+        return mask
+
+    def action_names(self, actions: np.ndarray) -> Dict[str, Optional[str]]:
+        return {key: ACTIONS[code] for key, code in zip(self.keys, actions.tolist())}
+
+    def to_order(self, key: str, order: Order) -> Order:
+        """
+        Writes the trailing values of a position back onto its Order
+        """
+        i = self._index[key]
+        order.trailing_stop_loss_activated = bool(self.trailing_stop_loss_activated[i])
+        order.trailing_stop_loss_max = float(self.trailing_stop_loss_max[i])
+        order.trailing_stop_loss = float(self.trailing_stop_loss[i])
+        return order
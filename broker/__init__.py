@@ -1,3 +1,5 @@
 from broker.broker import Broker
+from broker.simulated import SimulatedBroker
+from broker.paper import PaperExchange
 
-__all__ = ["Broker"]
+__all__ = ["Broker", "SimulatedBroker", "PaperExchange"]
@@ -0,0 +1,46 @@
+"""
+Orders prepared for symbols that are listed but not trading yet
+"""
+import hashlib
+import hmac
+from datetime import datetime
+from typing import Dict, NoReturn, Optional
+from urllib.parse import urlencode
+
+from util.models import Ticker
+
+
+class ArmedOrder:
+    """
+    A market buy checked against the symbol's filters while it is still PRE_TRADING.  The
+    HMAC over its parameters is computed up front, so sending it once the symbol trades only
+    signs the timestamp.
+    """
+
+    def __init__(self, ticker: Ticker, params: Dict, secret: Optional[str], armed_at: datetime) -> NoReturn:
+        self.ticker = ticker
+        self.params = params
+        self.armed_at = armed_at
+        self.query = urlencode(params)
+        self._mac = (
+            hmac.new(secret.encode("utf-8"), self.query.encode("utf-8"), hashlib.sha256)
+            if secret
+            else None
+        )
+
+    @property
+    def presigned(self) -> bool:
+        return self._mac is not None
+
+    def signed(self, timestamp: int, recv_window: Optional[int] = None) -> str:
+        """
+        Request body with timestamp in milliseconds and the signature appended
+        """
+        suffix = f"&recvWindow={recv_window}" if recv_window else ""
+        suffix += f"&timestamp={timestamp}"
+        mac = self._mac.copy()
+        mac.update(suffix.encode("utf-8"))
+        return f"{self.query}{suffix}&signature={mac.hexdigest()}"
+
+    def __repr__(self) -> str:
+        return f"ArmedOrder({self.ticker.ticker}, {self.params})"
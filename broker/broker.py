@@ -1,10 +1,10 @@
 import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import NoReturn, List, Tuple
-from typing import Union, Dict
+from typing import NoReturn, List, Set, Tuple
+from typing import Iterable, Union, Dict
 
-import binance.exceptions
+import json
 import math
 import requests
 import yaml
@@ -12,43 +12,78 @@ from binance.client import Client as BinanceClient
 from dateutil.parser import parse
 from ftx.api import FtxClient
 
+from broker.armed import ArmedOrder
+from broker.cache import BrokerCache, cached
+from broker.pool import EndpointPool
+from broker.transport import HedgedSession
 from util import Config, Util
 from util.decorators import retry
 from util.exceptions import *
-from util.models import BrokerType, Ticker, Order
-from time import sleep
+from util.models import BrokerType, EntryTrace, Ticker, Order
+from time import sleep, time
 logger = logging.getLogger(__name__)
 
 
 class Broker(ABC):
+    _tickers: Dict[Tuple[str, str, str], Ticker] = {}
+
     def __init__(self) -> NoReturn:
         self.brokerType = None
+        self.cache = BrokerCache()
 
     @staticmethod
-    def factory(broker: BrokerType, subaccount: Union[str, None] = None) -> any:
+    def factory(
+            broker: BrokerType,
+            subaccount: Union[str, None] = None,
+            account: Union[str, None] = None,
+            role: Union[str, None] = None,
+    ) -> any:
+        """
+        account names an entry of the broker's `accounts` in auth.yml with its own keys.  An
+        account without one uses the broker's keys, e.g. for an FTX subaccount.
+
+        role names a client that is not used for trading, e.g. the recorder's.  Its endpoints
+        get their own retry budgets and circuit breakers, so its failures never block orders.
+        """
+        client = Broker._create(broker, subaccount, account)
+        client.account = account
+        client.role = role
+        return client
+
+    @staticmethod
+    def _create(broker: BrokerType, subaccount: Union[str, None], account: Union[str, None]) -> any:
+        if Config.TEST and Config.PAPER_TRADING:
+            # imported here, paper builds on this module
+            from broker.paper import PaperExchange
+
+            return PaperExchange.from_config(broker)
+
         with open(Config.AUTH_DIR.joinpath("auth.yml")) as file:
             auth = yaml.load(file, Loader=yaml.FullLoader)
+            credentials = auth[broker]
+            if account is not None:
+                credentials = (auth[broker].get("accounts") or {}).get(account) or credentials
 
             if broker == "FTX":
                 return FTX(
                     subaccount=subaccount,
-                    key=auth["FTX"]["key"],
-                    secret=auth["FTX"]["secret"],
+                    key=credentials["key"],
+                    secret=credentials["secret"],
                 )
             if broker == "BINANCE":
-                # TODO - SUBACCOUNTS FOR BINANCE IS NOT IMPLEMENTED YET
+                # Binance subaccounts have their own keys, see `accounts` in auth.yml
                 if Config.BINANCE_TESTNET:
                     return Binance(
                         subaccount="",
-                        key=auth["BINANCE"]["testnetkey"],
-                        secret=auth["BINANCE"]["testnetsecret"],
+                        key=credentials["testnetkey"],
+                        secret=credentials["testnetsecret"],
                         testnet=True,
                     )
                 else:
                     return Binance(
                         subaccount="",
-                        key=auth["BINANCE"]["key"],
-                        secret=auth["BINANCE"]["secret"],
+                        key=credentials["key"],
+                        secret=credentials["secret"],
                     )
 
     @abstractmethod
@@ -56,12 +91,27 @@ class Broker(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def get_tickers(self, quote_ticker: str, **kwargs) -> Tuple[List[Ticker], Dict]:
+    def get_tickers(self, quote_ticker: Union[str, Iterable[str]], **kwargs) -> Tuple[List[Ticker], Dict]:
         """
-        Returns all coins from Broker
+        Returns all coins from Broker paired with quote_ticker, or any of several quote tickers
         """
         raise NotImplementedError
 
+    @staticmethod
+    def quotes(quote_ticker: Union[str, Iterable[str]]) -> Set[str]:
+        return {quote_ticker} if isinstance(quote_ticker, str) else set(quote_ticker)
+
+    @staticmethod
+    def ticker(symbol: str, base: str, quote: str) -> Ticker:
+        """
+        The same Ticker for a symbol on every poll, instead of one per symbol per poll
+        """
+        key = (symbol, base, quote)
+        ticker = Broker._tickers.get(key)
+        if ticker is None:
+            ticker = Broker._tickers[key] = Ticker(ticker=symbol, base_ticker=base, quote_ticker=quote)
+        return ticker
+
     @abstractmethod
     def get_current_price(self, ticker: Ticker) -> float:
         """
@@ -81,9 +131,24 @@ class Broker(ABC):
     def get_rate_limit(self) -> int:
         raise NotImplementedError
 
+    def get_time(self) -> datetime:
+        """
+        Clock used to timestamp order traces
+        """
+        return datetime.now()
+
+    def get_recent_ticks(self, ticker: Ticker) -> List[Tuple[int, float, float, float]]:
+        """
+        Returns (trade id, timestamp, price, qty) for the most recent trades.  Brokers without a
+        trade feed return the current price as a single tick with an id and qty of 0.
+        """
+        return [(0, time(), self.get_current_price(ticker), 0.0)]
+
 
 class FTX(FtxClient, Broker):
-    def __init__(self, subaccount: str, key: str, secret: str) -> NoReturn:
+    def __init__(
+            self, subaccount: str, key: str, secret: str, api_url: Union[str, None] = None
+    ) -> NoReturn:
         self.brokerType = "FTX"
 
         super().__init__(
@@ -91,24 +156,24 @@ class FTX(FtxClient, Broker):
             api_secret=secret,
             subaccount_name=subaccount,
         )
+        # used by the benchmarks to point at a local mock exchange
+        if api_url is not None:
+            self._base_url = api_url
+        self.cache = BrokerCache()
+
+        self.pool = None
+        if Config.POOL_ENABLED and api_url is None:
+            self.pool = EndpointPool(
+                self.brokerType,
+                Config.POOL_FTX_HOSTS,
+                "/api/markets/BTC/USD",
+                size=Config.POOL_SIZE,
+                probe_interval=Config.POOL_PROBE_INTERVAL_SECONDS,
+            )
+            self._session = self.pool.session()
 
-    @retry(
-        (
-                requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                requests.exceptions.SSLError,
-                requests.exceptions.RequestException,
-                NoBrokerResponseException,
-                Exception,
-        ),
-        2,
-        0,
-        None,
-        1,
-        0,
-        logger,
-    )
-    def get_tickers(self, quote_ticker: str, **kwargs) -> Tuple[List[Ticker], Dict]:
+    @retry("tickers", tries=2, logger=logger)
+    def get_tickers(self, quote_ticker: Union[str, Iterable[str]], **kwargs) -> Tuple[List[Ticker], Dict]:
         try:
             api_resp = super(FTX, self).get_markets()
 
@@ -116,40 +181,33 @@ class FTX(FtxClient, Broker):
             if test_retry:
                 raise requests.exceptions.ConnectionError
 
-            resp = []
-            for ticker in api_resp:
-                if (
-                        ticker["type"] == "spot"
-                        and ticker["enabled"]
-                        and ticker["quoteCurrency"] == quote_ticker
-                ):
-                    if ticker["type"] == "spot" and ticker["enabled"]:
-                        resp.append(
-                            Ticker(
-                                ticker=ticker["name"],
-                                base_ticker=ticker["baseCurrency"],
-                                quote_ticker=ticker["quoteCurrency"],
-                            )
-                        )
-            return resp, {}
+            return self.parse_tickers(api_resp, quote_ticker), {}
         except Exception as e:
             if len(e.args) > 0 and "FTX is currently down" in e.args[0]:
                 raise BrokerDownException(e.args[0])
             else:
                 raise
 
+    @staticmethod
+    def parse_tickers(api_resp: List[Dict], quote_ticker: Union[str, Iterable[str]]) -> List[Ticker]:
+        quotes = Broker.quotes(quote_ticker)
+        resp = []
+        for ticker in api_resp:
+            if (
+                    ticker["type"] == "spot"
+                    and ticker["enabled"]
+                    and ticker["quoteCurrency"] in quotes
+            ):
+                resp.append(
+                    Broker.ticker(ticker["name"], ticker["baseCurrency"], ticker["quoteCurrency"])
+                )
+        return resp
+
     def verify_quantity(self, config: Config) -> NoReturn:
         pass
 
-    @retry(
-        (Exception,),
-        2,
-        3,
-        None,
-        1,
-        0,
-        logger,
-    )
+    @cached("price", "CACHE_PRICE_TTL_SECONDS", key=lambda ticker: (ticker.ticker,))
+    @retry("price", tries=2, delay=3, logger=logger)
     @FtxClient.authentication_required
     def get_current_price(self, ticker: Ticker):
         Config.NOTIFICATION_SERVICE.debug(
@@ -181,9 +239,10 @@ class FTX(FtxClient, Broker):
     @FtxClient.authentication_required
     def place_order(self, config: Config, *args, **kwargs) -> Order:
         if Config.TEST:
-            price = kwargs.get(
-                "current_price", self.get_current_price(kwargs["ticker"])
-            )
+            if "current_price" in kwargs:
+                price = kwargs["current_price"]
+            else:
+                price = self.get_current_price(kwargs["ticker"])
             return Order(
                 broker="FTX",
                 ticker=kwargs["ticker"],
@@ -205,12 +264,15 @@ class FTX(FtxClient, Broker):
             )
 
         else:
-            kwargs["market"] = kwargs["ticker"]
+            ticker = kwargs["ticker"]
+            kwargs["market"] = ticker
             del kwargs["ticker"]
             api_resp = super(FTX, self).place_order(*args, *kwargs)
+            # our own fill moves the price, get_current_price caches it by market name
+            self.cache.invalidate(("price", ticker.ticker))
             return Order(
                 broker="FTX",
-                ticker=kwargs["ticker"],
+                ticker=ticker,
                 purchase_datetime=parse(api_resp["createdAt"]),
                 price=api_resp["price"],
                 side=api_resp["side"],
@@ -239,32 +301,78 @@ class FTX(FtxClient, Broker):
     def get_rate_limit(self) -> int:
         return 1000
 
+    def get_recent_ticks(self, ticker: Ticker) -> List[Tuple[int, float, float, float]]:
+        trades = self._get(f"markets/{ticker.ticker}/trades")
+        return [
+            (t["id"], parse(t["time"]).timestamp(), float(t["price"]), float(t["size"]))
+            for t in trades
+        ]
+
 
 class Binance(BinanceClient, Broker):
+    # request weight of the hedged endpoints: the detection poll and price snapshots
+    HEDGED_WEIGHTS = {"/exchangeInfo": 10, "/ticker/price": 1}
+
     def __init__(
-            self, subaccount: str, key: str, secret: str, testnet: bool = False
+            self,
+            subaccount: str,
+            key: str,
+            secret: str,
+            testnet: bool = False,
+            api_url: Union[str, None] = None,
     ) -> NoReturn:
         self.brokerType = "BINANCE"
+        # used by the benchmarks to point at a local mock exchange
+        if api_url is not None:
+            self.API_URL = api_url
+        self.cache = BrokerCache()
         super().__init__(api_key=key, api_secret=secret, testnet=testnet)
 
-    @retry(
-        (
-                binance.exceptions.BinanceAPIException,
-                Exception,
-        ),
-        2,
-        3,
-        None,
-        1,
-        0,
-        logger,
-    )
+        self.pool = None
+        if (Config.POOL_ENABLED or Config.HEDGE_ENABLED) and api_url is None and not testnet:
+            self.pool = EndpointPool(
+                self.brokerType,
+                Config.POOL_BINANCE_HOSTS,
+                "/api/v3/ping",
+                headers=self.session.headers,
+                size=Config.POOL_SIZE,
+                probe_interval=Config.POOL_PROBE_INTERVAL_SECONDS,
+            )
+            self.session = self.pool.session()
+        if self.pool is not None and Config.HEDGE_ENABLED:
+            self.session = HedgedSession(
+                self.session,
+                self.pool,
+                self.HEDGED_WEIGHTS,
+                self.brokerType,
+                Config.HEDGE_PERCENTILE,
+                Config.HEDGE_MIN_DELAY_MS / 1000,
+                Config.HEDGE_MAX_DELAY_MS / 1000,
+            )
+
+    @cached("price", "CACHE_PRICE_TTL_SECONDS", key=lambda ticker: (ticker.ticker,))
+    @retry("price", tries=2, delay=3, logger=logger)
     def get_current_price(self, ticker: Ticker) -> float:
         Config.NOTIFICATION_SERVICE.debug(
             "Getting latest price for [{}]".format(ticker)
         )
         return float(self.get_symbol_ticker(symbol=ticker.ticker)["price"])
 
+    @cached("exchange_info", "CACHE_EXCHANGE_INFO_TTL_SECONDS")
+    def get_exchange_info(self) -> Dict:
+        """
+        Symbol filters and rate limits.  Also backs get_symbol_info, which would otherwise
+        download the whole exchange info for every order.
+        """
+        return super(Binance, self).get_exchange_info()
+
+    def get_symbol_info(self, symbol: str) -> Union[Dict, None]:
+        info = super(Binance, self).get_symbol_info(symbol)
+        # listed after the cached exchange info was fetched
+        if info is None and self.cache.invalidate(("exchange_info",)):
+            info = super(Binance, self).get_symbol_info(symbol)
+        return info
+
     def verify_quantity(self, config: Config) -> NoReturn:
         if config.QUANTITY < 11:
             Config.NOTIFICATION_SERVICE.warning(
@@ -285,20 +393,11 @@ class Binance(BinanceClient, Broker):
         kwargs["side"] = kwargs["side"].upper()
 
         params = {}
-        if kwargs["side"] == "BUY":
-            kwargs["quoteOrderQty"] = float(config.QUANTITY)
-
-            symbol_info = self.get_symbol_info(kwargs["symbol"])
-            min_notional = symbol_info['filters'][3]
-
-            if kwargs["quoteOrderQty"] <= float(min_notional["minNotional"]):
-                raise TradingBotException(
-                    f"""Quantity too low!  Binance requires [${min_notional["minNotional"]}] USDT worth of 
-                    coin for this trade."""
-                )
-
-            for p in ["quoteOrderQty", "side", "symbol", "type"]:
-                params[p] = kwargs[p]
+        armed: Union[ArmedOrder, None] = kwargs.pop("armed", None)
+        if armed is not None:
+            params = dict(armed.params)
+        elif kwargs["side"] == "BUY":
+            params = self._buy_params(config, kwargs["symbol"])
         else:
             kwargs["quantity"] = kwargs["size"]
 
@@ -326,7 +425,10 @@ class Binance(BinanceClient, Broker):
         if Config.TEST:
             # does not return anything.  No error mean request was good.
             api_resp = super(Binance, self).create_test_order(**params)
-            price = self.get_current_price(kwargs["ticker"])
+            if "current_price" in kwargs:
+                price = kwargs["current_price"]
+            else:
+                price = self.get_current_price(kwargs["ticker"])
 
             return Order(
                 broker="BINANCE",
@@ -349,7 +451,12 @@ class Binance(BinanceClient, Broker):
             )
         else:
             Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(f"LIVE ORDER PARAMS: {params}")
-            api_resp = super(Binance, self).create_order(**params)
+            if armed is not None and armed.presigned:
+                api_resp = self._send_armed(armed)
+            else:
+                api_resp = super(Binance, self).create_order(**params)
+            # our own fill moves the price
+            self.cache.invalidate(("price", kwargs["symbol"]))
             Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(api_resp)
             fill_sum = 0
             fill_count = 0
@@ -388,51 +495,108 @@ class Binance(BinanceClient, Broker):
                 trailing_stop_loss=Util.percent_change(
                     avg_fill_price, -config.TRAILING_STOP_LOSS_PERCENT
                 ),
+                # the exchange's time of the fill, the bot adds the rest of the trace
+                entry_trace=EntryTrace(filled=datetime.fromtimestamp(api_resp["transactTime"] / 1000))
+                if "transactTime" in api_resp
+                else None,
+            )
+
+    def _buy_params(self, config: Config, symbol: str) -> Dict:
+        quote_order_qty = float(config.QUANTITY)
+
+        symbol_info = self.get_symbol_info(symbol)
+        min_notional = symbol_info['filters'][3]
+
+        if quote_order_qty <= float(min_notional["minNotional"]):
+            raise TradingBotException(
+                f"""Quantity too low!  Binance requires [${min_notional["minNotional"]}] USDT worth of 
+                coin for this trade."""
             )
 
-    @retry(
-        (
-                requests.exceptions.ConnectionError,
-                requests.exceptions.HTTPError,
-                NoBrokerResponseException,
-                requests.exceptions.SSLError,
-                requests.exceptions.RequestException,
-                Exception,
-        ),
-        2,
-        0,
-        None,
-        1,
-        0,
-        logger,
-    )
-    def get_tickers(self, quote_ticker: str, **kwargs) -> Tuple[List[Ticker], Dict]:
+        return {"quoteOrderQty": quote_order_qty, "side": "BUY", "symbol": symbol, "type": "market"}
+
+    def arm_order(self, config: Config, ticker: Ticker) -> ArmedOrder:
+        """
+        Prepares the buy of a symbol that is not trading yet, see ArmedOrder
+        """
+        # rsa and ed25519 keys are left to the client to sign
+        secret = None if self.PRIVATE_KEY else self.API_SECRET
+        return ArmedOrder(ticker, self._buy_params(config, ticker.ticker), secret, datetime.now())
+
+    def _send_armed(self, armed: ArmedOrder) -> Dict:
+        body = armed.signed(int(time() * 1000 + self.timestamp_offset), self.REQUEST_RECVWINDOW)
+        self.response = self.session.post(
+            self._create_api_uri("order", True),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            data=body,
+            timeout=self.REQUEST_TIMEOUT,
+        )
+        return self._handle_response(self.response)
+
+    def get_pre_trading(self, quote_ticker: Union[str, Iterable[str]]) -> List[Ticker]:
+        """
+        Symbols listed but not trading yet, from the exchange info of the last poll
+        """
+        return self.parse_pre_trading(self.get_exchange_info(), quote_ticker)
+
+    def get_trading_status(self, symbols: List[str]) -> Dict[str, str]:
+        """
+        Status of each of symbols that is still listed, in a single request
+        """
+        api_resp = self._get("exchangeInfo", data={"symbols": json.dumps(symbols, separators=(",", ":"))})
+        return {s["symbol"]: s["status"] for s in api_resp["symbols"]}
+
+    @retry("tickers", tries=2, logger=logger)
+    def get_tickers(self, quote_ticker: Union[str, Iterable[str]], **kwargs) -> Tuple[List[Ticker], Dict]:
         api_resp = super(Binance, self).get_exchange_info()
+        # the detection poll is always fresh, but spares the next order its own download
+        self.cache.put(("exchange_info",), api_resp, Config.CACHE_EXCHANGE_INFO_TTL_SECONDS)
 
         test_retry = kwargs.get("test_retry", False)
         if test_retry:
             raise requests.exceptions.ConnectionError
 
+        return self.parse_tickers(api_resp, quote_ticker), self.response.headers
+
+    @staticmethod
+    def parse_tickers(api_resp: Dict, quote_ticker: Union[str, Iterable[str]]) -> List[Ticker]:
+        quotes = Broker.quotes(quote_ticker)
         resp = []
         for ticker in api_resp["symbols"]:
-            if ticker["isSpotTradingAllowed"] and ticker["quoteAsset"] == quote_ticker:
+            if (
+                    ticker["isSpotTradingAllowed"]
+                    and ticker["quoteAsset"] in quotes
+                    # only detected once they trade, see parse_pre_trading
+                    and ticker.get("status") != "PRE_TRADING"
+            ):
                 resp.append(
-                    Ticker(
-                        ticker=ticker["symbol"],
-                        base_ticker=ticker["baseAsset"],
-                        quote_ticker=ticker["quoteAsset"],
-                    )
+                    Broker.ticker(ticker["symbol"], ticker["baseAsset"], ticker["quoteAsset"])
                 )
+        return resp
 
-        return resp, self.response.headers
+    @staticmethod
+    def parse_pre_trading(api_resp: Dict, quote_ticker: Union[str, Iterable[str]]) -> List[Ticker]:
+        quotes = Broker.quotes(quote_ticker)
+        return [
+            Broker.ticker(ticker["symbol"], ticker["baseAsset"], ticker["quoteAsset"])
+            for ticker in api_resp["symbols"]
+            if ticker.get("status") == "PRE_TRADING" and ticker["quoteAsset"] in quotes
+        ]
 
     def get_rate_limit(self) -> int:
-        api_resp = super(Binance, self).get_exchange_info()
+        api_resp = self.get_exchange_info()
         return api_resp['rateLimits'][0]['limit']
 
+    def get_recent_ticks(self, ticker: Ticker) -> List[Tuple[int, float, float, float]]:
+        trades = super(Binance, self).get_recent_trades(symbol=ticker.ticker)
+        return [
+            (t["id"], t["time"] / 1000, float(t["price"]), float(t["qty"]))
+            for t in trades
+        ]
+
     def convert_size(self, config: Config, ticker: Ticker, price: float) -> float:
 
-        info = super(Binance, self).get_symbol_info(symbol=ticker.ticker)
+        info = self.get_symbol_info(symbol=ticker.ticker)
         step_size = info["filters"][2]["stepSize"]
         lot_size = step_size.index("1") - 1
         lot_size = max(lot_size, 0)
@@ -0,0 +1,175 @@
+"""
+Request coalescing for the broker clients.  Identical calls running at the same time share
+one request (single-flight), and the result is kept for a short time to answer the calls
+right behind it.
+"""
+import threading
+from collections import OrderedDict
+from functools import wraps
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, NoReturn, Optional, Tuple
+
+from util import Config
+
+
+class _Call:
+    def __init__(self) -> NoReturn:
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs fetch once per key at a time.  Callers arriving while it is in flight wait for it and
+    get the same result, or the same exception.
+    """
+
+    def __init__(self) -> NoReturn:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fetch: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Result of fetch and whether it was shared with a call already in flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class TTLCache:
+    """
+    At most maxsize entries, each expiring ttl seconds after it was put.  The least recently
+    used entry is evicted first.
+    """
+
+    def __init__(self, maxsize: int = 256, clock: Callable[[], float] = monotonic) -> NoReturn:
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if self.clock() >= entry[0]:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key: Hashable, value: Any, ttl: float) -> NoReturn:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> bool:
+        """
+        Drops key, every entry if None.  True if anything was dropped.
+        """
+        with self._lock:
+            if key is None:
+                dropped = bool(self._entries)
+                self._entries.clear()
+                return dropped
+            return self._entries.pop(key, None) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class BrokerCache:
+    """
+    SingleFlight in front of a TTLCache, one per broker client
+    """
+
+    def __init__(self, maxsize: Optional[int] = None, clock: Callable[[], float] = monotonic) -> NoReturn:
+        self.cache = TTLCache(maxsize if maxsize is not None else Config.CACHE_MAX_ENTRIES, clock)
+        self.flight = SingleFlight()
+        # bumped by invalidate, so a fetch started before it is not cached
+        self._generation = 0
+
+        self.hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, ttl: float, fetch: Callable[[], Any]) -> Any:
+        hit, value = self.cache.get(key)
+        if hit:
+            self.hits += 1
+            return value
+
+        generation = self._generation
+
+        def _fetch():
+            result = fetch()
+            # a missing price is retried by the next caller, not cached
+            if result is not None and generation == self._generation:
+                self.cache.put(key, result, ttl)
+            return result
+
+        value, shared = self.flight.do(key, _fetch)
+        if shared:
+            self.shared += 1
+        else:
+            self.misses += 1
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: float) -> NoReturn:
+        self.cache.put(key, value, ttl)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> bool:
+        self._generation += 1
+        return self.cache.invalidate(key)
+
+    def report(self) -> str:
+        return f"CACHE: [{self.hits}] hits, [{self.shared}] shared in flight, [{self.misses}] fetched"
+
+
+def cached(name: str, ttl_setting: str, key: Callable[..., Hashable] = lambda *args: args):
+    """
+    Coalesces calls to a broker method through its BrokerCache.
+
+    :param name: first part of the cache key.
+    :param ttl_setting: Config attribute holding the time to live in seconds, 0 to only share
+                        calls in flight.
+    :param key: builds the rest of the cache key from the method's positional arguments.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(self, *args, **kwargs):
+            cache: Optional[BrokerCache] = getattr(self, "cache", None)
+            if cache is None or kwargs:
+                return f(self, *args, **kwargs)
+            return cache.get((name, *key(*args)), getattr(Config, ttl_setting), lambda: f(self, *args))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,219 @@
+import math
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NoReturn, Optional, Tuple, Union
+
+from broker.simulated import SimulatedBroker
+from util import Config
+from util.exceptions import RateLimitExceededException
+from util.models import BrokerType, EntryTrace, Ticker
+
+# request weights, following Binance's
+WEIGHTS = {"tickers": 10, "price": 1, "order": 1, "trades": 1}
+
+
+class ListingSchedule:
+    """
+    When new symbols go live.  Either an explicit list of (timestamp, base ticker) or one
+    listing every interval_minutes at second_offset of the minute.
+    """
+
+    def __init__(
+        self,
+        start: float,
+        interval_minutes: Optional[int] = 5,
+        second_offset: float = 0,
+        listings: Optional[List[Tuple[float, str]]] = None,
+    ) -> NoReturn:
+        self.start = start
+        self.interval_minutes = interval_minutes
+        self.second_offset = second_offset
+        self.listings = sorted(listings or [])
+        self._count = 0
+
+    def due(self, now: float) -> List[Tuple[float, str]]:
+        """
+        Listings that went live since the last call
+        """
+        due = []
+        while self.listings and self.listings[0][0] <= now:
+            due.append(self.listings.pop(0))
+
+        if self.interval_minutes:
+            period = self.interval_minutes * 60
+            first = (self.start // period + 1) * period + self.second_offset
+            while first + self._count * period <= now:
+                self._count += 1
+                due.append((first + (self._count - 1) * period, f"NEW{self._count}"))
+        return due
+
+
+class PricePath:
+    """
+    Seeded random walk with a listing pump that peaks after pump_seconds and fades away.
+    Prices are generated lazily for whatever times they are requested at.
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        start_price: float,
+        listed_at: float,
+        pump_percent: float = 50,
+        pump_seconds: float = 60,
+        volatility: float = 0.005,
+    ) -> NoReturn:
+        self._rng = random.Random(seed)
+        self.start_price = start_price
+        self.listed_at = listed_at
+        self.pump = math.log(1 + pump_percent / 100)
+        self.pump_seconds = pump_seconds
+        self.volatility = volatility
+        self._t = listed_at
+        self._noise = 0.0
+
+    def price_at(self, t: float) -> float:
+        dt = t - self._t
+        if dt > 0:
+            self._noise += self.volatility * math.sqrt(dt) * self._rng.gauss(0, 1)
+            self._t = t
+        x = max(t - self.listed_at, 0) / self.pump_seconds
+        return self.start_price * math.exp(self.pump * x * math.exp(1 - x) + self._noise)
+
+
+class PaperExchange(SimulatedBroker):
+    """
+    Local exchange for TEST mode.  Unlike SimulatedBroker it runs on its own: symbols are
+    listed by a ListingSchedule, prices come from PricePaths, every request pays the
+    latency model and is charged against a per-minute weight budget reported through the
+    same headers Binance sends.  No network access is made.
+
+    It stands in for the Binance / FTX clients as a whole, so their order building and
+    response parsing are not exercised.  tests/test_bot.py covers those against the testnets
+    and needs auth/auth.yml.
+    """
+
+    def __init__(
+        self,
+        broker_type: BrokerType = "BINANCE",
+        quote_ticker: str = "USDT",
+        existing_tickers: int = 50,
+        schedule: Optional[ListingSchedule] = None,
+        seed: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        fee_percent: float = 0.1,
+        slippage_percent: float = 0.05,
+        rate_limit: int = 1200,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> NoReturn:
+        super().__init__(broker_type, fee_percent, slippage_percent, rate_limit)
+        self.quote_ticker = quote_ticker
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.clock = clock
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        self.paths: Dict[str, PricePath] = {}
+        self._weight_minute = None
+
+        start = clock()
+        self.schedule = schedule or ListingSchedule(start)
+        for i in range(existing_tickers):
+            self._list(f"COIN{i}", start - 86400, pump_percent=0)
+        self.set_time(start)
+
+    @classmethod
+    def from_config(cls, broker: BrokerType) -> "PaperExchange":
+        return cls(
+            broker,
+            quote_ticker=Config.PAPER_QUOTE_TICKER,
+            schedule=ListingSchedule(
+                time.time(),
+                Config.PAPER_LISTING_INTERVAL_MINUTES,
+                Config.PAPER_LISTING_SECOND,
+            ),
+            seed=Config.PAPER_SEED,
+            latency_ms=Config.PAPER_LATENCY_MS,
+            jitter_ms=Config.PAPER_JITTER_MS,
+            fee_percent=Config.PAPER_FEE_PERCENT,
+            slippage_percent=Config.PAPER_SLIPPAGE_PERCENT,
+        )
+
+    def symbol(self, base: str) -> str:
+        if self.brokerType == "FTX":
+            return f"{base}/{self.quote_ticker}"
+        return f"{base}{self.quote_ticker}"
+
+    def _list(self, base: str, listed_at: float, pump_percent: float = 50) -> NoReturn:
+        ticker = Ticker(
+            ticker=self.symbol(base), base_ticker=base, quote_ticker=self.quote_ticker
+        )
+        self.paths[ticker.ticker] = PricePath(
+            self._rng.randrange(2 ** 32),
+            10 ** self._rng.uniform(-3, 2),
+            listed_at,
+            pump_percent=pump_percent,
+        )
+        self.list_ticker(ticker)
+
+    def _request(self, endpoint: str) -> float:
+        """
+        Every public method goes through here: latency, weight accounting, then the clock
+        moves and any due listings go live
+        """
+        delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        if delay > 0:
+            self.sleep(delay / 1000)
+
+        now = self.clock()
+        minute = int(now // 60)
+        if minute != self._weight_minute:
+            self._weight_minute = minute
+            self.used_weight = 0
+        self.used_weight += WEIGHTS[endpoint]
+        if self.used_weight > self.rate_limit:
+            raise RateLimitExceededException(
+                f"[{self.brokerType}] Paper exchange weight {self.used_weight} above {self.rate_limit}",
+                retry_after=60 - now % 60,
+            )
+
+        self.set_time(now)
+        for listed_at, base in self.schedule.due(now):
+            self._list(base, listed_at)
+        return now
+
+    def headers(self) -> Dict[str, str]:
+        # FTX does not report weights
+        return super().headers() if self.brokerType == "BINANCE" else {}
+
+    def get_time(self) -> datetime:
+        return datetime.fromtimestamp(self.clock())
+
+    def get_tickers(self, quote_ticker: Union[str, Iterable[str]], **kwargs) -> Tuple[List[Ticker], Dict]:
+        self._request("tickers")
+        return super().get_tickers(quote_ticker, **kwargs)
+
+    def get_current_price(self, ticker: Ticker) -> float:
+        now = self._request("price")
+        self.set_price(ticker.ticker, self.paths[ticker.ticker].price_at(now))
+        return super().get_current_price(ticker)
+
+    def place_order(self, config: Config, *args, **kwargs):
+        now = self._request("order")
+        ticker = kwargs["ticker"]
+        # market orders fill at the exchange's price, not the caller's last seen price
+        kwargs["current_price"] = self.paths[ticker.ticker].price_at(now)
+        self.set_price(ticker.ticker, kwargs["current_price"])
+        order = super().place_order(config, *args, **kwargs)
+        order.status = "TEST_MODE"
+        # filled when the request reached the exchange, like Binance's transactTime
+        order.entry_trace = EntryTrace(filled=datetime.fromtimestamp(now))
+        return order
+
+    def get_recent_ticks(self, ticker: Ticker) -> List[Tuple[int, float, float, float]]:
+        now = self._request("trades")
+        return [(0, now, self.paths[ticker.ticker].price_at(now), 0.0)]
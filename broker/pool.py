@@ -0,0 +1,235 @@
+"""
+Keeps warm keep-alive connections to the fastest API hosts of a broker.  A client's
+requests session is replaced with EndpointPool.session(), which sends every request to the
+best ranked host over that host's own session.
+"""
+import logging
+import socket
+import threading
+from collections import deque
+from time import monotonic, perf_counter
+from typing import Callable, Deque, Dict, List, NoReturn, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from util import Config
+
+logger = logging.getLogger(__name__)
+
+# latency charged to a host for a failed request, in seconds
+ERROR_PENALTY = 5.0
+
+
+class DNSCache:
+    """
+    Caches socket.getaddrinfo for the registered hostnames only, so connecting to an API host
+    never waits on a resolver.  Entries are refreshed after ttl seconds, POOL_DNS_TTL_SECONDS
+    if None; a failed refresh keeps serving the old addresses.
+    """
+
+    def __init__(self, ttl: Optional[float] = None) -> NoReturn:
+        self.ttl = ttl
+        self.hostnames: Set[str] = set()
+        self._entries: Dict[Tuple, Tuple[float, List]] = {}
+        self._getaddrinfo: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    def install(self) -> NoReturn:
+        with self._lock:
+            if self._getaddrinfo is None:
+                self._getaddrinfo = socket.getaddrinfo
+                socket.getaddrinfo = self.getaddrinfo
+
+    def uninstall(self) -> NoReturn:
+        with self._lock:
+            if self._getaddrinfo is not None:
+                socket.getaddrinfo = self._getaddrinfo
+                self._getaddrinfo = None
+
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        resolve = self._getaddrinfo or socket.getaddrinfo
+        if host not in self.hostnames:
+            return resolve(host, port, *args, **kwargs)
+
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        cached = self._entries.get(key)
+        ttl = self.ttl if self.ttl is not None else Config.POOL_DNS_TTL_SECONDS
+        if cached is not None and monotonic() - cached[0] < ttl:
+            return cached[1]
+        try:
+            result = resolve(host, port, *args, **kwargs)
+        except socket.gaierror:
+            if cached is None:
+                raise
+            logger.warning(f"Resolving [{host}] failed, using cached addresses")
+            return cached[1]
+        self._entries[key] = (monotonic(), result)
+        return result
+
+
+DNS_CACHE = DNSCache()
+
+
+class Host:
+    def __init__(self, url: str, session: requests.Session, samples: int = 100) -> NoReturn:
+        self.url = url.rstrip("/")
+        self.session = session
+        self.latencies: Deque[float] = deque(maxlen=samples)
+
+    @property
+    def hostname(self) -> str:
+        return urlsplit(self.url).hostname
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)]
+
+    def rank(self) -> float:
+        median = self.percentile(50)
+        return median if median is not None else float("inf")
+
+    def target(self, url: str) -> str:
+        """
+        url moved onto this host
+        """
+        parts = urlsplit(url)
+        host = urlsplit(self.url)
+        return urlunsplit((host.scheme, host.netloc, parts.path, parts.query, parts.fragment))
+
+
+class EndpointPool:
+    """
+    One session per API host, each keeping up to size keep-alive connections.  probe() times
+    probe_path on every host to rank them, warm() opens connections to the best size hosts.
+    Both block, main.forever runs them off the event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        hosts: List[str],
+        probe_path: str,
+        headers: Optional[Dict] = None,
+        size: int = 2,
+        probe_interval: float = 60,
+        session_factory: Callable[[], requests.Session] = requests.Session,
+        dns_cache: Optional[DNSCache] = DNS_CACHE,
+    ) -> NoReturn:
+        self.name = name
+        self.probe_path = probe_path
+        self.size = size
+        self.probe_interval = probe_interval
+        self.headers = headers if headers is not None else {}
+        self.last_probe: Optional[float] = None
+
+        self.hosts: List[Host] = []
+        for url in hosts:
+            session = session_factory()
+            if isinstance(session, requests.Session):
+                session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+            # shares the API key and any headers the client sets later
+            session.headers = self.headers
+            self.hosts.append(Host(url, session))
+
+        self.dns_cache = dns_cache
+        if dns_cache is not None:
+            dns_cache.hostnames.update(h.hostname for h in self.hosts)
+            dns_cache.install()
+
+    def ranked(self) -> List[Host]:
+        # stable, so hosts without samples keep their configured order
+        return sorted(self.hosts, key=Host.rank)
+
+    def best(self) -> Host:
+        return self.ranked()[0]
+
+    def request(self, host: Host, method: str, url: str, **kwargs) -> requests.Response:
+        start = perf_counter()
+        try:
+            response = host.session.request(method, host.target(url), **kwargs)
+        except BaseException:
+            host.latencies.append(ERROR_PENALTY)
+            raise
+        host.latencies.append(perf_counter() - start)
+        return response
+
+    def _ping(self, host: Host) -> NoReturn:
+        try:
+            self.request(host, "GET", host.url + self.probe_path, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"[{self.name}] probing [{host.url}] failed: {e!r}")
+
+    def probe(self) -> NoReturn:
+        for host in self.hosts:
+            self._ping(host)
+        self.last_probe = monotonic()
+        logger.debug(f"[{self.name}] hosts ranked: {self.report()}")
+
+    def warm(self) -> NoReturn:
+        """
+        Leaves an open connection to each of the best size hosts
+        """
+        for host in self.ranked()[: self.size]:
+            self._ping(host)
+
+    def probe_due(self) -> bool:
+        return self.last_probe is None or monotonic() - self.last_probe >= self.probe_interval
+
+    def session(self) -> "PooledSession":
+        return PooledSession(self)
+
+    def report(self) -> str:
+        return ", ".join(
+            f"{h.url} {h.percentile(50) * 1000:.1f}ms" if h.latencies else f"{h.url} -" for h in self.ranked()
+        )
+
+    def close(self) -> NoReturn:
+        for h in self.hosts:
+            h.session.close()
+
+
+class PooledSession:
+    """
+    The subset of requests.Session the broker clients use, routed to the best host of a pool
+    """
+
+    def __init__(self, pool: EndpointPool) -> NoReturn:
+        self.pool = pool
+
+    @property
+    def headers(self) -> Dict:
+        return self.pool.headers
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.pool.request(self.pool.best(), method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        host = self.pool.best()
+        request.url = host.target(request.url)
+        start = perf_counter()
+        try:
+            response = host.session.send(request, **kwargs)
+        except BaseException:
+            host.latencies.append(ERROR_PENALTY)
+            raise
+        host.latencies.append(perf_counter() - start)
+        return response
+
+    def close(self) -> NoReturn:
+        self.pool.close()
@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, NoReturn, Optional, Tuple, Union
+
+from broker.broker import Broker
+from util import Config, Util
+from util.exceptions import GetPriceNoneResponse
+from util.models import BrokerType, Ticker, Order
+
+
+class SimulatedBroker(Broker):
+    """
+    In-memory broker driven by whoever owns it.  Listings and prices are pushed in with
+    list_ticker / set_price and the clock only moves when they are called, so the same
+    inputs always produce the same orders.  brokerType decides which Bot code path is
+    exercised (FTX sizes orders before placing them, Binance after).
+    """
+
+    def __init__(
+        self,
+        broker_type: BrokerType = "BINANCE",
+        fee_percent: float = 0.0,
+        slippage_percent: float = 0.0,
+        rate_limit: int = 1200,
+    ) -> NoReturn:
+        self.brokerType = broker_type
+        self.fee_percent = fee_percent
+        self.slippage_percent = slippage_percent
+        self.rate_limit = rate_limit
+
+        self.now = datetime.fromtimestamp(0)
+        self.tickers: Dict[str, Ticker] = {}
+        self.prices: Dict[str, float] = {}
+        self.orders: List[Order] = []
+        self.fees = 0.0
+        self.used_weight = 0
+
+    # driver side
+    def set_time(self, timestamp: float) -> NoReturn:
+        self.now = datetime.fromtimestamp(timestamp)
+
+    def list_ticker(self, ticker: Ticker, price: Optional[float] = None) -> NoReturn:
+        self.tickers[ticker.ticker] = ticker
+        if price is not None:
+            self.prices[ticker.ticker] = price
+
+    def delist_ticker(self, symbol: str) -> NoReturn:
+        self.tickers.pop(symbol, None)
+        self.prices.pop(symbol, None)
+
+    def set_price(self, symbol: str, price: float) -> NoReturn:
+        self.prices[symbol] = price
+
+    def headers(self) -> Dict[str, str]:
+        return {"x-mbx-used-weight-1m": str(self.used_weight)}
+
+    # Broker interface
+    def verify_quantity(self, config: Config) -> NoReturn:
+        pass
+
+    def get_tickers(self, quote_ticker: Union[str, Iterable[str]], **kwargs) -> Tuple[List[Ticker], Dict]:
+        quotes = self.quotes(quote_ticker)
+        return (
+            [t for t in self.tickers.values() if t.quote_ticker in quotes],
+            self.headers(),
+        )
+
+    def get_current_price(self, ticker: Ticker) -> float:
+        try:
+            return self.prices[ticker.ticker]
+        except KeyError:
+            raise GetPriceNoneResponse(f"No price for {ticker.ticker}")
+
+    def place_order(self, config: Config, *args, **kwargs) -> Order:
+        ticker: Ticker = kwargs["ticker"]
+        side = kwargs["side"].upper()
+        market_price = kwargs.get("current_price") or self.get_current_price(ticker)
+
+        slippage = self.slippage_percent if side == "BUY" else -self.slippage_percent
+        price = Util.percent_change(market_price, slippage)
+        size = kwargs.get("size") or config.QUANTITY / price
+        self.fees += price * size * self.fee_percent / 100
+
+        order = Order(
+            broker=self.brokerType,
+            ticker=ticker,
+            purchase_datetime=self.now,
+            price=price,
+            side=side,
+            size=size,
+            type="market",
+            status="SIMULATED",
+            take_profit=Util.percent_change(price, config.TAKE_PROFIT_PERCENT),
+            stop_loss=Util.percent_change(price, -config.STOP_LOSS_PERCENT),
+            trailing_stop_loss_activated=False,
+            trailing_stop_loss_max=Util.percent_change(
+                price, config.TRAILING_STOP_LOSS_ACTIVATION
+            ),
+            trailing_stop_loss=Util.percent_change(
+                price, -config.TRAILING_STOP_LOSS_PERCENT
+            ),
+        )
+        self.orders.append(order)
+        return order
+
+    def convert_size(self, config: Config, ticker: Ticker, price: float) -> float:
+        return config.QUANTITY / price
+
+    def get_rate_limit(self) -> int:
+        return self.rate_limit
+
+    def get_time(self) -> datetime:
+        return self.now
+
+    def get_recent_ticks(self, ticker: Ticker) -> List[Tuple[int, float, float, float]]:
+        return [(0, self.now.timestamp(), self.get_current_price(ticker), 0.0)]
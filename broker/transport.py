@@ -0,0 +1,127 @@
+"""
+Hedged GET requests over several equivalent API hosts.  Used as the requests session of a
+broker client: matching GETs go to the fastest host, and if it has not answered within its
+recent latency percentile a duplicate goes to the next fastest.  The first response wins.
+"""
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from time import perf_counter
+from typing import Dict, NoReturn, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from broker.pool import EndpointPool, Host
+from util import Config
+from util.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedSession:
+    """
+    Wraps a requests.Session.  GETs whose path ends with a key of weights are hedged over the
+    hosts of pool, everything else goes to the wrapped session unchanged.  A hedge is only
+    sent while the rate weight it costs stays under RATE_INTERVENTION_PERCENTAGE of the
+    limit, and is added to Config.auto_rate_current_weight.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        pool: EndpointPool,
+        weights: Dict[str, int],
+        name: str,
+        percentile: float = 90,
+        min_delay: float = 0.005,
+        max_delay: float = 0.25,
+    ) -> NoReturn:
+        self.session = session
+        self.pool = pool
+        self.weights = weights
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * len(pool.hosts), thread_name_prefix=f"hedge-{name}"
+        )
+
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+
+    def __getattr__(self, item):
+        return getattr(self.session, item)
+
+    def hedge_delay(self, host: Host) -> float:
+        latency = host.percentile(self.percentile)
+        if latency is None:
+            return self.max_delay
+        return min(max(latency, self.min_delay), self.max_delay)
+
+    def _weight(self, url: str) -> Optional[int]:
+        path = urlsplit(url).path
+        for suffix, weight in self.weights.items():
+            if path.endswith(suffix):
+                return weight
+        return None
+
+    def _charge(self, weight: int) -> bool:
+        threshold = Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100
+        if Config.auto_rate_current_weight + weight >= threshold:
+            self.skipped += 1
+            return False
+        Config.auto_rate_current_weight += weight
+        return True
+
+    @staticmethod
+    def _discard(future: Future) -> NoReturn:
+        if not future.cancel():
+            future.add_done_callback(
+                lambda f: f.result().close() if f.exception() is None else None
+            )
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        weight = self._weight(url)
+        if weight is None or len(self.pool.hosts) < 2:
+            return self.session.get(url, **kwargs)
+
+        start = perf_counter()
+        self.requests += 1
+        primary, secondary = self.pool.ranked()[:2]
+        futures = [self._executor.submit(self.pool.request, primary, "GET", url, **kwargs)]
+        # a primary that fails early is hedged at once
+        wait(futures, timeout=self.hedge_delay(primary))
+        if (not futures[0].done() or futures[0].exception() is not None) and self._charge(weight):
+            self.hedged += 1
+            futures.append(self._executor.submit(self.pool.request, secondary, "GET", url, **kwargs))
+
+        pending = set(futures)
+        winner = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in futures if f in done and f.exception() is None), None)
+        for f in pending:
+            self._discard(f)
+
+        Metrics.record(self.name, "hedged_fetch", perf_counter() - start)
+        if winner is None:
+            # both failed, the primary's error is the one worth reporting
+            raise futures[0].exception()
+        if winner is not futures[0]:
+            self.hedge_wins += 1
+        return winner.result()
+
+    def report(self) -> str:
+        tail = Metrics.histogram(self.name, "hedged_fetch")
+        return (
+            f"[{self.name}] HEDGING: [{self.requests}] requests, [{self.hedged}] hedged, "
+            f"[{self.hedge_wins}] won by the hedge, [{self.skipped}] skipped for rate weight, "
+            f"p99 [{tail.percentile(99) * 1000:.1f}] ms\n\t{self.pool.report()}"
+        )
+
+    def close(self) -> NoReturn:
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,4 @@
+from fleet.executor import FleetExecutor
+from fleet.poller import Poller
+
+__all__ = ["FleetExecutor", "Poller"]
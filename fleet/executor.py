@@ -0,0 +1,124 @@
+"""
+The trading side of a fleet.  Listens for pollers, spreads their polls evenly over the poll
+interval, and buys the listings they report with the bots of this process.
+"""
+import asyncio
+import logging
+import time
+import traceback
+from typing import Dict, List, NoReturn, Optional
+
+from fleet import protocol
+from util import Config
+from util.exceptions import FleetProtocolException
+from util.metrics import Metrics
+from util.models import Ticker
+
+logger = logging.getLogger(__name__)
+
+
+class FleetExecutor:
+    """
+    bots are the detecting bots of this process, one per broker.  A listing is bought once,
+    by whichever poller reports it first; the others are dropped against the bot's
+    ticker_seen_dict.
+    """
+
+    def __init__(self, bots: List, address: str, interval: Optional[float] = None) -> NoReturn:
+        self.bots = {bot.broker.brokerType: bot for bot in bots}
+        self.address = address
+        # None follows FREQUENCY_SECONDS
+        self.interval = interval
+        self.server: Optional[asyncio.AbstractServer] = None
+        # connected pollers of each broker, in order of arrival
+        self.pollers: Dict[str, Dict[str, asyncio.StreamWriter]] = {}
+
+        self.events = 0
+        self.duplicates = 0
+
+    async def start(self) -> NoReturn:
+        self.server = await protocol.serve(self.address, self._handle)
+        Config.NOTIFICATION_SERVICE.info(f"Fleet executor listening on {self.address}")
+
+    def close(self) -> NoReturn:
+        if self.server is not None:
+            self.server.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> NoReturn:
+        name, broker = None, None
+        try:
+            message = await protocol.receive(reader)
+            if message is None or message["type"] != protocol.HELLO or message["broker"] not in self.bots:
+                return
+            name, broker = message["poller"], message["broker"]
+            self.pollers.setdefault(broker, {})[name] = writer
+            Config.NOTIFICATION_SERVICE.info(f"[{broker}]\tPoller [{name}] joined")
+            await self._rebalance(broker)
+
+            while True:
+                message = await protocol.receive(reader)
+                if message is None:
+                    break
+                if message["type"] == protocol.LISTING:
+                    self.receive_listing(message)
+        except (ConnectionError, FleetProtocolException) as e:
+            logger.warning(f"Poller [{name}] dropped: {e!r}")
+        finally:
+            writer.close()
+            if broker is not None and self.pollers.get(broker, {}).get(name) is writer:
+                del self.pollers[broker][name]
+                Config.NOTIFICATION_SERVICE.info(f"[{broker}]\tPoller [{name}] left")
+                await self._rebalance(broker)
+
+    async def _rebalance(self, broker: str) -> NoReturn:
+        """
+        Gives each poller of broker its own slot of the poll interval
+        """
+        pollers = list(self.pollers.get(broker, {}).values())
+        interval = self.interval if self.interval is not None else Config.FREQUENCY_SECONDS
+        for index, writer in enumerate(pollers):
+            try:
+                await protocol.send(writer, protocol.phase(index, len(pollers), interval))
+            except ConnectionError:
+                pass
+
+    def receive_listing(self, message: Dict) -> List[Ticker]:
+        """
+        Buys the tickers of a listing event not seen before, returns them
+        """
+        self.events += 1
+        bot = self.bots.get(message["broker"])
+        if bot is None:
+            return []
+        Metrics.record(bot.broker.brokerType, "fleet_event", max(time.time() - message["observed"], 0))
+
+        tickers = [Ticker.parse_obj(t) for t in message["tickers"]]
+        new_tickers = [t for t in tickers if t.ticker not in bot.ticker_seen_dict]
+        self.duplicates += len(tickers) - len(new_tickers)
+        if not new_tickers:
+            return []
+
+        observed = bot.broker.get_time()
+        for new_ticker in new_tickers:
+            bot.ticker_seen_dict[new_ticker.ticker] = True
+            bot._observed[new_ticker.ticker] = observed
+            bot.flight.record("NEW", new_ticker.ticker, detail=f"poller={message['poller']}")
+        Config.NOTIFICATION_SERVICE.info(
+            f"[{bot.broker.brokerType}]\tNew tickers reported by [{message['poller']}]: {new_tickers}"
+        )
+
+        try:
+            bot.dispatch(new_tickers)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            # the broker exceptions are BaseExceptions, one bad buy must not drop the poller
+            Config.NOTIFICATION_SERVICE.error(traceback.format_exc())
+        if bot.recorder is not None:
+            for new_ticker in new_tickers:
+                bot.recorder.watch(new_ticker)
+        return new_tickers
+
+    def report(self) -> str:
+        pollers = ", ".join(f"{b} [{len(p)}]" for b, p in self.pollers.items())
+        return f"FLEET: pollers {pollers}, [{self.events}] events, [{self.duplicates}] duplicate tickers"
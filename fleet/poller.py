@@ -0,0 +1,175 @@
+"""
+A detection-only process of a fleet.  Polls the tickers of one broker in the slot of the poll
+interval it is given by the executor and reports every new one, so n pollers on the same
+interval detect a listing up to n times sooner than one.
+
+    python -m fleet.poller --broker BINANCE --connect tcp://127.0.0.1:7777 --name poller-1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Iterable, List, NoReturn, Optional, Set
+
+from broker import Broker
+from fleet import protocol
+from util import Config, Util
+from util.exceptions import CircuitOpenException, FleetProtocolException, RateLimitExceededException
+from util.models import Ticker
+
+logger = logging.getLogger(__name__)
+
+
+def next_slot(now: float, index: int, count: int, interval: float) -> float:
+    """
+    Seconds from now until the next poll of poller index out of count, the polls of all
+    pollers being spread evenly over interval
+    """
+    offset = interval * index / max(count, 1)
+    return (offset - now) % interval
+
+
+class Poller:
+    def __init__(self, client, quotes: Iterable[str], address: str, name: str) -> NoReturn:
+        self.broker = client
+        self.quotes = list(quotes)
+        self.address = address
+        self.name = name
+
+        # assigned by the executor
+        self.index: Optional[int] = None
+        self.count = 1
+        self.interval = float(Config.FREQUENCY_SECONDS)
+        self._phase = asyncio.Event()
+
+        self.seen: Optional[Set[str]] = None
+        self.polls = 0
+        self.skipped = 0
+        self._running = True
+
+    def poll(self) -> List[Ticker]:
+        """
+        Tickers listed since the previous poll.  The first poll only records what is listed.
+        """
+        tickers, headers = self.broker.get_tickers(self.quotes)
+        self.polls += 1
+        if "x-mbx-used-weight-1m" in headers:
+            Config.auto_rate_current_weight = int(headers["x-mbx-used-weight-1m"])
+        if tickers is None:
+            return []
+        if self.seen is None:
+            self.seen = {t.ticker for t in tickers}
+            return []
+        new_tickers = [t for t in tickers if t.ticker not in self.seen]
+        self.seen.update(t.ticker for t in new_tickers)
+        return new_tickers
+
+    def over_weight(self) -> bool:
+        return Config.auto_rate_current_weight >= (
+            Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100
+        )
+
+    async def run(self) -> NoReturn:
+        """
+        Polls until stop, reconnecting to the executor after FLEET_RECONNECT_SECONDS whenever
+        the connection is lost
+        """
+        while self._running:
+            try:
+                reader, writer = await protocol.connect(self.address)
+            except OSError as e:
+                logger.warning(f"[{self.name}] cannot reach executor at {self.address}: {e!r}")
+                await asyncio.sleep(Config.FLEET_RECONNECT_SECONDS)
+                continue
+
+            listener = asyncio.ensure_future(self._listen(reader))
+            try:
+                await protocol.send(writer, protocol.hello(self.name, self.broker.brokerType))
+                await self._poll_forever(writer, listener)
+            except (ConnectionError, FleetProtocolException) as e:
+                logger.warning(f"[{self.name}] lost executor: {e!r}")
+            finally:
+                listener.cancel()
+                writer.close()
+                self.index = None
+                self._phase.clear()
+            if self._running:
+                await asyncio.sleep(Config.FLEET_RECONNECT_SECONDS)
+
+    def stop(self) -> NoReturn:
+        self._running = False
+
+    async def _listen(self, reader: asyncio.StreamReader) -> NoReturn:
+        while True:
+            message = await protocol.receive(reader)
+            if message is None:
+                return
+            if message["type"] == protocol.PHASE:
+                self.index, self.count = message["index"], message["count"]
+                self.interval = float(message["interval"])
+                self._phase.set()
+
+    async def _poll_forever(self, writer: asyncio.StreamWriter, listener: asyncio.Future) -> NoReturn:
+        loop = asyncio.get_event_loop()
+        last_slot = None
+        while self._running:
+            await self._phase.wait()
+            now = time.time()
+            slot = now + next_slot(now, self.index, self.count, self.interval)
+            # a fast poll can finish inside the slot it was started in
+            if last_slot is not None and slot - last_slot < self.interval / max(self.count, 1) / 2:
+                slot += self.interval
+            await asyncio.sleep(slot - now)
+            last_slot = slot
+            if listener.done():
+                raise ConnectionError("executor closed the connection")
+            if self.over_weight():
+                self.skipped += 1
+                continue
+
+            try:
+                new_tickers = await loop.run_in_executor(None, self.poll)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except (CircuitOpenException, RateLimitExceededException) as e:
+                # the broker is backing off, skip the slot
+                logger.warning(f"[{self.name}] {e.message}")
+                self.skipped += 1
+                continue
+            except BaseException as e:
+                # the broker exceptions are BaseExceptions, a failed poll must not end the poller
+                logger.error(f"[{self.name}] poll failed: {e!r}")
+                self.skipped += 1
+                continue
+            if new_tickers:
+                await protocol.send(
+                    writer, protocol.listing(self.name, self.broker.brokerType, time.time(), new_tickers)
+                )
+
+
+def main() -> NoReturn:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default="BINANCE")
+    parser.add_argument("--connect", default=None, help="executor address, FLEET_ADDRESS by default")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}")
+    args = parser.parse_args()
+
+    Config.load_global_config()
+    Util.setup_logging(name="new-coin-bot-poller", level=Config.PROGRAM_OPTIONS["LOG_LEVEL"])
+    config = Config(args.broker)
+    poller = Poller(
+        Broker.factory(args.broker),
+        config.quote_configs(),
+        args.connect or Config.FLEET_ADDRESS,
+        args.name,
+    )
+    try:
+        asyncio.get_event_loop().run_until_complete(poller.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Messages between pollers and the executor: one JSON object per line.
+
+    poller   -> executor  {"type": "hello", "poller": name, "broker": broker}
+    executor -> poller    {"type": "phase", "index": i, "count": n, "interval": seconds}
+    poller   -> executor  {"type": "listing", "poller": name, "broker": broker, "observed": ts,
+                           "tickers": [ticker, ...]}
+
+Addresses are tcp://host:port or unix:///path/to/socket.
+"""
+import asyncio
+import json
+from typing import Dict, List, NoReturn, Optional, Tuple
+from urllib.parse import urlsplit
+
+from util.exceptions import FleetProtocolException
+from util.models import Ticker
+
+HELLO = "hello"
+PHASE = "phase"
+LISTING = "listing"
+
+# longest accepted line, a listing of a few hundred tickers fits easily
+LIMIT = 2 ** 20
+
+
+def encode(message: Dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode(line: bytes) -> Dict:
+    try:
+        message = json.loads(line)
+    except ValueError:
+        raise FleetProtocolException(f"Invalid message: {line[:100]!r}")
+    if not isinstance(message, dict) or "type" not in message:
+        raise FleetProtocolException(f"Invalid message: {line[:100]!r}")
+    return message
+
+
+def hello(poller: str, broker: str) -> Dict:
+    return {"type": HELLO, "poller": poller, "broker": broker}
+
+
+def phase(index: int, count: int, interval: float) -> Dict:
+    return {"type": PHASE, "index": index, "count": count, "interval": interval}
+
+
+def listing(poller: str, broker: str, observed: float, tickers: List[Ticker]) -> Dict:
+    return {
+        "type": LISTING,
+        "poller": poller,
+        "broker": broker,
+        "observed": observed,
+        "tickers": [t.dict() for t in tickers],
+    }
+
+
+def parse_address(address: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """
+    ("tcp", host, port) or ("unix", path, None)
+    """
+    parts = urlsplit(address)
+    if parts.scheme == "tcp":
+        return "tcp", parts.hostname, parts.port
+    if parts.scheme == "unix":
+        return "unix", parts.path, None
+    raise FleetProtocolException(f"Unsupported fleet address [{address}]")
+
+
+async def connect(address: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(host, limit=LIMIT)
+    return await asyncio.open_connection(host, port, limit=LIMIT)
+
+
+async def serve(address: str, handler) -> asyncio.AbstractServer:
+    kind, host, port = parse_address(address)
+    if kind == "unix":
+        return await asyncio.start_unix_server(handler, host, limit=LIMIT)
+    return await asyncio.start_server(handler, host, port, limit=LIMIT)
+
+
+async def send(writer: asyncio.StreamWriter, message: Dict) -> NoReturn:
+    writer.write(encode(message))
+    await writer.drain()
+
+
+async def receive(reader: asyncio.StreamReader) -> Optional[Dict]:
+    """
+    Next message, None once the other side closed the connection
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    return decode(line)
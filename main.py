@@ -1,22 +1,44 @@
 import asyncio
 import logging
+import signal
 import traceback
 from datetime import datetime
 from typing import List
 
 from bot import Bot
+from fleet import FleetExecutor
 from util import Config, Util
-
-Config.load_global_config()
-
-# setup logging
-Util.setup_logging(name="new-coin-bot", level=Config.PROGRAM_OPTIONS["LOG_LEVEL"])
-logging.getLogger("requests").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
+from util.exporter import MetricsServer
+from util.latency import LatencyMode
+from util.metrics import Metrics
+from util.profiler import SamplingProfiler
+from util.scheduling import (
+    adapt_frontload,
+    exit_interval,
+    frontload_gap,
+    get_sleep_time,
+    in_frontload,
+    seconds_until_frontload,
+)
+from util.watchdog import LoopWatchdog
 
 total_time = 0
 total_iter = 0
 
+
+def configure():
+    """
+    Loads config.yml and sets up logging.  Only run as a script so the loop can be imported
+    by the benchmarks.
+    """
+    Config.load_global_config()
+
+    # setup logging
+    Util.setup_logging(name="new-coin-bot", level=Config.PROGRAM_OPTIONS["LOG_LEVEL"])
+    logging.getLogger("requests").setLevel(logging.WARNING)
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
 def setup() -> List[Bot]:
     Config.NOTIFICATION_SERVICE.info("Creating bots..")
 
@@ -24,7 +46,17 @@ def setup() -> List[Bot]:
     b = []
     for broker in Config.ENABLED_BROKERS:
         Config.NOTIFICATION_SERVICE.info("Creating bot [{}]".format(broker))
-        b.append(Bot(broker))
+        detector = Bot(broker)
+        b.append(detector)
+
+        # one detector per broker, its listings are bought by every account
+        for account in detector.config.ACCOUNTS or {}:
+            Config.NOTIFICATION_SERVICE.info("Creating account [{}] of [{}]".format(account, broker))
+            follower = Bot(
+                broker, config=detector.config.account_config(account), account=account, detect=False
+            )
+            detector.add_follower(follower)
+            b.append(follower)
 
     if len(b) > 0:
         b[0].upgrade_update()
@@ -32,36 +64,93 @@ def setup() -> List[Bot]:
 
 
 async def forever(routines: List):
+    """
+    Exit monitoring and new coin detection, each on its own schedule
+    """
+    await asyncio.gather(detect(routines), monitor_exits(routines))
+
+
+async def detect(routines: List):
     while True:
         current_time = datetime.now()
 
-        if Config.FRONTLOAD_ENABLED:
-            while (
-                current_time.second >= Config.FRONTLOAD_START
-                or current_time.second
-                <= Config.FRONTLOAD_DURATION - (60 - Config.FRONTLOAD_START)
-            ) and Config.auto_rate_current_weight < (Config.auto_rate_limit * 0.9):
+        if Config.FRONTLOAD_ENABLED and in_frontload(current_time):
+            # collections wait for the quiet time after the window
+            with LatencyMode.hold():
+                while in_frontload(current_time):
 
-                # FRONTLOAD PERIOD
-                await main(routines, current_time)
+                    # FRONTLOAD PERIOD
+                    await main(routines, current_time)
+                    # also lets the metrics server answer between polls
+                    await asyncio.sleep(frontload_gap(current_time))
 
-                current_time = datetime.now()
+                    current_time = datetime.now()
 
         # STANDARD PERIOD
         await main(routines, current_time)
+        adapt_frontload(b.listing_window for b in routines)
 
         sleep_time = get_sleep_time(current_time)
-        await asyncio.sleep(sleep_time)
+        LatencyMode.collect()
+        maintain_pools(routines, current_time, sleep_time)
+        await watch_armed(routines, sleep_time)
+
+
+async def monitor_exits(routines: List):
+    """
+    Checks the open positions of all bots every exit_interval, which is short while a position
+    is young.  Not held back when get_sleep_time backs the poll off.
+    """
+    while True:
+        await asyncio.gather(*[b.run_exits() for b in routines])
+        await asyncio.sleep(exit_interval(age for b in routines for age in b.position_ages()))
+
+
+async def watch_armed(routines: List, sleep_time: float):
+    """
+    Sleeps sleep_time, polling the armed PRE_TRADING symbols every ARMED_POLL_INTERVAL_MS
+    meanwhile as long as the weight stays under RATE_INTERVENTION_PERCENTAGE
+    """
+    loop = asyncio.get_event_loop()
+    until = loop.time() + sleep_time
+    while loop.time() < until:
+        armed = [b for b in routines if b.armed]
+        if not armed or Config.auto_rate_current_weight >= (
+            Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100
+        ):
+            await asyncio.sleep(until - loop.time())
+            return
+        await asyncio.gather(*[b.run_armed() for b in armed])
+        await asyncio.sleep(min(Config.ARMED_POLL_INTERVAL_MS / 1000, max(until - loop.time(), 0)))
+
+
+def maintain_pools(routines: List, current_time: datetime, sleep_time: float):
+    """
+    Re-ranks the API hosts of each broker when due, otherwise re-opens connections to the best
+    ones POOL_WARM_AHEAD_SECONDS before the next FRONTLOAD window.  Both run off the loop.
+    """
+    loop = asyncio.get_event_loop()
+    for bot in routines:
+        pool = getattr(bot.broker, "pool", None)
+        if pool is None:
+            continue
+        if pool.probe_due():
+            loop.run_in_executor(None, pool.probe)
+        elif Config.FRONTLOAD_ENABLED:
+            warm_in = seconds_until_frontload(current_time) - Config.POOL_WARM_AHEAD_SECONDS
+            if 0 <= warm_in < sleep_time:
+                loop.call_later(warm_in, loop.run_in_executor, None, pool.warm)
 
 
 async def main(bots_: List, current_time: datetime):
     await _main(bots_)
-    time_taken = datetime.now() - current_time
+    time_taken = (datetime.now() - current_time).total_seconds()
     Config.NOTIFICATION_SERVICE.debug(
-        "Loop finished in [{}] seconds".format(time_taken.microseconds / 1000000)
+        "Loop finished in [{}] seconds".format(time_taken)
     )
+    Metrics.record("ALL", "loop", time_taken)
 
-    Config.total_time += time_taken.microseconds / 1000000
+    Config.total_time += time_taken
     Config.total_iter += 1
     Config.NOTIFICATION_SERVICE.debug(
         "Request Weight: {}".format(Config.auto_rate_current_weight)
@@ -69,80 +158,47 @@ async def main(bots_: List, current_time: datetime):
 
 
 async def _main(bots_: List):
-    coroutines = [b.run_async() for b in bots_]
+    coroutines = [b.run_detection() for b in bots_]
 
     # This returns the results one by one.
     for future in asyncio.as_completed(coroutines):
         await future
 
 
-def get_sleep_time(current_time: datetime) -> int:
-    if (
-        Config.auto_rate_current_weight
-        >= Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100
-    ):
-        increase_time = True
-        if Config.auto_rate_current_weight >= Config.auto_rate_limit * 0.95:
-            resume_time = datetime(
-                current_time.year,
-                current_time.month,
-                current_time.day,
-                current_time.hour,
-                current_time.minute + 1,
-                0,
-                0,
-            )
-            Config.NOTIFICATION_SERVICE.info(f"Bot request count above [85%] of rate limit")
-
-            if current_time.minute != Config.auto_rate_increased_minute:
-                Config.auto_rate_increased_minute = current_time.minute
-                increase_time = True
-            else:
-                increase_time = False
-
-        else:
-            resume_time = datetime(
-                current_time.year,
-                current_time.month,
-                current_time.day,
-                current_time.hour,
-                current_time.minute
-                if Config.FRONTLOAD_ENABLED
-                else current_time.minute + 1,
-                Config.FRONTLOAD_START if Config.FRONTLOAD_ENABLED else 0,
-                500000 if Config.FRONTLOAD_START else 0,
-            )
-            Config.NOTIFICATION_SERVICE.info(f"Bot request count above [{Config.RATE_INTERVENTION_PERCENTAGE}%] of "
-                                             f"rate limit")
-
-        sleep_time = min(max((resume_time - current_time).seconds, 1), 59)
-
-        if Config.AUTO_INCREASE_FREQUENCY and increase_time:
-            Config.NOTIFICATION_SERVICE.info(
-                f"Increasing FREQUENCY from [{Config.FREQUENCY_SECONDS}] to "
-                f"[{Config.FREQUENCY_SECONDS + Config.AUTO_INCREASE_AMOUNT}] seconds"
-            )
-            Config.FREQUENCY_SECONDS += Config.AUTO_INCREASE_AMOUNT
-
-        Config.NOTIFICATION_SERVICE.info(
-            "Sleeping for [{}] seconds until [{}] to avoid exceeding rate limits\n".format(
-                sleep_time, resume_time
-            )
-        )
-    elif current_time.second + Config.FREQUENCY_SECONDS > Config.FRONTLOAD_START:
-        sleep_time = Config.FRONTLOAD_START - current_time.second
-    else:
-        sleep_time = Config.FREQUENCY_SECONDS
-
-    Config.NOTIFICATION_SERVICE.debug("Sleeping for [{}] seconds\n".format(sleep_time))
-    return min(max(sleep_time, 1), 59)
-
-
 if __name__ == "__main__":
+    configure()
     Config.NOTIFICATION_SERVICE.info("Starting...")
     loop = asyncio.get_event_loop()
+    LatencyMode.watch()
     bots = setup()
+    if Config.LATENCY_MODE_ENABLED:
+        Config.NOTIFICATION_SERVICE.info(LatencyMode.enable(Config.LATENCY_GC_THRESHOLDS))
+    metrics_server = None
+    fleet = None
+    watchdog = None
+    profiler = SamplingProfiler(
+        Config.PROFILER_INTERVAL_MS / 1000,
+        Config.PROFILER_SECONDS,
+        Config.PROFILER_ITERATIONS,
+    )
     try:
+        # `kill -USR1 <pid>` profiles a running bot
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, profiler.trigger)
+        # `kill -USR2 <pid>` dumps the flight recorders to logs/
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, lambda *args: [b.flight.dump() for b in bots])
+        if Config.PROFILER_ENABLED:
+            profiler.trigger()
+        if Config.WATCHDOG_ENABLED:
+            watchdog = LoopWatchdog(Config.WATCHDOG_THRESHOLD_SECONDS)
+            watchdog.start()
+        if Config.METRICS_ENABLED:
+            metrics_server = MetricsServer(bots, Config.METRICS_HOST, Config.METRICS_PORT)
+            loop.run_until_complete(metrics_server.start())
+        if Config.FLEET_ENABLED:
+            fleet = FleetExecutor([b for b in bots if b.detect], Config.FLEET_ADDRESS)
+            loop.run_until_complete(fleet.start())
         loop.create_task(forever(bots))
         loop.run_forever()
     except KeyboardInterrupt as e:
@@ -150,7 +206,21 @@ if __name__ == "__main__":
     except Exception as e:
         Config.NOTIFICATION_SERVICE.error(traceback.format_exc())
     finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        if fleet is not None:
+            fleet.close()
+            print(fleet.report())
+        if watchdog is not None:
+            watchdog.stop()
+        if profiler.running:
+            profiler.stop()
         for bot in bots:
             bot.save()
-        print("AVG TIME PER LOOP: {}".format(Config.total_time / Config.total_iter))
+            if bot.recorder is not None:
+                bot.recorder.stop()
+        print("AVG TIME PER LOOP: {}".format(Config.total_time / max(Config.total_iter, 1)))
         print("TOTAL LOOPS: {}".format(Config.total_iter))
+        for broker in Metrics.brokers():
+            print(Metrics.report(broker))
+        print(LatencyMode.report())
@@ -5,7 +5,7 @@ from util.models import Order, Sold
 
 
 def pretty_format_entry(order: Order) -> str:
-    return """
+    msg = """
     Broker: {broker}
     Datetime: {datetime}
     Status: {status}
@@ -20,10 +20,15 @@ def pretty_format_entry(order: Order) -> str:
         amount=round(order.size, 4),
         price=round(order.price, 4),
     )
+    if order.entry_trace is not None:
+        msg += "\n    Detect to {}: {}".format(
+            "Fill" if order.entry_trace.filled is not None else "Ack", order.entry_trace.summary()
+        )
+    return msg
 
 
 def pretty_format_close(sold: Sold) -> str:
-    return """
+    msg = """
     Broker: {broker}
     Datetime: {datetime}
     Status: {status}
@@ -44,6 +49,9 @@ def pretty_format_close(sold: Sold) -> str:
         profit=round(sold.profit, 4),
         profit_percent=round(sold.profit_percent, 4)
     )
+    if sold.exit_trace is not None:
+        msg += "\n    Trigger to Ack: {}".format(sold.exit_trace.summary())
+    return msg
 
 
 def pretty_entry(service: Notification, message: Optional[str] = None, fn_args: Optional[Tuple] = None,
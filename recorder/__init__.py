@@ -0,0 +1,4 @@
+from recorder.recorder import Recorder
+from recorder.tick_file import TickFile
+
+__all__ = ["Recorder", "TickFile"]
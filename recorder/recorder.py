@@ -0,0 +1,129 @@
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NoReturn, Optional, Tuple
+
+import numpy as np
+
+from recorder.tick_file import TickFile, TICK_DTYPE, tick_path
+from util import Config
+from util.models import Ticker
+
+
+class Recorder:
+    """
+    Captures the trades (or prices, for brokers without a trade feed) of newly listed
+    tickers into daily tick files.  Every watched ticker is polled on its own daemon thread
+    so recording never runs on the trading loop.  The broker passed in should be a
+    dedicated client so recording does not share a session with order placement.
+    """
+
+    def __init__(
+        self,
+        broker,
+        directory: Optional[Path] = None,
+        window_seconds: Optional[float] = None,
+        interval_seconds: Optional[float] = None,
+        max_symbols: Optional[int] = None,
+    ) -> NoReturn:
+        self.broker = broker
+        self.directory = Path(directory or Config.RECORDER_DIR)
+        self.window_seconds = (
+            window_seconds if window_seconds is not None else Config.RECORDER_WINDOW_SECONDS
+        )
+        self.interval_seconds = (
+            interval_seconds
+            if interval_seconds is not None
+            else Config.RECORDER_INTERVAL_SECONDS
+        )
+        self.max_symbols = max_symbols or Config.RECORDER_MAX_SYMBOLS
+
+        self._threads: Dict[str, threading.Thread] = {}
+        self._stop = threading.Event()
+
+    def active(self) -> List[str]:
+        return [k for k, t in self._threads.items() if t.is_alive()]
+
+    def watch(self, ticker: Ticker) -> bool:
+        """
+        Starts recording a ticker.  Returns False if it is already being recorded or too
+        many tickers are being recorded.
+        """
+        active = self.active()
+        if ticker.ticker in active:
+            return False
+        if len(active) >= self.max_symbols:
+            Config.NOTIFICATION_SERVICE.warning(
+                f"[{self.broker.brokerType}]\tRecorder busy, not recording {ticker.ticker}"
+            )
+            return False
+
+        thread = threading.Thread(
+            target=self._record,
+            args=(ticker,),
+            name=f"recorder-{self.broker.brokerType}-{ticker.ticker}",
+            daemon=True,
+        )
+        self._threads[ticker.ticker] = thread
+        thread.start()
+        return True
+
+    def stop(self, timeout: float = 5) -> NoReturn:
+        self._stop.set()
+        for thread in self._threads.values():
+            thread.join(timeout)
+
+    def _record(self, ticker: Ticker) -> NoReturn:
+        Config.NOTIFICATION_SERVICE.info(
+            f"[{self.broker.brokerType}]\tRecording {ticker.ticker} for "
+            f"[{self.window_seconds}] seconds"
+        )
+        end = time.time() + self.window_seconds
+        writers: Dict[Path, TickFile] = {}
+        last_id = 0
+        count = 0
+
+        try:
+            while not self._stop.is_set() and time.time() < end:
+                started = time.time()
+                try:
+                    ticks = self.broker.get_recent_ticks(ticker)
+                except Exception as e:
+                    Config.NOTIFICATION_SERVICE.debug(
+                        f"[{self.broker.brokerType}]\tRecorder poll failed for {ticker.ticker}: {e}"
+                    )
+                    ticks = []
+
+                fresh = [t for t in ticks if t[0] == 0 or t[0] > last_id]
+                if fresh:
+                    last_id = max(last_id, max(t[0] for t in fresh))
+                    count += self._write(writers, ticker, fresh)
+
+                self._stop.wait(max(self.interval_seconds - (time.time() - started), 0))
+        finally:
+            for writer in writers.values():
+                writer.close()
+            Config.NOTIFICATION_SERVICE.info(
+                f"[{self.broker.brokerType}]\tFinished recording {ticker.ticker}: [{count}] ticks"
+            )
+
+    def _write(
+        self,
+        writers: Dict[Path, TickFile],
+        ticker: Ticker,
+        ticks: List[Tuple[int, float, float, float]],
+    ) -> int:
+        # group by destination so a batch spanning midnight lands in both days' files
+        batches: Dict[Path, List[Tuple[float, float, float]]] = {}
+        for _, timestamp, price, qty in sorted(ticks, key=lambda t: t[1]):
+            path = tick_path(self.directory, self.broker.brokerType, ticker.ticker, timestamp)
+            batches.setdefault(path, []).append((timestamp, price, qty))
+
+        for path, batch in batches.items():
+            if path not in writers:
+                for old in writers.values():
+                    old.close()
+                writers.clear()
+                writers[path] = TickFile(path, self.broker.brokerType, ticker.ticker)
+            writers[path].append(np.array(batch, dtype=TICK_DTYPE))
+        return len(ticks)
@@ -0,0 +1,117 @@
+import os
+import struct
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NoReturn, Tuple, Union
+
+import numpy as np
+
+MAGIC = b"TICK"
+VERSION = 1
+
+# magic, version, record size, record count, created (epoch seconds), broker, symbol
+HEADER = struct.Struct("<4sHHQd12s24s4x")
+COUNT_OFFSET = 8
+
+TICK_DTYPE = np.dtype([("timestamp", "<f8"), ("price", "<f8"), ("qty", "<f8")])
+
+TickArray = np.ndarray
+
+
+class TickFileHeader:
+    def __init__(self, count: int, created: float, broker: str, symbol: str) -> NoReturn:
+        self.count = count
+        self.created = created
+        self.broker = broker
+        self.symbol = symbol
+
+    def pack(self) -> bytes:
+        return HEADER.pack(
+            MAGIC,
+            VERSION,
+            TICK_DTYPE.itemsize,
+            self.count,
+            self.created,
+            self.broker.encode()[:12],
+            self.symbol.encode()[:24],
+        )
+
+    @classmethod
+    def unpack(cls, raw: bytes) -> "TickFileHeader":
+        magic, version, record_size, count, created, broker, symbol = HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError("Not a tick file")
+        if version != VERSION or record_size != TICK_DTYPE.itemsize:
+            raise ValueError(f"Unsupported tick file version [{version}]")
+        return cls(
+            count,
+            created,
+            broker.rstrip(b"\0").decode(),
+            symbol.rstrip(b"\0").decode(),
+        )
+
+
+class TickFile:
+    """
+    Fixed-width tick storage: a HEADER.size byte header followed by packed TICK_DTYPE
+    records.  The record count in the header is only bumped after the records are written,
+    so a reader never sees a partially written tick.
+    """
+
+    def __init__(self, path: Path, broker: str, symbol: str) -> NoReturn:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        if path.exists() and path.stat().st_size >= HEADER.size:
+            self._f = open(path, "r+b")
+            self.header = TickFileHeader.unpack(self._f.read(HEADER.size))
+            # drop anything written after the last committed count
+            self._f.truncate(HEADER.size + self.header.count * TICK_DTYPE.itemsize)
+        else:
+            self._f = open(path, "w+b")
+            self.header = TickFileHeader(
+                0, datetime.now(timezone.utc).timestamp(), broker, symbol
+            )
+            self._f.write(self.header.pack())
+            self._f.flush()
+
+    def append(self, ticks: TickArray) -> NoReturn:
+        if len(ticks) == 0:
+            return
+        self._f.seek(0, os.SEEK_END)
+        self._f.write(np.ascontiguousarray(ticks, dtype=TICK_DTYPE).tobytes())
+        self._f.flush()
+
+        self.header.count += len(ticks)
+        self._f.seek(COUNT_OFFSET)
+        self._f.write(struct.pack("<Q", self.header.count))
+        self._f.flush()
+
+    def close(self) -> NoReturn:
+        self._f.close()
+
+    @staticmethod
+    def read_header(path: Path) -> TickFileHeader:
+        with open(path, "rb") as f:
+            return TickFileHeader.unpack(f.read(HEADER.size))
+
+    @staticmethod
+    def read(path: Union[str, Path]) -> Tuple[TickFileHeader, TickArray]:
+        """
+        Memory-maps a tick file read-only.  Returns the header and a structured array with
+        timestamp/price/qty fields that reads straight from the page cache.
+        """
+        header = TickFile.read_header(Path(path))
+        available = (os.path.getsize(path) - HEADER.size) // TICK_DTYPE.itemsize
+        count = min(header.count, available)
+        if count == 0:
+            return header, np.zeros(0, dtype=TICK_DTYPE)
+        return header, np.memmap(
+            path, dtype=TICK_DTYPE, mode="r", offset=HEADER.size, shape=(count,)
+        )
+
+
+def tick_path(directory: Path, broker: str, symbol: str, timestamp: float) -> Path:
+    day = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d")
+    safe_symbol = symbol.replace("/", "-")
+    return directory.joinpath(day, f"{broker}_{safe_symbol}.tick")
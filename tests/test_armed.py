@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import hmac
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+from unittest import TestCase
+
+from benchmarks.micro import binance_exchange_info
+from bot import Bot
+from broker import SimulatedBroker
+from broker.armed import ArmedOrder
+from broker.broker import Binance
+from util import Config
+from util.exceptions import TradingBotException
+from util.models import Ticker
+
+
+class ArmingBroker(SimulatedBroker):
+    """
+    SimulatedBroker with symbols that are listed before they trade
+    """
+
+    def __init__(self):
+        super().__init__("BINANCE")
+        self.statuses: Dict[str, str] = {}
+        self.status_polls = 0
+
+    def pre_list(self, ticker: Ticker, price: float):
+        self.statuses[ticker.ticker] = "PRE_TRADING"
+        self.prices[ticker.ticker] = price
+        self.pending = ticker
+
+    def open_trading(self, symbol: str):
+        self.statuses[symbol] = "TRADING"
+        self.list_ticker(self.pending)
+
+    def get_pre_trading(self, quote_ticker: str) -> List[Ticker]:
+        return [self.pending] if self.statuses.get(self.pending.ticker) == "PRE_TRADING" else []
+
+    def arm_order(self, config: Config, ticker: Ticker) -> ArmedOrder:
+        params = {"quoteOrderQty": float(config.QUANTITY), "side": "BUY", "symbol": ticker.ticker, "type": "market"}
+        return ArmedOrder(ticker, params, "secret", self.now)
+
+    def get_trading_status(self, symbols: List[str]) -> Dict[str, str]:
+        self.status_polls += 1
+        return {s: self.statuses[s] for s in symbols if s in self.statuses}
+
+    def place_order(self, config: Config, *args, **kwargs):
+        self.last_armed = kwargs.pop("armed", None)
+        return super().place_order(config, *args, **kwargs)
+
+
+class TestArmedOrder(TestCase):
+    def test_signature_matches_full_hmac(self):
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        params = {"quoteOrderQty": 50.0, "side": "BUY", "symbol": "NEWUSDT", "type": "market"}
+        armed = ArmedOrder(ticker, params, "secret", datetime.now())
+        self.assertTrue(armed.presigned)
+
+        body = armed.signed(1638316800000, 5000)
+        query, signature = body.split("&signature=")
+        self.assertEqual(
+            "quoteOrderQty=50.0&side=BUY&symbol=NEWUSDT&type=market&recvWindow=5000&timestamp=1638316800000", query
+        )
+        self.assertEqual(hmac.new(b"secret", query.encode(), hashlib.sha256).hexdigest(), signature)
+        self.assertFalse(ArmedOrder(ticker, params, None, datetime.now()).presigned)
+
+    def test_pre_trading_symbols_are_not_detected(self):
+        info = binance_exchange_info(8)
+        info["symbols"][4]["status"] = "PRE_TRADING"
+        self.assertNotIn("COIN4USDT", [t.ticker for t in Binance.parse_tickers(info, "USDT")])
+        self.assertEqual(["COIN4USDT"], [t.ticker for t in Binance.parse_pre_trading(info, "USDT")])
+
+
+class TestArmedBot(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        Config.ARMED_ORDERS_ENABLED = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.broker = ArmingBroker()
+        self.broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 50000)
+        config = Config.offline("BINANCE")
+        self.bot = Bot("BINANCE", client=self.broker, config=config, state_dir=Path(self.tmp.name))
+
+    def tearDown(self) -> None:
+        Config.ARMED_ORDERS_ENABLED = False
+        self.tmp.cleanup()
+
+    def test_armed_buy_sent_on_trading(self):
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        self.broker.pre_list(ticker, 2.0)
+
+        asyncio.run(self.bot.run_async())
+        self.assertIn("NEWUSDT", self.bot.armed)
+        self.assertEqual({}, self.bot.open_orders)
+
+        asyncio.run(self.bot.run_armed())
+        self.assertEqual(1, self.broker.status_polls)
+        self.assertIn("NEWUSDT", self.bot.armed)
+
+        self.broker.open_trading("NEWUSDT")
+        asyncio.run(self.bot.run_armed())
+        self.assertEqual({}, self.bot.armed)
+        self.assertIn("NEWUSDT", self.bot.open_orders)
+        self.assertEqual("NEWUSDT", self.broker.last_armed.params["symbol"])
+
+        # the regular poll does not buy it again
+        asyncio.run(self.bot.run_async())
+        self.assertEqual(1, len([o for o in self.broker.orders if o.side == "BUY"]))
+
+    def test_regular_poll_uses_armed_order(self):
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        self.broker.pre_list(ticker, 2.0)
+        asyncio.run(self.bot.run_async())
+
+        self.broker.open_trading("NEWUSDT")
+        asyncio.run(self.bot.run_async())
+        self.assertIn("NEWUSDT", self.bot.open_orders)
+        self.assertIsNotNone(self.broker.last_armed)
+        self.assertEqual({}, self.bot.armed)
+
+    def test_failed_arm_keeps_detecting(self):
+        attempts = []
+
+        def too_small(config, ticker):
+            attempts.append(ticker.ticker)
+            raise TradingBotException("Quantity too low!")
+
+        self.broker.arm_order = too_small
+        self.broker.pre_list(Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT"), 2.0)
+        asyncio.run(self.bot.run_async())
+        asyncio.run(self.bot.run_async())
+        self.assertEqual({}, self.bot.armed)
+        self.assertIn("ARM_FAILED", [e[2] for e in self.bot.flight.events()])
+        # not tried again on every poll
+        self.assertEqual(["NEWUSDT"], attempts)
+
+        self.broker.open_trading("NEWUSDT")
+        asyncio.run(self.bot.run_async())
+        self.assertIn("NEWUSDT", self.bot.open_orders)
+
+    def test_delisted_symbol_disarmed(self):
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        self.broker.pre_list(ticker, 2.0)
+        asyncio.run(self.bot.run_async())
+
+        del self.broker.statuses["NEWUSDT"]
+        asyncio.run(self.bot.run_armed())
+        self.assertEqual({}, self.bot.armed)
+        self.assertEqual([], self.broker.orders)
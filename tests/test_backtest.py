@@ -0,0 +1,130 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from backtest import Listing, ReplayEngine, load_listings
+from backtest.sweep import END_OF_REPLAY, Grid, check_points, evaluate_path, sweep
+from bot.position_book import ACTIONS
+from recorder import TickFile
+from recorder.tick_file import TICK_DTYPE, tick_path
+from util import Config
+
+START = 1638316800.0
+REASONS = ACTIONS[:END_OF_REPLAY] + ["END_OF_REPLAY"]
+
+
+def path_ticks(prices, step=0.5):
+    ticks = np.zeros(len(prices), dtype=TICK_DTYPE)
+    ticks["timestamp"] = START + np.arange(len(prices)) * step
+    ticks["price"] = prices
+    return ticks
+
+
+class TestReplayEngine(TestCase):
+    def setUp(self) -> None:
+        self.config = Config.offline(
+            "BINANCE",
+            STOP_LOSS_PERCENT=10,
+            TRAILING_STOP_LOSS_ACTIVATION=20,
+            TRAILING_STOP_LOSS_PERCENT=5,
+        )
+
+    def test_stop_loss(self):
+        listing = Listing("BINANCE", "NEWUSDT", path_ticks([100, 95, 89, 120]))
+        result = ReplayEngine(self.config).run([listing])[0]
+
+        self.assertEqual(["PRICE_BELOW_SL"], [s.reason for s in result.sold])
+        self.assertEqual(89, result.sold[0].price)
+        self.assertAlmostEqual(-3.3, result.pnl)
+
+    def test_trailing_stop_loss(self):
+        listing = Listing("BINANCE", "NEWUSDT", path_ticks([100, 121, 150, 143, 142.4, 141]))
+        result = ReplayEngine(self.config).run([listing])[0]
+
+        self.assertEqual(["PRICE_BELOW_TSL"], [s.reason for s in result.sold])
+        self.assertEqual(142.4, result.sold[0].price)
+        self.assertTrue(result.sold[0].trailing_stop_loss_activated)
+        self.assertEqual(150, result.sold[0].trailing_stop_loss_max)
+
+    def test_ftx_take_profit_and_end_of_replay(self):
+        config = Config.offline(
+            "FTX", ENABLE_TRAILING_STOP_LOSS=False, TAKE_PROFIT_PERCENT=30
+        )
+        listings = [
+            Listing("FTX", "NEW/USDT", path_ticks([10, 11, 13.5])),
+            Listing("FTX", "OLD/USDT", path_ticks([10, 11, 12])),
+        ]
+        results = ReplayEngine(config, "FTX").run(listings)
+
+        self.assertEqual(["PRICE_ABOVE_TP"], [s.reason for s in results[0].sold])
+        self.assertEqual(["END_OF_REPLAY"], [s.reason for s in results[1].sold])
+
+    def test_replay_is_deterministic(self):
+        rnd = np.random.default_rng(1)
+        prices = 100 * np.exp(np.cumsum(rnd.normal(0, 0.02, 2000)))
+        listing = Listing("BINANCE", "NEWUSDT", path_ticks(prices, step=0.01))
+        engine = ReplayEngine(self.config, fee_percent=0.1, slippage_percent=0.2, poll_interval=1)
+
+        first, second = engine.run([listing]), engine.run([listing])
+        self.assertEqual([r.dict() for r in first], [r.dict() for r in second])
+
+    def test_load_listings_joins_days(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ticks = path_ticks([1.0, 2.0, 3.0, 4.0], step=43200)
+            for i in range(len(ticks)):
+                path = tick_path(Path(tmp), "BINANCE", "NEWUSDT", float(ticks["timestamp"][i]))
+                writer = TickFile(path, "BINANCE", "NEWUSDT")
+                writer.append(ticks[i : i + 1])
+                writer.close()
+
+            listings = load_listings(Path(tmp), "BINANCE")
+            self.assertEqual(1, len(listings))
+            self.assertEqual([1.0, 2.0, 3.0, 4.0], listings[0].ticks["price"].tolist())
+            self.assertEqual([], load_listings(Path(tmp), "FTX"))
+
+
+class TestSweep(TestCase):
+    def test_evaluate_path_matches_replay(self):
+        grid = Grid([5, 15], [10, 40], [True, False], [5, 20], [3, 8])
+        rnd = np.random.default_rng(3)
+
+        for seed in range(6):
+            prices = 100 * np.exp(np.cumsum(rnd.normal(0.001, 0.02, 400)))
+            listing = Listing("BINANCE", "NEWUSDT", path_ticks(prices, step=0.3))
+            points = check_points(listing.ticks["timestamp"], 1.0, 2.0)
+            pnl, _, reason = evaluate_path(
+                prices[points], grid, 30, 0.1, 0.2, last_price=float(prices[-1])
+            )
+
+            for i in range(len(grid)):
+                engine = ReplayEngine(
+                    grid.config(i),
+                    fee_percent=0.1,
+                    slippage_percent=0.2,
+                    detection_delay=1.0,
+                    poll_interval=2.0,
+                )
+                result = engine.run([listing])[0]
+                self.assertAlmostEqual(result.pnl, pnl[i], places=9)
+                self.assertEqual(result.sold[0].reason, REASONS[reason[i]])
+
+    def test_sweep_ranks_grid(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for symbol, prices in [("AUSDT", [100, 150, 130, 90]), ("BUSDT", [100, 85, 200])]:
+                ticks = path_ticks(prices)
+                path = tick_path(Path(tmp), "BINANCE", symbol, START)
+                writer = TickFile(path, "BINANCE", symbol)
+                writer.append(ticks)
+                writer.close()
+
+            grid = Grid([10, 20], [30], [True, False], [10], [5, 30])
+            single = sweep(Path(tmp), grid, workers=1)
+            pooled = sweep(Path(tmp), grid, workers=2)
+
+            np.testing.assert_allclose(single.pnl, pooled.pnl)
+            self.assertEqual((len(grid), 2), single.pnl.shape)
+            best = single.ranked()[0]
+            self.assertEqual(single.total.max(), single.total[best])
+            self.assertIn("hit rate", single.table())
@@ -150,6 +150,7 @@ class TestBot(TestCase):
                 "trailing_stop_loss_activated": False,
                 "trailing_stop_loss_max": mock.ANY,
                 "trailing_stop_loss": mock.ANY,
+                "entry_trace": mock.ANY,
             },
         )
         self.assertTrue(
@@ -213,6 +214,8 @@ class TestBot(TestCase):
                     "profit_percent": mock.ANY,
                     "sold_datetime": mock.ANY,
                     "reason": "PRICE_BELOW_SL",
+                    "entry_trace": mock.ANY,
+                    "exit_trace": mock.ANY,
                 },
             )
 
@@ -256,6 +259,8 @@ class TestBot(TestCase):
                     "profit_percent": mock.ANY,
                     "sold_datetime": mock.ANY,
                     "reason": "PRICE_ABOVE_TP",
+                    "entry_trace": mock.ANY,
+                    "exit_trace": mock.ANY,
                 },
             )
 
@@ -298,6 +303,7 @@ class TestBot(TestCase):
                 util.models.Sold,
             )
             expected["BTC/USDT"].sold_datetime = self.FTX.sold["BTC/USDT"].sold_datetime
+            expected["BTC/USDT"].exit_trace = self.FTX.sold["BTC/USDT"].exit_trace
             self.assertDictEqual(expected, self.FTX.sold)
 
     def test_ftx_update_above_max(self):
@@ -336,6 +342,7 @@ class TestBot(TestCase):
             )
 
             expected["BTC/USDT"].sold_datetime = self.FTX.sold["BTC/USDT"].sold_datetime
+            expected["BTC/USDT"].exit_trace = self.FTX.sold["BTC/USDT"].exit_trace
             self.assertDictEqual(expected, self.FTX.sold)
 
     def test_ftx_update_below_tsl(self):
@@ -355,6 +362,7 @@ class TestBot(TestCase):
             )
 
             expected["BTC/USDT"].sold_datetime = self.FTX.sold["BTC/USDT"].sold_datetime
+            expected["BTC/USDT"].exit_trace = self.FTX.sold["BTC/USDT"].exit_trace
             self.assertDictEqual(expected, self.FTX.sold)
 
     # def test_notifications(self):
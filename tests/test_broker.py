@@ -0,0 +1,58 @@
+import unittest.mock as mock
+from unittest import TestCase
+
+from ftx import FtxClient
+
+from benchmarks.micro import binance_exchange_info, ftx_markets
+from broker.broker import Binance, FTX
+from util import Config
+from util.models import Ticker
+
+
+class TestParseTickers(TestCase):
+    def test_binance(self):
+        tickers = Binance.parse_tickers(binance_exchange_info(40), "USDT")
+        # every 4th symbol is quoted in USDT, every 10th has spot trading disabled
+        self.assertEqual(
+            [f"COIN{i}USDT" for i in range(0, 40, 4) if i % 10], [t.ticker for t in tickers]
+        )
+        self.assertEqual("COIN4", tickers[0].base_ticker)
+        self.assertEqual("USDT", tickers[0].quote_ticker)
+
+    def test_ftx(self):
+        tickers = FTX.parse_tickers(ftx_markets(30), "USDT")
+        # every 3rd market is quoted in USDT, every 5th is a future
+        self.assertEqual(
+            [f"COIN{i}/USDT" for i in range(0, 30, 3) if i % 5], [t.ticker for t in tickers]
+        )
+
+    def test_multiple_quotes(self):
+        info = binance_exchange_info(40)
+        tickers = Binance.parse_tickers(info, ["USDT", "BTC"])
+        self.assertEqual({"USDT", "BTC"}, {t.quote_ticker for t in tickers})
+        self.assertEqual(
+            len(Binance.parse_tickers(info, "USDT")) + len(Binance.parse_tickers(info, "BTC")), len(tickers)
+        )
+        self.assertEqual([], Binance.parse_tickers(info, "USD"))
+
+
+class TestPriceCache(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = False
+
+    def tearDown(self) -> None:
+        Config.TEST = True
+
+    def test_ftx_order_drops_cached_price(self):
+        broker = FTX("", "key", "secret", api_url="http://127.0.0.1:1/api/")
+        ticker = Ticker(ticker="NEW/USDT", base_ticker="NEW", quote_ticker="USDT")
+        filled = {"createdAt": "2021-12-01T00:00:00+00:00", "price": 2.0, "side": "buy", "size": 5.0}
+
+        with mock.patch.object(FTX, "get_market", return_value={"last": 1.0}):
+            self.assertEqual(1.0, broker.get_current_price(ticker))
+        self.assertEqual((True, 1.0), broker.cache.cache.get(("price", "NEW/USDT")))
+
+        with mock.patch.object(FtxClient, "place_order", return_value=filled):
+            order = broker.place_order(Config.offline("FTX"), ticker=ticker, side="buy", size=5.0)
+        self.assertEqual(ticker, order.ticker)
+        self.assertEqual((False, None), broker.cache.cache.get(("price", "NEW/USDT")))
@@ -0,0 +1,132 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from broker.cache import BrokerCache, SingleFlight, TTLCache, cached
+from util import Config
+from util.models import Ticker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBroker:
+    def __init__(self):
+        self.cache = BrokerCache()
+        self.calls = 0
+        self.price = 1.0
+
+    @cached("price", "CACHE_PRICE_TTL_SECONDS", key=lambda ticker: (ticker.ticker,))
+    def get_current_price(self, ticker: Ticker) -> float:
+        self.calls += 1
+        time.sleep(0.05)
+        return self.price
+
+
+class TestSingleFlight(TestCase):
+    def test_concurrent_calls_share_one_fetch(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return "price"
+
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(flight.do, "BTCUSDT", fetch) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            results = [f.result() for f in futures]
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["price"] * 4, [r[0] for r in results])
+        self.assertEqual(3, sum(shared for _, shared in results))
+
+        # the next call fetches again
+        flight.do("BTCUSDT", fetch)
+        self.assertEqual(2, len(calls))
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def fetch():
+            time.sleep(0.05)
+            raise ConnectionError("down")
+
+        with ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(flight.do, "key", fetch) for _ in range(2)]
+            for f in futures:
+                self.assertIsInstance(f.exception(), ConnectionError)
+
+
+class TestTTLCache(TestCase):
+    def test_expiry_and_eviction(self):
+        clock = Clock()
+        cache = TTLCache(maxsize=2, clock=clock)
+        cache.put("a", 1, ttl=1)
+        cache.put("b", 2, ttl=10)
+        self.assertEqual((True, 1), cache.get("a"))
+
+        cache.put("c", 3, ttl=10)
+        # b was the least recently used
+        self.assertEqual((False, None), cache.get("b"))
+        self.assertEqual(2, len(cache))
+
+        clock.now += 1
+        self.assertEqual((False, None), cache.get("a"))
+        self.assertEqual((True, 3), cache.get("c"))
+
+        cache.put("d", 4, ttl=0)
+        self.assertEqual((False, None), cache.get("d"))
+
+        self.assertTrue(cache.invalidate("c"))
+        self.assertFalse(cache.invalidate("c"))
+
+
+class TestBrokerCache(TestCase):
+    def setUp(self) -> None:
+        self.ttl = Config.CACHE_PRICE_TTL_SECONDS
+        Config.CACHE_PRICE_TTL_SECONDS = 60
+        self.broker = FakeBroker()
+        self.ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+
+    def tearDown(self) -> None:
+        Config.CACHE_PRICE_TTL_SECONDS = self.ttl
+
+    def test_cached_price(self):
+        with ThreadPoolExecutor(3) as executor:
+            prices = list(executor.map(lambda _: self.broker.get_current_price(self.ticker), range(3)))
+        self.assertEqual([1.0] * 3, prices)
+        self.assertEqual(1, self.broker.calls)
+
+        self.broker.price = 2.0
+        self.assertEqual(1.0, self.broker.get_current_price(self.ticker))
+        self.assertEqual((1, 2, 1), (self.broker.cache.hits, self.broker.cache.shared, self.broker.cache.misses))
+
+        self.broker.cache.invalidate(("price", "NEWUSDT"))
+        self.assertEqual(2.0, self.broker.get_current_price(self.ticker))
+        self.assertEqual(2, self.broker.calls)
+
+    def test_invalidated_during_fetch_is_not_cached(self):
+        with ThreadPoolExecutor(1) as executor:
+            future = executor.submit(self.broker.get_current_price, self.ticker)
+            time.sleep(0.01)
+            self.broker.cache.invalidate()
+            future.result()
+
+        self.broker.get_current_price(self.ticker)
+        self.assertEqual(2, self.broker.calls)
+
+    def test_ttl_zero_only_coalesces(self):
+        Config.CACHE_PRICE_TTL_SECONDS = 0
+        self.broker.get_current_price(self.ticker)
+        self.broker.get_current_price(self.ticker)
+        self.assertEqual(2, self.broker.calls)
@@ -0,0 +1,71 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import PaperExchange
+from broker.paper import ListingSchedule
+from util import Config
+from util.exporter import MetricsServer, render
+from util.metrics import Metrics
+
+START = 1638316790.0
+
+
+class TestExporter(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        Metrics.histograms.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.now = START
+        exchange = PaperExchange(
+            existing_tickers=3,
+            schedule=ListingSchedule(START, None, listings=[(START + 10, "MOON")]),
+            clock=lambda: self.now,
+        )
+        config = Config.offline("BINANCE", STOP_LOSS_PERCENT=5)
+        self.bot = Bot("BINANCE", client=exchange, config=config, state_dir=Path(self.tmp.name))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_render(self):
+        self.now = START + 11
+        asyncio.run(self.bot.run_async())
+        self.now = START + 12
+        asyncio.run(self.bot.run_async())
+
+        text = render([self.bot])
+        self.assertIn('newcoinbot_seen_tickers{broker="BINANCE"} 4', text)
+        self.assertIn('newcoinbot_open_positions{broker="BINANCE"} 1', text)
+        self.assertIn('newcoinbot_rate_weight{broker="BINANCE"}', text)
+        self.assertIn('newcoinbot_unrealized_pnl{broker="BINANCE"}', text)
+        self.assertIn('newcoinbot_seconds_since_save{broker="BINANCE"}', text)
+        self.assertIn('newcoinbot_stage_seconds_count{broker="BINANCE",stage="iteration"} 2', text)
+
+        # the periodic report resets the window, not the counters
+        Metrics.report("BINANCE", reset=True)
+        self.assertIn(
+            'newcoinbot_stage_seconds_count{broker="BINANCE",stage="iteration"} 2',
+            render([self.bot]),
+        )
+
+    def test_server(self):
+        async def scrape(path: str) -> bytes:
+            server = MetricsServer([self.bot], port=0)
+            await server.start()
+            port = server.server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            server.close()
+            return response
+
+        response = asyncio.run(scrape("/metrics"))
+        self.assertTrue(response.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"newcoinbot_open_positions", response)
+
+        response = asyncio.run(scrape("/"))
+        self.assertTrue(response.startswith(b"HTTP/1.1 404"))
@@ -0,0 +1,112 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import SimulatedBroker
+from util import Config
+from util.decorators import RateLimiter, _endpoint_name
+from util.models import Ticker
+
+NEW = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+
+
+class SlowBroker(SimulatedBroker):
+    """
+    Takes delay seconds to place an order, fails it if failing is set
+    """
+
+    def __init__(self, delay: float = 0.1, failing: bool = False):
+        super().__init__("BINANCE")
+        self.delay = delay
+        self.failing = failing
+        self.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 50000)
+
+    def place_order(self, config, *args, **kwargs):
+        time.sleep(self.delay)
+        if self.failing:
+            raise ConnectionError("account down")
+        return super().place_order(config, *args, **kwargs)
+
+
+class TestFanOut(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state = Path(self.tmp.name)
+        config = Config.offline("BINANCE", QUANTITY=50, ACCOUNTS={"second": {"QUANTITY": 20}, "third": None})
+        self.detector = Bot("BINANCE", client=SlowBroker(), config=config, state_dir=self.state)
+        self.followers = {}
+        for account, failing in [("second", False), ("third", True)]:
+            follower = Bot(
+                "BINANCE",
+                client=SlowBroker(failing=failing),
+                config=config.account_config(account),
+                state_dir=self.state,
+                account=account,
+                detect=False,
+            )
+            self.detector.add_follower(follower)
+            self.followers[account] = follower
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_buys_fan_out_in_parallel(self):
+        self.assertEqual({}, self.followers["second"].ticker_seen_dict)
+        for bot in [self.detector, *self.followers.values()]:
+            bot.broker.list_ticker(NEW, 2.0)
+
+        start = time.perf_counter()
+        asyncio.run(self.detector.run_async())
+        self.assertLess(time.perf_counter() - start, 0.25)
+
+        self.assertAlmostEqual(25, self.detector.open_orders["NEWUSDT"].size)
+        self.assertAlmostEqual(10, self.followers["second"].open_orders["NEWUSDT"].size)
+        # a failing account does not hold back the others
+        self.assertEqual({}, self.followers["third"].open_orders)
+        self.assertIn("NEWUSDT", self.followers["third"].ticker_seen_dict)
+
+        self.assertTrue(self.state.joinpath("BINANCE_open_orders.json").exists())
+        self.assertTrue(self.state.joinpath("BINANCE_second_open_orders.json").exists())
+
+        # followers never poll for tickers themselves
+        polls = []
+        self.followers["second"].broker.get_tickers = lambda *args, **kwargs: polls.append(args)
+        asyncio.run(self.followers["second"].run_async())
+        self.assertEqual([], polls)
+
+    def test_order_rate_does_not_block_the_loop(self):
+        bot = Bot("BINANCE", client=SimulatedBroker("BINANCE"), config=Config.offline("BINANCE"), state_dir=self.state)
+        bot.order_limiter = RateLimiter(1, window=0.3)
+        tickers = [Ticker(ticker=f"NEW{i}USDT", base_ticker=f"NEW{i}", quote_ticker="USDT") for i in range(2)]
+        for ticker in tickers:
+            bot.broker.list_ticker(ticker, 2.0)
+
+        async def run():
+            start = time.perf_counter()
+            await bot.run_async()
+            self.assertLess(time.perf_counter() - start, 0.2)
+            self.assertEqual(["NEW0USDT"], list(bot.open_orders))
+            await asyncio.sleep(0.4)
+            self.assertEqual(["NEW0USDT", "NEW1USDT"], list(bot.open_orders))
+
+        asyncio.run(run())
+
+    def test_account_config(self):
+        self.assertEqual(20, self.followers["second"].config.QUANTITY)
+        self.assertEqual(50, self.followers["third"].config.QUANTITY)
+        self.assertEqual({}, self.followers["second"].config.ACCOUNTS)
+
+    def test_endpoints_per_account(self):
+        self.followers["second"].broker.account = "second"
+        self.assertEqual("BINANCE[second].price", _endpoint_name("price", (self.followers["second"].broker,)))
+        self.assertEqual("BINANCE.price", _endpoint_name("price", (self.detector.broker,)))
+
+        recorder = SimulatedBroker("BINANCE")
+        recorder.account, recorder.role = "second", "recorder"
+        self.assertEqual("BINANCE[second].recorder.price", _endpoint_name("price", (recorder,)))
+        recorder.account = None
+        self.assertEqual("BINANCE.recorder.price", _endpoint_name("price", (recorder,)))
@@ -0,0 +1,157 @@
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import SimulatedBroker
+from fleet import FleetExecutor, Poller, protocol
+from fleet.poller import next_slot
+from util import Config
+from util.exceptions import (
+    BrokerDownException,
+    CircuitOpenException,
+    FleetProtocolException,
+    TradingBotException,
+)
+from util.models import Ticker
+
+
+async def wait_for(condition, timeout=5.0):
+    until = time.time() + timeout
+    while not condition():
+        if time.time() > until:
+            raise TimeoutError
+        await asyncio.sleep(0.01)
+
+
+class TestProtocol(TestCase):
+    def test_round_trip(self):
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        message = protocol.listing("poller-1", "BINANCE", 1638316800.5, [ticker])
+        decoded = protocol.decode(protocol.encode(message))
+        self.assertEqual(message, decoded)
+        self.assertEqual(ticker, Ticker.parse_obj(decoded["tickers"][0]))
+
+        with self.assertRaises(FleetProtocolException):
+            protocol.decode(b"[1, 2]\n")
+        with self.assertRaises(FleetProtocolException):
+            protocol.decode(b"{not json\n")
+
+    def test_parse_address(self):
+        self.assertEqual(("tcp", "127.0.0.1", 7777), protocol.parse_address("tcp://127.0.0.1:7777"))
+        self.assertEqual(("unix", "/tmp/fleet.sock", None), protocol.parse_address("unix:///tmp/fleet.sock"))
+        with self.assertRaises(FleetProtocolException):
+            protocol.parse_address("http://127.0.0.1:7777")
+
+    def test_slots_spread_over_interval(self):
+        # 3 pollers on a 3 second interval poll at .0, .1 and .2 of each interval
+        self.assertAlmostEqual(0.0, next_slot(30.0, 0, 3, 3.0))
+        self.assertAlmostEqual(1.0, next_slot(30.0, 1, 3, 3.0))
+        self.assertAlmostEqual(2.0, next_slot(30.0, 2, 3, 3.0))
+        self.assertAlmostEqual(0.5, next_slot(30.5, 1, 3, 3.0))
+        self.assertAlmostEqual(2.5, next_slot(31.5, 1, 3, 3.0))
+
+
+class BackingOffBroker(SimulatedBroker):
+    def get_tickers(self, quote_ticker, **kwargs):
+        raise CircuitOpenException("[BINANCE.tickers] circuit open", retry_after=30)
+
+
+class DownBroker(SimulatedBroker):
+    def get_tickers(self, quote_ticker, **kwargs):
+        raise BrokerDownException("FTX is down")
+
+
+class TestFleet(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.broker = SimulatedBroker("BINANCE")
+        self.broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 50000)
+        self.bot = Bot(
+            "BINANCE", client=self.broker, config=Config.offline("BINANCE"), state_dir=Path(self.tmp.name)
+        )
+        self.new = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_listing_bought_once(self):
+        async def run():
+            executor = FleetExecutor([self.bot], "tcp://127.0.0.1:0", interval=0.1)
+            await executor.start()
+            port = executor.server.sockets[0].getsockname()[1]
+
+            brokers, pollers = [], []
+            for i in range(2):
+                broker = SimulatedBroker("BINANCE")
+                broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"))
+                brokers.append(broker)
+                pollers.append(Poller(broker, ["USDT"], f"tcp://127.0.0.1:{port}", f"poller-{i}"))
+            tasks = [asyncio.ensure_future(p.run()) for p in pollers]
+            try:
+                await wait_for(lambda: all(p.count == 2 and p.seen is not None for p in pollers))
+                self.assertEqual({0, 1}, {p.index for p in pollers})
+
+                for broker in brokers + [self.broker]:
+                    broker.list_ticker(self.new, 2.0)
+                await wait_for(lambda: executor.events == 2)
+            finally:
+                for p in pollers:
+                    p.stop()
+                for t in tasks:
+                    t.cancel()
+                executor.close()
+            return executor
+
+        executor = asyncio.run(run())
+        self.assertEqual(1, executor.duplicates)
+        self.assertIn("NEWUSDT", self.bot.open_orders)
+        self.assertEqual(1, len([o for o in self.broker.orders if o.side == "BUY"]))
+
+    def test_seen_tickers_are_not_bought(self):
+        executor = FleetExecutor([self.bot], "tcp://127.0.0.1:0")
+        self.broker.list_ticker(self.new, 2.0)
+        self.bot.ticker_seen_dict["NEWUSDT"] = True
+
+        bought = executor.receive_listing(protocol.listing("poller-0", "BINANCE", time.time(), [self.new]))
+        self.assertEqual([], bought)
+        self.assertEqual([], self.broker.orders)
+
+        self.assertEqual([], executor.receive_listing(protocol.listing("poller-0", "FTX", time.time(), [self.new])))
+
+    def _poller_keeps_running(self, broker):
+        async def run():
+            executor = FleetExecutor([self.bot], "tcp://127.0.0.1:0", interval=0.05)
+            await executor.start()
+            port = executor.server.sockets[0].getsockname()[1]
+            poller = Poller(broker, ["USDT"], f"tcp://127.0.0.1:{port}", "poller-0")
+            task = asyncio.ensure_future(poller.run())
+            try:
+                await wait_for(lambda: poller.skipped >= 2)
+                self.assertFalse(task.done())
+                self.assertEqual(1, len(executor.pollers["BINANCE"]))
+            finally:
+                poller.stop()
+                task.cancel()
+                executor.close()
+
+        asyncio.run(run())
+
+    def test_poller_skips_slot_while_circuit_open(self):
+        self._poller_keeps_running(BackingOffBroker("BINANCE"))
+
+    def test_poller_survives_broker_down(self):
+        self._poller_keeps_running(DownBroker("BINANCE"))
+
+    def test_failed_buy_is_contained(self):
+        def rejected(new_tickers):
+            raise TradingBotException("Quantity too low!")
+
+        executor = FleetExecutor([self.bot], "tcp://127.0.0.1:0")
+        self.bot.dispatch = rejected
+        bought = executor.receive_listing(protocol.listing("poller-0", "BINANCE", time.time(), [self.new]))
+        self.assertEqual([self.new], bought)
+        self.assertIn("NEWUSDT", self.bot.ticker_seen_dict)
@@ -0,0 +1,64 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import SimulatedBroker
+from util import Config
+from util.flight_recorder import FlightRecorder
+from util.models import Ticker
+
+
+class RejectingBroker(SimulatedBroker):
+    def place_order(self, config, *args, **kwargs):
+        raise ValueError("rejected")
+
+
+class TestFlightRecorder(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_ring(self):
+        flight = FlightRecorder("FTX", size=4, out_dir=Path(self.tmp.name))
+        self.assertEqual([], flight.events())
+
+        for i in range(6):
+            flight.iteration = i
+            flight.record("PRICE", "BTC/USDT", float(i))
+
+        events = flight.events()
+        self.assertEqual(4, len(events))
+        self.assertEqual([2.0, 3.0, 4.0, 5.0], [e[4] for e in events])
+
+        lines = flight.dump("TEST").read_text().splitlines()
+        self.assertTrue(lines[0].startswith("# FTX TEST"))
+        self.assertEqual(["5", "PRICE", "BTC/USDT", "5.0", ""], lines[-1].split("\t")[1:])
+
+    def test_dumped_on_failed_order(self):
+        broker = RejectingBroker("FTX")
+        broker.list_ticker(Ticker(ticker="BTC/USDT", base_ticker="BTC", quote_ticker="USDT"), 100)
+        bot = Bot("FTX", client=broker, config=Config.offline("FTX"), state_dir=Path(self.tmp.name))
+        bot.flight.out_dir = Path(self.tmp.name)
+
+        broker.list_ticker(Ticker(ticker="NEW/USDT", base_ticker="NEW", quote_ticker="USDT"), 1)
+        asyncio.run(bot.run_async())
+
+        dumps = list(Path(self.tmp.name).glob("flight_FTX_*.log"))
+        self.assertEqual(1, len(dumps))
+        events = [line.split("\t")[2] for line in dumps[0].read_text().splitlines()[1:]]
+        self.assertEqual(["ITER_START", "TICKERS", "NEW", "BUY_FAILED"], events)
+        self.assertEqual("ITER_END", bot.flight.events()[-1][2])
+
+    def test_repeated_failure_dumped_once(self):
+        flight = FlightRecorder("BINANCE", out_dir=Path(self.tmp.name))
+        for _ in range(3):
+            flight.dump_once("ORDER_FAILED", "NEWUSDT", "remaining quantity too low")
+        self.assertIsNone(flight.dump_once("ORDER_FAILED", "NEWUSDT", "remaining quantity too low"))
+        self.assertIsNotNone(flight.dump_once("ORDER_FAILED", "NEWUSDT", "insufficient balance"))
+        self.assertIsNotNone(flight.dump_once("ORDER_FAILED", "OTHERUSDT", "remaining quantity too low"))
+        self.assertEqual(3, len(list(Path(self.tmp.name).glob("flight_BINANCE_*.log"))))
@@ -0,0 +1,73 @@
+import gc
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from benchmarks.micro import binance_exchange_info
+from broker.broker import Binance
+from util import Util
+from util.latency import LatencyMode
+from util.metrics import Metrics
+from util.models import Ticker
+
+
+class TestLatencyMode(TestCase):
+    def setUp(self) -> None:
+        self.threshold = gc.get_threshold()
+
+    def tearDown(self) -> None:
+        LatencyMode.disable()
+
+    def test_enable_freezes_heap(self):
+        report = LatencyMode.enable([50000, 50, 1000])
+        self.assertIn("full collection", report)
+        self.assertGreater(gc.get_freeze_count(), 0)
+        self.assertEqual((50000, 50, 1000), gc.get_threshold())
+
+        LatencyMode.disable()
+        self.assertEqual(0, gc.get_freeze_count())
+        self.assertEqual(self.threshold, gc.get_threshold())
+        self.assertNotIn(LatencyMode._callback, gc.callbacks)
+
+    def test_hold_defers_collections(self):
+        with LatencyMode.hold():
+            # off unless enabled
+            self.assertTrue(gc.isenabled())
+
+        LatencyMode.enable(list(self.threshold))
+        with LatencyMode.hold():
+            with LatencyMode.hold():
+                self.assertFalse(gc.isenabled())
+            self.assertFalse(gc.isenabled())
+            self.assertFalse(LatencyMode.collect())
+        self.assertTrue(gc.isenabled())
+        self.assertTrue(LatencyMode.collect())
+
+    def test_pauses_recorded(self):
+        LatencyMode.watch()
+        before = Metrics.histogram("ALL", "gc_pause").lifetime_count
+        gc.collect()
+        self.assertEqual(before + 1, Metrics.histogram("ALL", "gc_pause").lifetime_count)
+
+
+class TestHotPath(TestCase):
+    def test_tickers_reused_across_polls(self):
+        info = binance_exchange_info(8)
+        first = Binance.parse_tickers(info, "USDT")
+        second = Binance.parse_tickers(info, "USDT")
+        self.assertEqual(first, second)
+        self.assertTrue(all(a is b for a, b in zip(first, second)))
+
+    def test_unchanged_state_not_rewritten(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = Path(tmp).joinpath("tickers.json")
+            ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+            Util.dump_json(file, {"NEWUSDT": ticker})
+            file.write_text("{}")
+
+            Util.dump_json(file, {"NEWUSDT": ticker})
+            self.assertEqual("{}", file.read_text())
+
+            Util.dump_json(file, {})
+            Util.dump_json(file, {"NEWUSDT": ticker})
+            self.assertIn("NEWUSDT", file.read_text())
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from util.metrics import Histogram, Metrics
+
+
+class TestHistogram(TestCase):
+    def test_percentiles(self):
+        h = Histogram()
+        for i in range(1, 1001):
+            h.record(i / 1000)
+
+        self.assertEqual(h.count, 1000)
+        self.assertAlmostEqual(h.mean, 0.5005)
+        self.assertEqual(h.max, 1.0)
+        # bucket upper bounds are within growth of the true value
+        self.assertLessEqual(abs(h.percentile(50) - 0.5) / 0.5, 0.05)
+        self.assertLessEqual(abs(h.percentile(99) - 0.99) / 0.99, 0.05)
+        self.assertEqual(h.percentile(100), 1.0)
+
+    def test_out_of_range(self):
+        h = Histogram()
+        h.record(0)
+        h.record(1000)
+        self.assertEqual(h.counts[0], 1)
+        self.assertEqual(h.counts[-1], 1)
+        self.assertEqual(h.percentile(100), 1000)
+
+    def test_reset(self):
+        h = Histogram()
+        h.record(0.1)
+        h.reset()
+        self.assertEqual(h.count, 0)
+        self.assertEqual(h.percentile(50), 0.0)
+
+
+class TestMetrics(TestCase):
+    def setUp(self) -> None:
+        Metrics.histograms.clear()
+
+    def test_report(self):
+        with Metrics.time("FTX", "save"):
+            pass
+        Metrics.record("FTX", "ticker_fetch", 0.25)
+        Metrics.record("BINANCE", "diff", 0.001)
+
+        self.assertEqual(Metrics.brokers(), ["BINANCE", "FTX"])
+        self.assertEqual(Metrics.stages("FTX"), ["ticker_fetch", "save"])
+
+        report = Metrics.report("FTX", reset=True)
+        self.assertIn("ticker_fetch", report)
+        self.assertIn("250.00", report)
+        self.assertEqual(Metrics.histogram("FTX", "ticker_fetch").count, 0)
+        self.assertNotIn("ticker_fetch", Metrics.report("FTX"))
@@ -0,0 +1,151 @@
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import Broker, PaperExchange
+from broker.paper import ListingSchedule
+from notification.notification import pretty_format_close, pretty_format_entry
+from util import Config, Util
+from util.exceptions import RateLimitExceededException
+from util.models import EntryTrace, Sold
+
+START = 1638316790.0
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class TestPaperExchange(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(START)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def make_bot(self, broker_type="BINANCE", **options) -> Bot:
+        exchange = PaperExchange(
+            broker_type,
+            existing_tickers=5,
+            schedule=ListingSchedule(START, listings=[(START + 10, "MOON")]),
+            latency_ms=20,
+            jitter_ms=10,
+            clock=self.clock,
+            sleep=self.clock.sleep,
+            **options,
+        )
+        config = Config.offline(
+            broker_type, STOP_LOSS_PERCENT=5, TRAILING_STOP_LOSS_PERCENT=5
+        )
+        return Bot(broker_type, client=exchange, config=config, state_dir=Path(self.tmp.name))
+
+    def test_listing_is_bought_and_sold(self):
+        for broker_type, symbol in [("BINANCE", "MOONUSDT"), ("FTX", "MOON/USDT")]:
+            bot = self.make_bot(broker_type)
+            self.assertEqual(5, len(bot.ticker_seen_dict))
+
+            asyncio.run(bot.run_async())
+            self.assertEqual({}, bot.open_orders)
+
+            self.clock.now = START + 11
+            asyncio.run(bot.run_async())
+            self.assertIn(symbol, bot.open_orders)
+            self.assertEqual("TEST_MODE", bot.open_orders[symbol].status)
+
+            # the pump fades out over the following minutes
+            for _ in range(200):
+                if symbol in bot.sold:
+                    break
+                self.clock.now += 5
+                asyncio.run(bot.run_async())
+            self.assertIn(symbol, bot.sold)
+            self.assertNotIn(symbol, bot.open_orders)
+            self.clock.now = START
+
+    def test_unreported_fill_left_out(self):
+        now = datetime.fromtimestamp(START)
+        trace = EntryTrace(
+            observed=now,
+            decided=now,
+            sent=now + timedelta(milliseconds=5),
+            acked=now + timedelta(milliseconds=25),
+        )
+        self.assertEqual("25 ms (decide 0, send 5, ack 20)", trace.summary())
+
+        trace.filled = now + timedelta(milliseconds=15)
+        self.assertEqual("15 ms (decide 0, send 5, ack 20, fill 10)", trace.summary())
+
+    def test_trade_traces(self):
+        bot = self.make_bot()
+        self.clock.now = START + 11
+        asyncio.run(bot.run_async())
+
+        entry = bot.open_orders["MOONUSDT"].entry_trace
+        # observed once the tickers response is back
+        self.assertGreaterEqual(entry.observed, datetime.fromtimestamp(START + 11.02))
+        self.assertLessEqual(entry.observed, entry.decided)
+        self.assertLessEqual(entry.decided, entry.sent)
+        # the order request pays the exchange latency
+        self.assertGreaterEqual((entry.acked - entry.sent).total_seconds(), 0.02)
+        # filled at the exchange's time of the order
+        self.assertLess(entry.sent, entry.filled)
+        self.assertLessEqual(entry.filled, entry.acked)
+        self.assertIn("Detect to Fill", pretty_format_entry(bot.open_orders["MOONUSDT"]))
+
+        for _ in range(200):
+            if "MOONUSDT" in bot.sold:
+                break
+            self.clock.now += 5
+            asyncio.run(bot.run_async())
+
+        sold = Util.load_json(bot.sold_file, Sold)["MOONUSDT"]
+        self.assertEqual(entry, sold.entry_trace)
+        self.assertLessEqual(sold.exit_trace.triggered, sold.exit_trace.sent)
+        self.assertGreaterEqual(
+            (sold.exit_trace.acked - sold.exit_trace.sent).total_seconds(), 0.02
+        )
+        self.assertIn("Trigger to Ack", pretty_format_close(sold))
+
+    def test_weight_headers_and_rate_limit(self):
+        exchange = PaperExchange(
+            existing_tickers=1, rate_limit=25, clock=self.clock, sleep=self.clock.sleep
+        )
+        _, headers = exchange.get_tickers("USDT")
+        self.assertEqual("10", headers["x-mbx-used-weight-1m"])
+        exchange.get_tickers("USDT")
+        with self.assertRaises(RateLimitExceededException):
+            exchange.get_tickers("USDT")
+
+        self.clock.now += 60
+        _, headers = exchange.get_tickers("USDT")
+        self.assertEqual("10", headers["x-mbx-used-weight-1m"])
+
+    def test_rate_limit_does_not_stop_the_bot(self):
+        # the starting poll and two more fill the 25 weight of the minute
+        bot = self.make_bot(rate_limit=25)
+        asyncio.run(bot.run_async())
+        asyncio.run(bot.run_async())
+        self.assertEqual("THROTTLED", bot.flight.events()[-2][2])
+
+        self.clock.now += 60
+        asyncio.run(bot.run_async())
+        self.assertIn("MOONUSDT", bot.open_orders)
+
+    def test_factory_uses_paper_exchange_in_test_mode(self):
+        Config.PAPER_TRADING = True
+        try:
+            self.assertIsInstance(Broker.factory("FTX"), PaperExchange)
+        finally:
+            Config.PAPER_TRADING = False
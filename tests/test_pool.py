@@ -0,0 +1,121 @@
+import socket
+from collections import deque
+from datetime import datetime
+from unittest import TestCase
+
+import requests
+
+from broker.pool import DNSCache, EndpointPool
+from util import Config
+from util.scheduling import seconds_until_frontload
+
+
+class FakeResponse:
+    def close(self):
+        pass
+
+
+class FakeSession:
+    latencies = {}
+
+    def __init__(self):
+        self.headers = {}
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        host = url.split("/")[2]
+        self.sent.append((method, url))
+        if host not in FakeSession.latencies:
+            raise ConnectionError(host)
+        return FakeResponse()
+
+    def send(self, request, **kwargs):
+        self.sent.append((request.method, request.url))
+        return FakeResponse()
+
+
+class TestEndpointPool(TestCase):
+    def setUp(self) -> None:
+        FakeSession.latencies = {"api1": 0, "api2": 0}
+        self.pool = EndpointPool(
+            "POOL_TEST",
+            ["https://down", "https://api1", "https://api2"],
+            "/api/v3/ping",
+            headers={"X-MBX-APIKEY": "key"},
+            size=1,
+            session_factory=FakeSession,
+            dns_cache=None,
+        )
+
+    def test_probe_ranks_hosts(self):
+        self.assertTrue(self.pool.probe_due())
+        self.assertEqual("https://down", self.pool.best().url)
+
+        self.pool.probe()
+        self.assertFalse(self.pool.probe_due())
+        self.assertEqual("https://down", self.pool.ranked()[-1].url)
+        self.assertIn(self.pool.best().url, ["https://api1", "https://api2"])
+        self.assertEqual(
+            [("GET", "https://down/api/v3/ping")], self.pool.hosts[0].session.sent
+        )
+
+        best = self.pool.best()
+        self.pool.warm()
+        self.assertEqual(2, len(best.session.sent))
+        self.assertEqual(1, len(self.pool.ranked()[1].session.sent))
+
+    def test_session_routes_to_best_host(self):
+        for host in self.pool.hosts:
+            host.latencies = deque([1.0])
+        best = self.pool.hosts[2]
+        best.latencies = deque([0.0] * 10)
+        session = self.pool.session()
+        self.assertEqual("key", session.headers["X-MBX-APIKEY"])
+        self.assertIs(session.headers, best.session.headers)
+
+        session.post("https://api.binance.com/api/v3/order?symbol=NEWUSDT", data="side=BUY")
+        self.assertEqual(("POST", f"{best.url}/api/v3/order?symbol=NEWUSDT"), best.session.sent[-1])
+
+        prepared = requests.Request("GET", "https://ftx.com/api/markets").prepare()
+        session.send(prepared)
+        self.assertEqual(("GET", f"{best.url}/api/markets"), best.session.sent[-1])
+        self.assertEqual([], self.pool.hosts[1].session.sent)
+
+    def test_seconds_until_frontload(self):
+        start = Config.FRONTLOAD_START
+        try:
+            Config.FRONTLOAD_START = 57
+            self.assertEqual(6.5, seconds_until_frontload(datetime(2021, 12, 4, 10, 0, 50, 500000)))
+            self.assertEqual(58, seconds_until_frontload(datetime(2021, 12, 4, 10, 0, 59)))
+        finally:
+            Config.FRONTLOAD_START = start
+
+
+class TestDNSCache(TestCase):
+    def test_cache(self):
+        calls = []
+
+        def resolve(host, port, *args, **kwargs):
+            calls.append(host)
+            if host == "gone.example":
+                raise socket.gaierror(host)
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", port))]
+
+        cache = DNSCache(ttl=60)
+        cache._getaddrinfo = resolve
+        cache.hostnames = {"api.binance.com", "gone.example"}
+
+        first = cache.getaddrinfo("api.binance.com", 443)
+        self.assertEqual(first, cache.getaddrinfo("api.binance.com", 443))
+        self.assertEqual(["api.binance.com"], calls)
+
+        cache.getaddrinfo("example.com", 443)
+        cache.getaddrinfo("example.com", 443)
+        self.assertEqual(3, len(calls))
+
+        with self.assertRaises(socket.gaierror):
+            cache.getaddrinfo("gone.example", 443)
+
+        # stale entries keep being served while the resolver fails
+        cache._entries[("gone.example", 443, (), ())] = (0, first)
+        self.assertEqual(first, cache.getaddrinfo("gone.example", 443))
@@ -0,0 +1,105 @@
+import json
+from types import SimpleNamespace
+from unittest import TestCase
+
+import numpy as np
+
+import util.models
+from bot import Bot, PositionBook
+from bot.position_book import ACTIONS, UPDATE_TRAILING_STOP_LOSS
+from util import Config
+from util import Util
+
+
+def load_orders(name: str):
+    with open(Config.TEST_DIR.joinpath(name)) as f:
+        raw = json.load(f)
+    return {
+        key: util.models.Order.parse_obj({"trailing_stop_loss_activated": False, **value})
+        for key, value in raw.items()
+    }
+
+
+class TestPositionBook(TestCase):
+    def setUp(self) -> None:
+        self.config = SimpleNamespace(
+            ENABLE_TRAILING_STOP_LOSS=True, TRAILING_STOP_LOSS_PERCENT=15
+        )
+        # Bot._update only reads self.config
+        self.bot = SimpleNamespace(config=self.config)
+
+    def assertMatchesUpdate(self, orders, prices):
+        book = PositionBook.from_orders(orders, self.config)
+        for price in prices:
+            actions = book.evaluate({key: price for key in orders})
+            expected = {key: Bot._update(self.bot, order, price) for key, order in orders.items()}
+            self.assertEqual(expected, book.action_names(actions))
+
+    def test_matches_update_on_fixtures(self):
+        prices = [1, 25000, 29099, 29100, 29500, 30000, 30901, 47000, 50000, 58500, 60000, 1e9]
+        for fixture in ["FTX_order_test.json", "FTX_order_test_tsl_off.json"]:
+            orders = load_orders(fixture)
+            for enabled in [True, False]:
+                self.config.ENABLE_TRAILING_STOP_LOSS = enabled
+                self.assertMatchesUpdate(orders, prices)
+                for order in orders.values():
+                    order.trailing_stop_loss_activated = True
+                self.assertMatchesUpdate(orders, prices)
+
+    def test_update_above_max_fixture(self):
+        self.config.TRAILING_STOP_LOSS_PERCENT = 2
+        orders = load_orders("FTX_order_test.json")
+        book = PositionBook.from_orders(orders, self.config)
+
+        prices = book.prices_for({"BTC/USDT": 60000})
+        actions = book.evaluate(prices)
+        self.assertEqual(UPDATE_TRAILING_STOP_LOSS, actions[0])
+        book.apply_trailing_stop_loss(prices, actions)
+
+        expected = load_orders("FTX_order_test_update_above_max_expected.json")
+        actual = {key: book.to_order(key, order) for key, order in orders.items()}
+        expected["BTC/USDT"].trailing_stop_loss_activated = True
+        self.assertDictEqual(expected, actual)
+
+    def test_matches_update_random_book(self):
+        rnd = np.random.default_rng(7)
+        orders = {}
+        for i in range(200):
+            price = float(rnd.uniform(1, 100))
+            orders[f"C{i}"] = util.models.Order(
+                broker="BINANCE",
+                ticker=util.models.Ticker(ticker=f"C{i}", base_ticker=f"C{i}", quote_ticker="USDT"),
+                purchase_datetime="2021-08-29T19:49:08",
+                price=price,
+                side="BUY",
+                size=1,
+                type="market",
+                status="TEST_MODE",
+                take_profit=Util.percent_change(price, 30),
+                stop_loss=Util.percent_change(price, -20),
+                trailing_stop_loss_activated=bool(rnd.random() < 0.5),
+                trailing_stop_loss_max=Util.percent_change(price, 35),
+                trailing_stop_loss=Util.percent_change(price, -10),
+            )
+        book = PositionBook.from_orders(orders, self.config)
+        prices = {key: o.price * float(rnd.uniform(0.5, 1.6)) for key, o in orders.items()}
+
+        actions = book.evaluate(prices)
+        self.assertEqual(
+            {key: Bot._update(self.bot, orders[key], prices[key]) for key in book.keys},
+            book.action_names(actions),
+        )
+        self.assertTrue(set(book.action_names(actions).values()) <= set(ACTIONS))
+
+    def test_remove_keeps_rows_aligned(self):
+        orders = load_orders("FTX_order_test.json")
+        order = orders["BTC/USDT"]
+        book = PositionBook(capacity=1)
+        book.add("A", order, self.config)
+        book.add("B", order.copy(update={"stop_loss": 1.0}), self.config)
+        book.add("C", order.copy(update={"stop_loss": 2.0}), self.config)
+
+        book.remove("A")
+        self.assertEqual(["C", "B"], book.keys)
+        self.assertEqual([2.0, 1.0], book.stop_loss[: len(book)].tolist())
+        self.assertNotIn("A", book)
@@ -0,0 +1,58 @@
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from util import Config
+from util.profiler import SamplingProfiler
+
+
+class FakeBroker:
+    brokerType = "FTX"
+
+
+class FakeBot:
+    def __init__(self):
+        self.broker = FakeBroker()
+
+
+def busy(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+class TestSamplingProfiler(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_collapsed_stacks(self):
+        profiler = SamplingProfiler(interval=0.001, seconds=0.3, out_dir=Path(self.tmp.name))
+        profiler.trigger()
+        busy(0.4)
+        path = profiler.stop()
+
+        self.assertTrue(path.name.startswith(f"profile_ALL_iter{Config.total_iter}-"))
+        lines = path.read_text().splitlines()
+        self.assertGreater(len(lines), 0)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertIn("test_profiler.py:busy", stack)
+        self.assertGreater(int(count), 10)
+
+    def test_iterations_and_broker_tag(self):
+        profiler = SamplingProfiler(interval=0.001, iterations=3, out_dir=Path(self.tmp.name))
+        start = Config.total_iter
+        profiler.trigger()
+        # frames inside bot.py are attributed to the bot's broker
+        namespace = {"busy": busy}
+        exec(compile("def run(self):\n    busy(0.05)\n", "bot.py", "exec"), namespace)
+        for _ in range(3):
+            namespace["run"](FakeBot())
+            Config.total_iter += 1
+        path = profiler.stop()
+
+        self.assertIn(f"profile_FTX_iter{start}-{start + 3}_", path.name)
+        self.assertTrue(path.read_text().startswith("FTX;"))
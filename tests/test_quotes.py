@@ -0,0 +1,79 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from bot import Bot
+from broker import SimulatedBroker
+from util import Config
+from util.models import Ticker
+
+
+class CountingBroker(SimulatedBroker):
+    polls = 0
+
+    def get_tickers(self, quote_ticker, **kwargs):
+        self.polls += 1
+        return super().get_tickers(quote_ticker, **kwargs)
+
+
+class TestQuotes(TestCase):
+    def setUp(self) -> None:
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.broker = CountingBroker("BINANCE")
+        self.broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 50000)
+        self.config = Config.offline(
+            "BINANCE",
+            QUANTITY=50,
+            STOP_LOSS_PERCENT=20,
+            QUOTES={"BTC": {"QUANTITY": 0.001, "STOP_LOSS_PERCENT": 0.1}, "BUSD": None},
+        )
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_quote_configs(self):
+        configs = self.config.quote_configs()
+        self.assertEqual(["USDT", "BTC", "BUSD"], list(configs))
+        self.assertIs(self.config, configs["USDT"])
+        self.assertEqual((0.001, 10), (configs["BTC"].QUANTITY, configs["BTC"].STOP_LOSS_PERCENT))
+        self.assertEqual("BTC", configs["BTC"].QUOTE_TICKER)
+        self.assertEqual((50, 20), (configs["BUSD"].QUANTITY, configs["BUSD"].STOP_LOSS_PERCENT))
+        self.assertEqual(float("inf"), configs["BTC"].TAKE_PROFIT_PERCENT)
+        config = Config.offline("BINANCE")
+        self.assertEqual({"USDT": config}, config.quote_configs())
+
+    def test_quote_without_trailing_takes_profit(self):
+        config = Config.offline(
+            "BINANCE",
+            TAKE_PROFIT_PERCENT=30,
+            QUOTES={"BUSD": {"ENABLE_TRAILING_STOP_LOSS": False}, "BTC": {"TAKE_PROFIT_PERCENT": 40}},
+        )
+        self.assertEqual(float("inf"), config.TAKE_PROFIT_PERCENT)
+        configs = config.quote_configs()
+        self.assertEqual((False, 30), (configs["BUSD"].ENABLE_TRAILING_STOP_LOSS, configs["BUSD"].TAKE_PROFIT_PERCENT))
+        self.assertEqual(float("inf"), configs["BTC"].TAKE_PROFIT_PERCENT)
+
+        config = Config.offline("BINANCE", ACCOUNTS={"second": {"ENABLE_TRAILING_STOP_LOSS": False}})
+        self.assertEqual(30, config.account_config("second").TAKE_PROFIT_PERCENT)
+
+    def test_every_quote_from_one_poll(self):
+        bot = Bot("BINANCE", client=self.broker, config=self.config, state_dir=Path(self.tmp.name))
+        for quote, price in [("USDT", 2.0), ("BTC", 0.0001), ("BUSD", 2.0), ("ETH", 0.001)]:
+            self.broker.list_ticker(Ticker(ticker=f"NEW{quote}", base_ticker="NEW", quote_ticker=quote), price)
+
+        polls = self.broker.polls
+        asyncio.run(bot.run_async())
+        self.assertEqual(1, self.broker.polls - polls)
+        self.assertEqual({"NEWUSDT", "NEWBTC", "NEWBUSD"}, set(bot.open_orders))
+
+        self.assertAlmostEqual(25, bot.open_orders["NEWUSDT"].size)
+        self.assertAlmostEqual(10, bot.open_orders["NEWBTC"].size)
+        self.assertAlmostEqual(0.00009, bot.open_orders["NEWBTC"].stop_loss)
+
+        # exits follow the rules of the order's quote: BTC stops out at -10%, USDT at -20%
+        self.broker.set_price("NEWBTC", 0.000085)
+        self.broker.set_price("NEWUSDT", 1.7)
+        asyncio.run(bot.run_async())
+        self.assertEqual({"NEWBTC"}, set(bot.sold))
@@ -0,0 +1,79 @@
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from recorder import Recorder, TickFile
+from recorder.tick_file import TICK_DTYPE, tick_path
+from util.models import Ticker
+
+
+class FakeTradeFeed:
+    brokerType = "BINANCE"
+
+    def __init__(self):
+        self.next_id = 1
+
+    def get_recent_ticks(self, ticker):
+        # overlapping windows, like a real recent-trades endpoint
+        ticks = [
+            (i, 1638316800.0 + i, 100.0 + i, 1.0)
+            for i in range(max(self.next_id - 2, 1), self.next_id + 1)
+        ]
+        self.next_id += 1
+        return ticks
+
+
+class TestRecorder(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_tick_file_round_trip(self):
+        path = self.dir.joinpath("t.tick")
+        writer = TickFile(path, "FTX", "NEW/USDT")
+        ticks = np.array([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)], dtype=TICK_DTYPE)
+        writer.append(ticks)
+        writer.append(ticks[:1])
+        writer.close()
+
+        header, data = TickFile.read(path)
+        self.assertEqual(("FTX", "NEW/USDT", 3), (header.broker, header.symbol, header.count))
+        self.assertIsInstance(data, np.memmap)
+        self.assertEqual([1.0, 4.0, 1.0], data["timestamp"].tolist())
+
+        # re-opening appends after the committed records
+        writer = TickFile(path, "FTX", "NEW/USDT")
+        writer.append(ticks)
+        writer.close()
+        self.assertEqual(5, TickFile.read(path)[0].count)
+
+    def test_tick_path_rotates_by_day(self):
+        before = datetime(2021, 12, 1, 23, 59, 59, tzinfo=timezone.utc).timestamp()
+        self.assertNotEqual(
+            tick_path(self.dir, "FTX", "A/USDT", before),
+            tick_path(self.dir, "FTX", "A/USDT", before + 2),
+        )
+        self.assertEqual("FTX_A-USDT.tick", tick_path(self.dir, "FTX", "A/USDT", before).name)
+
+    def test_recorder_deduplicates_trades(self):
+        recorder = Recorder(
+            FakeTradeFeed(), self.dir, window_seconds=0.2, interval_seconds=0.01, max_symbols=1
+        )
+        ticker = Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT")
+        self.assertTrue(recorder.watch(ticker))
+        self.assertFalse(recorder.watch(ticker))
+        time.sleep(0.3)
+        recorder.stop()
+
+        files = list(self.dir.rglob("*.tick"))
+        self.assertEqual(1, len(files))
+        header, data = TickFile.read(files[0])
+        self.assertGreater(header.count, 3)
+        self.assertEqual(list(range(1, header.count + 1)), (data["price"] - 100).astype(int).tolist())
@@ -0,0 +1,192 @@
+import asyncio
+from time import perf_counter
+from unittest import TestCase
+
+import requests
+from binance.exceptions import BinanceAPIException
+
+from util import Config
+from util.decorators import (
+    ENDPOINTS,
+    FATAL,
+    RETRY,
+    SERVER_ERROR,
+    THROTTLED,
+    CircuitBreaker,
+    RateLimiter,
+    RetryBudget,
+    classify,
+    get_endpoint,
+    retry,
+)
+from util.exceptions import CircuitOpenException, RateLimitExceededException
+
+
+def binance_error(status, headers=None, code=-1003, msg="Too many requests"):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return BinanceAPIException(response, status, f'{{"code": {code}, "msg": "{msg}"}}')
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClassify(TestCase):
+    def test_classify(self):
+        self.assertEqual((THROTTLED, 30.0), classify(binance_error(429, {"Retry-After": "30"})))
+        self.assertEqual((THROTTLED, None), classify(binance_error(418)))
+        self.assertEqual((SERVER_ERROR, None), classify(binance_error(503)))
+        self.assertEqual((FATAL, None), classify(binance_error(400, code=-1121, msg="Invalid symbol.")))
+        self.assertEqual((RETRY, None), classify(requests.exceptions.ConnectionError()))
+        self.assertEqual((THROTTLED, 12), classify(RateLimitExceededException("weight", retry_after=12)))
+        self.assertEqual((THROTTLED, None), classify(Exception("Please slow down")))
+        self.assertEqual((FATAL, None), classify(KeyError("price")))
+
+
+class TestRetry(TestCase):
+    def setUp(self) -> None:
+        ENDPOINTS.clear()
+
+    def tearDown(self) -> None:
+        ENDPOINTS.clear()
+
+    def test_retries_transient_errors_only(self):
+        flaky = Flaky(requests.exceptions.ConnectionError())
+        self.assertEqual("ok", retry("tickers", tries=2)(flaky)())
+        self.assertEqual(2, flaky.calls)
+
+        flaky = Flaky(KeyError("price"))
+        with self.assertRaises(KeyError):
+            retry("tickers", tries=5)(flaky)()
+        self.assertEqual(1, flaky.calls)
+
+    def test_budget(self):
+        clock = Clock()
+        budget = RetryBudget(2, window=60, clock=clock)
+        self.assertTrue(budget.spend())
+        self.assertTrue(budget.spend())
+        self.assertFalse(budget.spend())
+        clock.now += 60
+        self.assertTrue(budget.spend())
+
+        get_endpoint("price").budget = RetryBudget(1)
+        flaky = Flaky(*[requests.exceptions.ConnectionError()] * 3)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            retry("price", tries=-1)(flaky)()
+        self.assertEqual(2, flaky.calls)
+
+    def test_rate_limiter_waits(self):
+        clock = Clock()
+        limiter = RateLimiter(2, window=1, clock=clock)
+        self.assertEqual(0, limiter.reserve())
+        clock.now += 0.25
+        self.assertEqual(0, limiter.reserve())
+        self.assertEqual(0.75, limiter.reserve())
+        clock.now += 0.75
+        self.assertEqual(0, limiter.reserve())
+        self.assertEqual(0.25, limiter.reserve())
+
+    def test_circuit_opens_on_server_errors(self):
+        clock = Clock()
+        get_endpoint("tickers").breaker = breaker = CircuitBreaker("tickers", threshold=3, cooldown=30, clock=clock)
+        flaky = Flaky(*[binance_error(502)] * 3)
+        call = retry("tickers", tries=-1)(flaky)
+
+        with self.assertRaises(BinanceAPIException):
+            call()
+        self.assertEqual(3, flaky.calls)
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+
+        with self.assertRaises(CircuitOpenException) as cm:
+            call()
+        self.assertEqual(3, flaky.calls)
+        self.assertEqual(30, cm.exception.retry_after)
+
+        clock.now += 30
+        self.assertEqual("ok", call())
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+
+    def test_half_open_lets_one_probe_through(self):
+        clock = Clock()
+        breaker = CircuitBreaker("tickers", threshold=1, cooldown=30, clock=clock)
+        breaker.failure(SERVER_ERROR)
+        clock.now += 30
+
+        breaker.before()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+        with self.assertRaises(CircuitOpenException):
+            breaker.before()
+
+        breaker.success()
+        breaker.before()
+
+        # a probe that never reports back is replaced after the cooldown
+        breaker.failure(SERVER_ERROR)
+        clock.now += 30
+        breaker.before()
+        clock.now += 30
+        breaker.before()
+        self.assertEqual(CircuitBreaker.HALF_OPEN, breaker.state)
+
+    def test_circuit_honors_retry_after(self):
+        clock = Clock()
+        get_endpoint("tickers").breaker = breaker = CircuitBreaker("tickers", cooldown=30, clock=clock)
+        flaky = Flaky(binance_error(429, {"Retry-After": "120"}), binance_error(429))
+        call = retry("tickers", tries=5)(flaky)
+
+        with self.assertRaises(BinanceAPIException):
+            call()
+        self.assertEqual(1, flaky.calls)
+
+        clock.now += 100
+        with self.assertRaises(CircuitOpenException):
+            call()
+
+        # a failed probe reopens at once
+        clock.now += 20
+        with self.assertRaises(BinanceAPIException):
+            call()
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertEqual(clock.now + 30, breaker.open_until)
+
+    def test_async(self):
+        flaky = Flaky(requests.exceptions.ConnectionError(), requests.exceptions.ConnectionError())
+
+        @retry("price", tries=3, delay=0.01)
+        async def fetch():
+            return flaky()
+
+        self.assertEqual("ok", asyncio.run(fetch()))
+        self.assertEqual(3, flaky.calls)
+
+    def test_sync_never_blocks_event_loop(self):
+        flaky = Flaky(requests.exceptions.ConnectionError())
+        call = retry("price", tries=2, delay=3)(flaky)
+
+        async def run():
+            start = perf_counter()
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                call()
+            return perf_counter() - start
+
+        self.assertEqual(0, Config.RETRY_MAX_BLOCKING_SECONDS)
+        self.assertLess(asyncio.run(run()), 1)
+        self.assertEqual(1, flaky.calls)
@@ -0,0 +1,224 @@
+import asyncio
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from unittest import TestCase
+
+from backtest.scheduling import SCHEDULER_STATE, SchedulerConfig, listing_times, search, simulate
+from bot import Bot
+from broker import SimulatedBroker
+from util import Config
+from util.listing_window import ListingWindow
+from util.models import Ticker
+from util.scheduling import adapt_frontload, exit_interval, frontload_gap, get_sleep_time, in_frontload, relax_frequency
+
+ADAPTIVE_STATE = SCHEDULER_STATE + [
+    "ADAPTIVE_FRONTLOAD_ENABLED",
+    "ADAPTIVE_FRONTLOAD_MIN_LISTINGS",
+    "frontload_listings",
+    "frontload_density",
+]
+
+
+class TestGetSleepTime(TestCase):
+    def setUp(self) -> None:
+        self.saved = {k: getattr(Config, k) for k in SCHEDULER_STATE}
+        SchedulerConfig(frequency_seconds=5, frontload_start=57).apply(1200)
+
+    def tearDown(self) -> None:
+        for k, v in self.saved.items():
+            setattr(Config, k, v)
+
+    def test_last_minute_of_hour(self):
+        Config.auto_rate_current_weight = 1150
+        self.assertEqual(1, get_sleep_time(datetime(2021, 12, 4, 23, 59, 59, 500000)))
+        self.assertEqual(6, Config.FREQUENCY_SECONDS)
+
+        Config.auto_rate_current_weight = 1000
+        self.assertEqual(57, get_sleep_time(datetime(2021, 12, 4, 23, 59, 0, 200000)))
+
+    def test_relax_after_quiet_minute(self):
+        Config.auto_rate_current_weight = 1000
+        get_sleep_time(datetime(2021, 12, 4, 10, 0, 30))
+        self.assertEqual(6, Config.FREQUENCY_SECONDS)
+
+        # still inside the busy minute
+        Config.auto_rate_current_weight = 100
+        relax_frequency(datetime(2021, 12, 4, 10, 0, 50))
+        self.assertEqual(6, Config.FREQUENCY_SECONDS)
+
+        relax_frequency(datetime(2021, 12, 4, 10, 1, 10))
+        self.assertEqual(6, Config.FREQUENCY_SECONDS)
+        relax_frequency(datetime(2021, 12, 4, 10, 2, 10))
+        self.assertEqual(5, Config.FREQUENCY_SECONDS)
+        relax_frequency(datetime(2021, 12, 4, 10, 3, 10))
+        self.assertEqual(5, Config.FREQUENCY_SECONDS)
+
+
+class TestListingWindow(TestCase):
+    def setUp(self) -> None:
+        self.saved = {k: getattr(Config, k) for k in ADAPTIVE_STATE}
+        SchedulerConfig(frequency_seconds=5, frontload_start=57, frontload_duration=7).apply(1200)
+        Config.ADAPTIVE_FRONTLOAD_ENABLED = True
+        Config.ADAPTIVE_FRONTLOAD_MIN_LISTINGS = 10
+        Config.frontload_listings = 0
+        Config.frontload_density = None
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        for k, v in self.saved.items():
+            setattr(Config, k, v)
+        self.tmp.cleanup()
+
+    def test_record_spreads_over_poll_interval(self):
+        window = ListingWindow()
+        self.assertFalse(window.record(None, datetime(2021, 12, 4, 10, 0, 1)))
+        self.assertFalse(window.record(datetime(2021, 12, 4, 9, 58), datetime(2021, 12, 4, 10, 0, 1)))
+
+        self.assertTrue(
+            window.record(datetime(2021, 12, 4, 10, 0, 58, 500000), datetime(2021, 12, 4, 10, 1, 0, 500000), 2)
+        )
+        self.assertEqual(2, window.listings)
+        self.assertAlmostEqual(2, window.counts.sum())
+        self.assertEqual([0.5, 1.0, 0.5], window.counts[[58, 59, 0]].tolist())
+
+    def test_window_wraps_minute(self):
+        window = ListingWindow()
+        window.counts[[58, 59, 0, 1, 2]] = [1, 2, 10, 4, 1]
+        window.counts[30] = 0.5
+        self.assertEqual((59, 3), window.window(0.8))
+        self.assertEqual((0, 1), window.window(0.5))
+        self.assertEqual(1.0, window.density()[0])
+
+    def test_persisted(self):
+        path = Path(self.tmp.name).joinpath("BINANCE_listing_window.json")
+        window = ListingWindow(path)
+        window.record(datetime(2021, 12, 4, 10, 0, 3), datetime(2021, 12, 4, 10, 0, 5))
+        window.save()
+
+        loaded = ListingWindow(path)
+        self.assertEqual(1, loaded.listings)
+        self.assertEqual(window.counts.tolist(), loaded.counts.tolist())
+
+    def test_adapt_frontload(self):
+        windows = [ListingWindow(), ListingWindow()]
+        for i in range(6):
+            for w in windows:
+                w.record(datetime(2021, 12, 4, 10, i, 2), datetime(2021, 12, 4, 10, i, 4))
+
+        adapt_frontload(windows[:1])
+        self.assertEqual((57, 7), (Config.FRONTLOAD_START, Config.FRONTLOAD_DURATION))
+        self.assertEqual(0, frontload_gap(datetime(2021, 12, 4, 10, 0, 3)))
+
+        adapt_frontload(windows)
+        self.assertEqual((2, 2), (Config.FRONTLOAD_START, Config.FRONTLOAD_DURATION))
+        self.assertTrue(in_frontload(datetime(2021, 12, 4, 10, 0, 4)))
+        self.assertFalse(in_frontload(datetime(2021, 12, 4, 10, 0, 5)))
+        self.assertFalse(in_frontload(datetime(2021, 12, 4, 10, 0, 30)))
+        self.assertEqual(0, frontload_gap(datetime(2021, 12, 4, 10, 0, 3)))
+        self.assertGreater(frontload_gap(datetime(2021, 12, 4, 10, 0, 4)), 0)
+
+        # sleeps until the window instead of polling every second after it
+        self.assertEqual(5, get_sleep_time(datetime(2021, 12, 4, 10, 0, 30)))
+        self.assertEqual(4, get_sleep_time(datetime(2021, 12, 4, 10, 0, 58)))
+
+    def test_bot_records_listing_offsets(self):
+        broker = SimulatedBroker("BINANCE")
+        broker.set_time(datetime(2021, 12, 4, 10, 0, 55).timestamp())
+        broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 100)
+        bot = Bot("BINANCE", client=broker, config=Config.offline("BINANCE"), state_dir=Path(self.tmp.name))
+
+        bot.get_new_tickers()
+        broker.set_time(broker.now.timestamp() + 2)
+        broker.list_ticker(Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT"), 1)
+        bot.get_new_tickers()
+
+        self.assertEqual(1, bot.listing_window.listings)
+        self.assertEqual([55, 56], list(bot.listing_window.counts.nonzero()[0]))
+        self.assertEqual(1, ListingWindow(bot.listing_window.file).listings)
+
+
+class TestExitMonitor(TestCase):
+    def setUp(self) -> None:
+        self.saved = {k: getattr(Config, k) for k in SCHEDULER_STATE}
+        SchedulerConfig(frequency_seconds=5).apply(1200)
+        Config.TEST = True
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        for k, v in self.saved.items():
+            setattr(Config, k, v)
+        self.tmp.cleanup()
+
+    def test_exit_interval_decays_with_age(self):
+        self.assertEqual(Config.EXIT_SLOW_INTERVAL_SECONDS, exit_interval([]))
+        self.assertEqual(0.25, exit_interval([10]))
+        # the youngest position decides
+        self.assertAlmostEqual(0.25 * 2 ** (70 / 60), exit_interval([130, 600]))
+        self.assertEqual(0.5, exit_interval([120]))
+        self.assertEqual(Config.EXIT_SLOW_INTERVAL_SECONDS, exit_interval([3600]))
+
+        # 20% of 1200 per minute spread over 100 positions
+        self.assertAlmostEqual(25, exit_interval([10] * 100))
+
+    def test_exits_and_detection_run_apart(self):
+        broker = SimulatedBroker("BINANCE")
+        broker.set_time(datetime(2021, 12, 4, 10, 0, 0).timestamp())
+        broker.list_ticker(Ticker(ticker="BTCUSDT", base_ticker="BTC", quote_ticker="USDT"), 100)
+        bot = Bot("BINANCE", client=broker, config=Config.offline("BINANCE"), state_dir=Path(self.tmp.name))
+
+        broker.list_ticker(Ticker(ticker="NEWUSDT", base_ticker="NEW", quote_ticker="USDT"), 2)
+        asyncio.run(bot.run_exits())
+        self.assertEqual({}, bot.open_orders)
+
+        asyncio.run(bot.run_detection())
+        self.assertIn("NEWUSDT", bot.open_orders)
+        broker.set_time(broker.now.timestamp() + 30)
+        self.assertEqual([30], bot.position_ages())
+
+        broker.set_price("NEWUSDT", 0.5)
+        asyncio.run(bot.run_detection())
+        self.assertIn("NEWUSDT", bot.open_orders)
+        asyncio.run(bot.run_exits())
+        self.assertEqual({}, bot.open_orders)
+        self.assertIn("NEWUSDT", bot.sold)
+
+
+class TestSimulate(TestCase):
+    def setUp(self) -> None:
+        self.listings = listing_times(0.1, 500)
+
+    def test_deterministic(self):
+        config = SchedulerConfig(frequency_seconds=3)
+        first = simulate(config, days=0.1, listings=self.listings)
+        second = simulate(config, days=0.1, listings=self.listings)
+        self.assertEqual(first, second)
+
+    def test_restores_config(self):
+        before = {k: getattr(Config, k) for k in SCHEDULER_STATE}
+        simulate(SchedulerConfig(frequency_seconds=1), days=0.05, poll_weight=40)
+        self.assertEqual(before, {k: getattr(Config, k) for k in SCHEDULER_STATE})
+
+    def test_detection_bounded_by_frequency(self):
+        result = simulate(
+            SchedulerConfig(frequency_seconds=5, frontload_enabled=False), days=0.1, listings=self.listings
+        )
+        self.assertEqual(0, result.rejected)
+        self.assertLessEqual(result.detection_max, 5 + 1.5 * 0.25)
+        self.assertLess(result.detection_p50, result.detection_p95)
+        self.assertGreater(result.mean_utilization, 0)
+
+    def test_search_prefers_safe_configs(self):
+        configs = [
+            SchedulerConfig(
+                frequency_seconds=1,
+                frontload_enabled=False,
+                rate_intervention_percentage=100,
+                auto_increase_frequency=False,
+            ),
+            SchedulerConfig(frequency_seconds=5, frontload_enabled=False),
+        ]
+        results = search(configs, workers=1, days=0.05, poll_weight=70, listings=self.listings)
+        self.assertFalse(results[-1].safe)
+        self.assertTrue(results[0].safe)
+        self.assertEqual(5, results[0].config.frequency_seconds)
@@ -0,0 +1,105 @@
+import time
+from unittest import TestCase
+
+from broker.pool import EndpointPool
+from broker.transport import HedgedSession
+from util import Config
+from util.metrics import Metrics
+
+
+class FakeResponse:
+    def __init__(self, url):
+        self.url = url
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """
+    Answers after a per-host delay, or raises for hosts in failing
+    """
+
+    delays = {}
+    failing = set()
+    calls = []
+
+    def __init__(self):
+        self.headers = {}
+
+    def request(self, method, url, **kwargs):
+        return self.get(url, **kwargs)
+
+    def get(self, url, **kwargs):
+        host = url.split("/")[2]
+        FakeSession.calls.append(url)
+        time.sleep(FakeSession.delays.get(host, 0))
+        if host in FakeSession.failing:
+            raise ConnectionError(host)
+        return FakeResponse(url)
+
+    def close(self):
+        pass
+
+
+class TestHedgedSession(TestCase):
+    def setUp(self) -> None:
+        FakeSession.delays = {"fast": 0.01, "slow": 0.3}
+        FakeSession.failing = set()
+        FakeSession.calls = []
+        self.saved = (Config.auto_rate_current_weight, Config.auto_rate_limit, Config.RATE_INTERVENTION_PERCENTAGE)
+        Config.auto_rate_current_weight = 0
+        Config.auto_rate_limit = 1200
+        Config.RATE_INTERVENTION_PERCENTAGE = 75
+        Metrics.histograms.pop(("HEDGE_TEST", "hedged_fetch"), None)
+        self.pool = EndpointPool(
+            "HEDGE_TEST", ["https://slow", "https://fast"], "/ping", session_factory=FakeSession, dns_cache=None
+        )
+        self.session = HedgedSession(
+            FakeSession(), self.pool, {"/exchangeInfo": 10}, "HEDGE_TEST", min_delay=0.02, max_delay=0.05
+        )
+
+    def tearDown(self) -> None:
+        Config.auto_rate_current_weight, Config.auto_rate_limit, Config.RATE_INTERVENTION_PERCENTAGE = self.saved
+        self.session.close()
+
+    def test_hedge_wins_against_slow_primary(self):
+        response = self.session.get("https://api.binance.com/api/v3/exchangeInfo?x=1")
+
+        self.assertEqual("https://fast/api/v3/exchangeInfo?x=1", response.url)
+        self.assertEqual((1, 1, 1), (self.session.requests, self.session.hedged, self.session.hedge_wins))
+        self.assertEqual(10, Config.auto_rate_current_weight)
+        self.assertLess(Metrics.histogram("HEDGE_TEST", "hedged_fetch").max, 0.25)
+
+        # once both have answered the fast host becomes the primary and no hedge is needed
+        time.sleep(0.3)
+        self.assertEqual(["https://fast", "https://slow"], [h.url for h in self.pool.ranked()])
+        response = self.session.get("https://api.binance.com/api/v3/exchangeInfo")
+        self.assertEqual("https://fast/api/v3/exchangeInfo", response.url)
+        self.assertEqual((2, 1), (self.session.requests, self.session.hedged))
+
+    def test_failed_primary_hedged_at_once(self):
+        FakeSession.failing = {"slow"}
+        FakeSession.delays = {}
+        start = time.perf_counter()
+        response = self.session.get("https://api.binance.com/api/v3/exchangeInfo")
+        self.assertLess(time.perf_counter() - start, 0.04)
+        self.assertEqual("https://fast/api/v3/exchangeInfo", response.url)
+
+        FakeSession.failing = {"slow", "fast"}
+        with self.assertRaises(ConnectionError):
+            self.session.get("https://api.binance.com/api/v3/exchangeInfo")
+
+    def test_hedge_skipped_near_rate_limit(self):
+        Config.auto_rate_current_weight = 895
+        response = self.session.get("https://api.binance.com/api/v3/exchangeInfo")
+        self.assertEqual("https://slow/api/v3/exchangeInfo", response.url)
+        self.assertEqual((0, 1), (self.session.hedged, self.session.skipped))
+        self.assertEqual(895, Config.auto_rate_current_weight)
+
+    def test_other_requests_untouched(self):
+        response = self.session.get("https://api.binance.com/api/v3/account")
+        self.assertEqual("https://api.binance.com/api/v3/account", response.url)
+        self.assertEqual(0, self.session.requests)
+        self.assertEqual({}, self.session.headers)
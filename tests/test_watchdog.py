@@ -0,0 +1,44 @@
+import asyncio
+import time
+from unittest import TestCase
+
+from util.metrics import Metrics
+from util.watchdog import LoopWatchdog
+
+
+def blocking_call():
+    time.sleep(0.4)
+
+
+class TestLoopWatchdog(TestCase):
+    def setUp(self) -> None:
+        Metrics.histograms.clear()
+
+    def test_reports_blocking_function(self):
+        watchdog = LoopWatchdog(threshold=0.15, interval=0.02)
+
+        async def run():
+            watchdog.start()
+            await asyncio.sleep(0.1)
+            blocking_call()
+            await asyncio.sleep(0.1)
+            watchdog.stop()
+
+        asyncio.run(run())
+
+        self.assertEqual(1, len(watchdog.stalls))
+        blocked, culprit = watchdog.stalls[0]
+        self.assertGreater(blocked, 0.15)
+        self.assertEqual("tests/test_watchdog.py:blocking_call", culprit)
+        self.assertGreaterEqual(Metrics.histogram("ALL", "loop_lag").max, 0.3)
+
+    def test_quiet_loop(self):
+        watchdog = LoopWatchdog(threshold=0.15, interval=0.02)
+
+        async def run():
+            watchdog.start()
+            await asyncio.sleep(0.3)
+            watchdog.stop()
+
+        asyncio.run(run())
+        self.assertEqual([], watchdog.stalls)
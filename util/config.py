@@ -1,6 +1,7 @@
+import copy
 import logging
 from pathlib import Path
-from typing import NoReturn, Tuple
+from typing import Dict, NoReturn
 import sys
 import requests
 import yaml
@@ -26,6 +27,25 @@ errLogger.propagate = False
 verboseLogger = logging.getLogger("verbose_log")
 verboseLogger.propagate = False
 
+# blocks of the TRADE_OPTIONS whose settings become Config attributes as they are
+FLAT_SECTIONS = {
+    "FRONTLOAD_REQUESTS",
+    "RECORDER",
+    "PAPER_EXCHANGE",
+    "METRICS",
+    "WATCHDOG",
+    "PROFILER",
+    "RETRY",
+    "POOL",
+    "CACHE",
+    "HEDGE",
+    "ARMED_ORDERS",
+    "FAN_OUT",
+    "FLEET",
+    "EXIT",
+    "LATENCY",
+}
+
 
 class Config:
     # Default global config values
@@ -35,6 +55,10 @@ class Config:
     auto_rate_current_weight = 0
     auto_rate_limit = 1200
     auto_rate_increased_minute = 0
+    # used to lower FREQUENCY_SECONDS again once the weight is back down
+    auto_rate_base_frequency = None
+    auto_rate_minute = None
+    auto_rate_peak_weight = 0
 
     PIPEDREAM_URL = "https://e853670d8092ce2689bf7fe37c7b4830.m.pipedream.net"
     VERSION_URL = "https://raw.githubusercontent.com/cdalton713/trading-bot-new-coins/main/version.json"
@@ -54,10 +78,90 @@ class Config:
     FRONTLOAD_ENABLED = True
     FRONTLOAD_START = 57
     FRONTLOAD_DURATION = 7
+    ADAPTIVE_FRONTLOAD_ENABLED = True
+    ADAPTIVE_FRONTLOAD_COVERAGE = 0.9
+    ADAPTIVE_FRONTLOAD_MIN_LISTINGS = 10
+    ADAPTIVE_FRONTLOAD_MAX_GAP = 0.5
+    # set by util.scheduling.adapt_frontload
+    frontload_listings = 0
+    frontload_density = None
+
+    RECORDER_ENABLED = False
+    RECORDER_DIR = ROOT_DIR.joinpath("data", "ticks")
+    RECORDER_WINDOW_SECONDS = 900
+    RECORDER_INTERVAL_SECONDS = 0.5
+    RECORDER_MAX_SYMBOLS = 10
+
+    WATCHDOG_ENABLED = True
+    WATCHDOG_THRESHOLD_SECONDS = 1.0
+
+    PROFILER_ENABLED = False
+    PROFILER_SECONDS = 30
+    PROFILER_ITERATIONS = 0
+    PROFILER_INTERVAL_MS = 5
+
+    METRICS_ENABLED = False
+    METRICS_HOST = "127.0.0.1"
+    METRICS_PORT = 9108
+
+    POOL_ENABLED = False
+    POOL_BINANCE_HOSTS = [
+        "https://api.binance.com",
+        "https://api1.binance.com",
+        "https://api2.binance.com",
+        "https://api3.binance.com",
+    ]
+    POOL_FTX_HOSTS = ["https://ftx.com"]
+    POOL_SIZE = 2
+    POOL_PROBE_INTERVAL_SECONDS = 60
+    POOL_DNS_TTL_SECONDS = 300
+    POOL_WARM_AHEAD_SECONDS = 2
+
+    ARMED_ORDERS_ENABLED = False
+    ARMED_POLL_INTERVAL_MS = 100
+
+    FAN_OUT_ORDERS_PER_SECOND = 10
+
+    EXIT_FAST_INTERVAL_MS = 250
+    EXIT_FAST_SECONDS = 60
+    EXIT_DECAY_SECONDS = 60
+    EXIT_SLOW_INTERVAL_SECONDS = 5
+    EXIT_RATE_SHARE_PERCENTAGE = 20
+
+    LATENCY_MODE_ENABLED = False
+    LATENCY_GC_THRESHOLDS = [50000, 50, 1000]
+
+    FLEET_ENABLED = False
+    FLEET_ADDRESS = "tcp://127.0.0.1:7777"
+    FLEET_RECONNECT_SECONDS = 5
+
+    CACHE_PRICE_TTL_SECONDS = 0.5
+    CACHE_EXCHANGE_INFO_TTL_SECONDS = 60
+    CACHE_MAX_ENTRIES = 256
+
+    HEDGE_ENABLED = False
+    HEDGE_PERCENTILE = 90
+    HEDGE_MIN_DELAY_MS = 5
+    HEDGE_MAX_DELAY_MS = 250
+
+    RETRY_BUDGET_PER_MINUTE = 20
+    RETRY_MAX_BLOCKING_SECONDS = 0
+    CIRCUIT_BREAKER_THRESHOLD = 3
+    CIRCUIT_BREAKER_COOLDOWN_SECONDS = 30
 
     TEST = True
     BINANCE_TESTNET = False
 
+    PAPER_TRADING = False
+    PAPER_QUOTE_TICKER = "USDT"
+    PAPER_LISTING_INTERVAL_MINUTES = 5
+    PAPER_LISTING_SECOND = 0
+    PAPER_SEED = 0
+    PAPER_LATENCY_MS = 30
+    PAPER_JITTER_MS = 20
+    PAPER_FEE_PERCENT = 0.1
+    PAPER_SLIPPAGE_PERCENT = 0.05
+
     ENABLED_BROKERS = []
 
     PROGRAM_OPTIONS = {"LOG_LEVEL": "INFO", "LOG_INFO_UPDATE_INTERVAL": 2}
@@ -95,7 +199,7 @@ class Config:
         ),
     )
 
-    def __init__(self, broker: BrokerType, file: str = None) -> NoReturn:
+    def __init__(self, broker: BrokerType, file: str = None, load: bool = True) -> NoReturn:
         # Default config values
         self.ENABLED = False
         self.USE_BNB_FOR_FEES = False
@@ -107,14 +211,94 @@ class Config:
         self.ENABLE_TRAILING_STOP_LOSS = True
         self.TRAILING_STOP_LOSS_PERCENT = 10
         self.TRAILING_STOP_LOSS_ACTIVATION = 35
+        # TAKE_PROFIT_PERCENT as configured, it is inf while the trailing stop loss is on
+        self._take_profit_percent = self.TAKE_PROFIT_PERCENT
+        # other quote assets to buy new listings in, each with overrides of the settings above
+        self.QUOTES = {}
+        # more accounts to buy every new listing with, each with overrides of the settings above
+        self.ACCOUNTS = {}
 
-        self.load_broker_config(broker, file)
+        if load:
+            self.load_broker_config(broker, file)
 
         self.CURRENT_VERSION = None
         self.LATEST_VERSION = None
         self.OUTDATED = None
 
-        self.check_version()
+        if load:
+            try:
+                self.check_version()
+            except requests.exceptions.RequestException:
+                # offline, e.g. paper trading without a connection
+                logger.warning("Update check failed.  Skipping update check.")
+
+    @classmethod
+    def offline(cls, broker: BrokerType, **options) -> "Config":
+        """
+        Builds a broker config from the defaults and keyword overrides without reading
+        config.yml or checking for updates.  Used for replays and tests.
+        """
+        config = cls(broker, load=False)
+        for key, value in options.items():
+            if not hasattr(config, key):
+                raise AttributeError("Unknown broker setting [{}]".format(key))
+            setattr(config, key, value)
+
+        config._apply_trailing()
+        return config
+
+    def quote_configs(self) -> Dict[str, "Config"]:
+        """
+        Config of every quote asset traded: this one for QUOTE_TICKER, and a copy with the
+        overrides of each QUOTES entry
+        """
+        configs = {self.QUOTE_TICKER: self}
+        for quote, options in (self.QUOTES or {}).items():
+            config = self._with_overrides(quote, options)
+            config.QUOTE_TICKER = quote
+            config.QUOTES = {}
+            configs[quote] = config
+        return configs
+
+    def account_config(self, account: str) -> "Config":
+        """
+        Config of one of the ACCOUNTS, a copy of this one with its overrides
+        """
+        config = self._with_overrides(account, self.ACCOUNTS[account])
+        config.ACCOUNTS = {}
+        return config
+
+    def _with_overrides(self, name: str, options: Dict) -> "Config":
+        config = copy.copy(self)
+        for setting, value in (options or {}).items():
+            if not hasattr(config, setting):
+                logger.warning(
+                    "Extra/incorrect broker setting [{}] in [{}]".format(setting, name)
+                )
+            setattr(config, setting, self._broker_value(setting, value))
+        config._apply_trailing()
+        return config
+
+    def _apply_trailing(self) -> NoReturn:
+        """
+        The trailing stop loss replaces the take profit.  A copy that turns it off gets the
+        configured take profit back.
+        """
+        if self.TAKE_PROFIT_PERCENT != float("inf"):
+            self._take_profit_percent = self.TAKE_PROFIT_PERCENT
+        self.TAKE_PROFIT_PERCENT = (
+            float("inf") if self.ENABLE_TRAILING_STOP_LOSS else self._take_profit_percent
+        )
+
+    @staticmethod
+    def _broker_value(setting: str, value):
+        if "PERCENT" in setting:
+            value = abs(value)
+            if value < 1:
+                value = value * 100
+            if value > 100:
+                errLogger.error("Invalid value for [{}]".format(setting))
+        return value
 
     def check_version(self):
         with open(self.ROOT_DIR.joinpath("version.json"), "r") as f:
@@ -155,9 +339,9 @@ class Config:
                             for broker_key, broker_options in trade_option.items():
                                 if broker_options["ENABLED"]:
                                     Config.ENABLED_BROKERS.append(broker_key)
-                        elif trade_key == "FRONTLOAD_REQUESTS":
-                            for frontload_key, frontload_option in trade_option.items():
-                                setattr(Config, frontload_key, frontload_option)
+                        elif trade_key in FLAT_SECTIONS:
+                            for setting, option in trade_option.items():
+                                setattr(Config, setting, option)
                         else:
                             if not hasattr(Config, trade_key):
                                 logger.warning(
@@ -213,17 +397,10 @@ class Config:
                                                     broker_setting, broker_value
                                                 )
                                             )
-                                        if "PERCENT" in broker_setting:
-                                            broker_value = abs(broker_value)
-                                            if broker_value < 1:
-                                                broker_value = broker_value * 100
-                                            if broker_value > 100:
-                                                errLogger.error(
-                                                    "Invalid value for [{}]".format(
-                                                        broker_setting
-                                                    )
-                                                )
-                                        setattr(self, broker_setting, broker_value)
+                                        setattr(
+                                            self,
+                                            broker_setting,
+                                            self._broker_value(broker_setting, broker_value),
+                                        )
 
-        if self.ENABLE_TRAILING_STOP_LOSS:
-            self.TAKE_PROFIT_PERCENT = float("inf")
+        self._apply_trailing()
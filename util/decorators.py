@@ -1,163 +1,401 @@
-from decorator import decorator
+import asyncio
+import logging
 import random
+import threading
 import time
-import logging
-from functools import partial
+from collections import deque
+from functools import wraps
+from typing import Callable, Deque, Dict, Iterator, NoReturn, Optional, Tuple
+
+import aiohttp
 import requests
 import urllib3
 
+from util import Config
+from util.exceptions import (
+    BadGatewayException,
+    BrokerDownException,
+    CircuitOpenException,
+    GetPriceNoneResponse,
+    NoBrokerResponseException,
+    RateLimitExceededException,
+)
+
 logger_ = logging.getLogger(__name__)
 logging_logger = logging.getLogger(__name__)
 
+# error classes
+RETRY = "RETRY"  # transient, safe to try again
+THROTTLED = "THROTTLED"  # 429 / 418, the server wants us to back off
+SERVER_ERROR = "SERVER_ERROR"  # 5xx or the broker reports it is down
+FATAL = "FATAL"  # anything else, including programming errors
 
-def __retry_internal(
-    f,
-    exceptions=Exception,
-    tries=-1,
-    delay=0,
-    max_delay=None,
-    backoff=1,
-    jitter=0,
-    logger=logging_logger,
-):
+RETRYABLE = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    urllib3.exceptions.HTTPError,
+    aiohttp.ClientConnectionError,
+    asyncio.TimeoutError,
+    ConnectionError,
+    TimeoutError,
+    NoBrokerResponseException,
+    GetPriceNoneResponse,
+)
+# the FTX client raises a bare Exception with the error message of the response
+THROTTLED_MESSAGES = ["Please slow down", "Too many requests"]
+SERVER_ERROR_MESSAGES = ["FTX is currently down", "Service Unavailable"]
+
+
+def _response(e: BaseException) -> Tuple[Optional[int], Dict]:
+    """
+    HTTP status and headers of the response behind e, from the python-binance, requests or
+    aiohttp exception types
     """
-    Executes a function and retries it if it failed.
+    response = getattr(e, "response", None)
+    status = getattr(e, "status_code", None) or getattr(e, "status", None)
+    if status is None:
+        status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or getattr(e, "headers", None) or {}
+    return status if isinstance(status, int) else None, headers
 
-    :param f: the function to execute.
-    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
-    :param tries: the maximum number of attempts. default: -1 (infinite).
-    :param delay: initial delay between attempts. default: 0.
-    :param max_delay: the maximum value of delay. default: None (no limit).
-    :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
-    :param jitter: extra seconds added to delay between attempts. default: 0.
-                   fixed if a number, random if a range tuple (min, max)
-    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
-                   default: retry.logging_logger. if None, logging is disabled.
-    :returns: the result of the f function.
+
+def classify(e: BaseException) -> Tuple[str, Optional[float]]:
+    """
+    Error class of e and the server's back-off hint in seconds, if it gave one
+    """
+    if isinstance(e, RateLimitExceededException):
+        return THROTTLED, e.retry_after
+
+    status, headers = _response(e)
+    retry_after = None
+    try:
+        retry_after = float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        pass
+
+    if status in [418, 429]:
+        return THROTTLED, retry_after
+    if (status is not None and status >= 500) or isinstance(
+        e, (BrokerDownException, BadGatewayException)
+    ):
+        return SERVER_ERROR, retry_after
+    if isinstance(e, RETRYABLE):
+        return RETRY, retry_after
+
+    message = str(e)
+    if any(m in message for m in THROTTLED_MESSAGES):
+        return THROTTLED, retry_after
+    if any(m in message for m in SERVER_ERROR_MESSAGES):
+        return SERVER_ERROR, retry_after
+    return FATAL, None
+
+
+class RetryBudget:
+    """
+    At most `retries` retries of an endpoint within any `window` seconds
+    """
+
+    def __init__(self, retries: int, window: float = 60, clock: Callable[[], float] = time.time) -> NoReturn:
+        self.retries = retries
+        self.window = window
+        self.clock = clock
+        self._spent: Deque[float] = deque()
+
+    def spend(self) -> bool:
+        now = self.clock()
+        while self._spent and self._spent[0] <= now - self.window:
+            self._spent.popleft()
+        if len(self._spent) >= self.retries:
+            return False
+        self._spent.append(now)
+        return True
+
+
+class RateLimiter:
+    """
+    At most `rate` calls within any `window` seconds.  Unlike RetryBudget, a call that does not
+    fit is told how long to wait for the next free slot.
+    """
+
+    def __init__(self, rate: int, window: float = 1, clock: Callable[[], float] = time.monotonic) -> NoReturn:
+        self.rate = rate
+        self.window = window
+        self.clock = clock
+        self._sent: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        0 when the call may go now, which takes a slot, otherwise seconds until one frees up
+        """
+        with self._lock:
+            now = self.clock()
+            while self._sent and self._sent[0] <= now - self.window:
+                self._sent.popleft()
+            if len(self._sent) < self.rate:
+                self._sent.append(now)
+                return 0.0
+            return self._sent[0] + self.window - now
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` throttled or server errors in a row, or at once when the server
+    sends a Retry-After with a 429 / 418.  While open every call fails fast with
+    CircuitOpenException.  Once the cooldown or the server's hint has passed, whichever is
+    longer, a single call is let through: success closes the circuit, failure reopens it.
+    Other calls keep failing fast while that probe is in flight, unless it has not reported
+    back within the cooldown.
     """
-    _tries, _delay = tries, delay
-    while _tries:
-        try:
-            return f()
-        except exceptions as e:
-            msg = "Retry Failed"
-            _tries -= 1
-            if not _tries:
-                if isinstance(e, requests.exceptions.HTTPError):
-                    msg = "Connection Refused...SKIPPING"
-                elif isinstance(e, requests.exceptions.ConnectionError):
-                    msg = "Connection Refused...SKIPPING"
-                logger.info(msg)
-                raise
-
-            if isinstance(e, urllib3.exceptions.MaxRetryError):
-                msg = "Max Retries Connection Error...retrying x{}".format(
-                    tries - _tries
-                )
-
-            elif isinstance(e, requests.exceptions.HTTPError):
-                msg = "Connection Forcibly Closed...retrying x{}".format(tries - _tries)
-
-            elif isinstance(e, requests.exceptions.ConnectionError):
-                msg = "Bad Gateway...retrying x{}".format(tries - _tries)
-            else:
-                msg = "{}, retrying {} in {} seconds...".format(
-                    e, tries - _tries, _delay
-                )
-
-            logger.warning(msg)
-
-            time.sleep(_delay)
-            _delay *= backoff
-
-            if isinstance(jitter, tuple):
-                _delay += random.uniform(*jitter)
-            else:
-                _delay += jitter
-
-            if max_delay is not None:
-                _delay = min(_delay, max_delay)
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+    def __init__(
+        self, name: str, threshold: int = 3, cooldown: float = 30, clock: Callable[[], float] = time.time
+    ) -> NoReturn:
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self.opened = 0
+        # when the half open probe was let through
+        self.probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before(self) -> NoReturn:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                waited = now - self.probe_started
+                if waited < self.cooldown:
+                    raise CircuitOpenException(
+                        f"[{self.name}] circuit half open, waiting for the probe",
+                        retry_after=self.cooldown - waited,
+                    )
+                # the probe never reported back, let another one through
+                self.probe_started = now
+                return
+            remaining = self.open_until - now
+            if remaining <= 0:
+                self.state = self.HALF_OPEN
+                self.probe_started = now
+                return
+        raise CircuitOpenException(
+            f"[{self.name}] circuit open, retrying in [{remaining:.1f}] seconds",
+            retry_after=remaining,
+        )
+
+    def success(self) -> NoReturn:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probe_started = None
+
+    def failure(self, kind: str, retry_after: Optional[float] = None) -> NoReturn:
+        if kind == FATAL:
+            # the server answered, or the failure is ours
+            if self.state == self.HALF_OPEN:
+                self.success()
+            return
+        if kind == RETRY and self.state != self.HALF_OPEN:
+            return
+
+        self.failures += 1
+        hinted = kind == THROTTLED and retry_after is not None
+        if hinted or self.failures >= self.threshold or self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened += 1
+            self.probe_started = None
+            self.open_until = max(
+                self.open_until, self.clock() + max(self.cooldown, retry_after or 0)
+            )
+            logging_logger.warning(
+                f"[{self.name}] circuit opened for [{self.open_until - self.clock():.1f}] seconds "
+                f"after [{self.failures}] {kind} errors"
+            )
+
+
+class Endpoint:
+    def __init__(self, name: str) -> NoReturn:
+        self.name = name
+        self.breaker = CircuitBreaker(
+            name, Config.CIRCUIT_BREAKER_THRESHOLD, Config.CIRCUIT_BREAKER_COOLDOWN_SECONDS
+        )
+        self.budget = RetryBudget(Config.RETRY_BUDGET_PER_MINUTE)
+
+
+ENDPOINTS: Dict[str, Endpoint] = {}
+
+
+def get_endpoint(name: str) -> Endpoint:
+    if name not in ENDPOINTS:
+        ENDPOINTS[name] = Endpoint(name)
+    return ENDPOINTS[name]
+
+
+def _endpoint_name(endpoint: str, args: tuple) -> str:
+    # methods are tracked per broker, account and client role
+    broker = getattr(args[0], "brokerType", None) if args else None
+    if not broker:
+        return endpoint
+    account = getattr(args[0], "account", None)
+    role = getattr(args[0], "role", None)
+    name = f"{broker}[{account}]" if account else broker
+    if role:
+        name = f"{name}.{role}"
+    return f"{name}.{endpoint}"
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _next_delay(
+    endpoint: Endpoint,
+    e: BaseException,
+    attempt: int,
+    tries: int,
+    delay: float,
+    logger: Optional[logging.Logger],
+) -> Optional[float]:
+    """
+    Seconds to wait before the next attempt, None if e should be raised
+    """
+    kind, retry_after = classify(e)
+    endpoint.breaker.failure(kind, retry_after)
+
+    if kind == FATAL or attempt == tries:
+        return None
+    if endpoint.breaker.state == CircuitBreaker.OPEN:
+        return None
+    if not endpoint.budget.spend():
+        if logger is not None:
+            logger.warning(f"[{endpoint.name}] retry budget spent, not retrying {kind} error: {e!r}")
+        return None
+
+    wait = max(delay, retry_after or 0)
+    if logger is not None:
+        logger.warning(f"[{endpoint.name}] {kind} error: {e!r}, retrying x{attempt} in [{wait:.2f}] seconds")
+    return wait
+
+
+def _delays(delay: float, max_delay: Optional[float], backoff: float, jitter) -> Iterator[float]:
+    while True:
+        yield delay
+        delay *= backoff
+        delay += random.uniform(*jitter) if isinstance(jitter, tuple) else jitter
+        if max_delay is not None:
+            delay = min(delay, max_delay)
 
 
 def retry(
-    exceptions=Exception,
-    tries=-1,
-    delay=0,
-    max_delay=None,
-    backoff=1,
+    endpoint: str,
+    tries: int = 2,
+    delay: float = 0,
+    max_delay: Optional[float] = None,
+    backoff: float = 1,
     jitter=0,
-    logger=logging_logger,
+    logger: Optional[logging.Logger] = logging_logger,
 ):
-    """Returns a retry decorator.
+    """Returns a retry decorator for a sync or async callable.
 
-    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
-    :param tries: the maximum number of attempts. default: -1 (infinite).
+    Only RETRY, THROTTLED and SERVER_ERROR errors (see classify) are retried, within the
+    retry budget and circuit breaker of the endpoint.  Async callables back off with
+    asyncio.sleep.  Sync callables running on the event loop thread never block it for more
+    than RETRY_MAX_BLOCKING_SECONDS: a longer wait raises the error instead, and the next
+    iteration of the loop is the retry.
+
+    :param endpoint: name of the endpoint, tracked per broker when decorating a broker method.
+    :param tries: the maximum number of attempts. default: 2. -1 for no limit but the budget.
     :param delay: initial delay between attempts. default: 0.
     :param max_delay: the maximum value of delay. default: None (no limit).
     :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
     :param jitter: extra seconds added to delay between attempts. default: 0.
                    fixed if a number, random if a range tuple (min, max)
-    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
-                   default: retry.logging_logger. if None, logging is disabled.
+    :param logger: logger.warning is called on failed attempts. if None, logging is disabled.
     :returns: a retry decorator.
     """
 
-    @decorator
-    def retry_decorator(f, *fargs, **fkwargs):
-        args = fargs if fargs else list()
-        kwargs = fkwargs if fkwargs else dict()
-        return __retry_internal(
-            partial(f, *args, **kwargs),
-            exceptions,
-            tries,
-            delay,
-            max_delay,
-            backoff,
-            jitter,
-            logger,
-        )
+    def retry_decorator(f):
+        if asyncio.iscoroutinefunction(f):
+
+            @wraps(f)
+            async def async_wrapper(*args, **kwargs):
+                state = get_endpoint(_endpoint_name(endpoint, args))
+                delays = _delays(delay, max_delay, backoff, jitter)
+                attempt = 0
+                while True:
+                    attempt += 1
+                    state.breaker.before()
+                    try:
+                        result = await f(*args, **kwargs)
+                    except BaseException as e:
+                        wait = _next_delay(state, e, attempt, tries, next(delays), logger)
+                        if wait is None:
+                            raise
+                        await asyncio.sleep(wait)
+                    else:
+                        state.breaker.success()
+                        return result
+
+            return async_wrapper
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            state = get_endpoint(_endpoint_name(endpoint, args))
+            delays = _delays(delay, max_delay, backoff, jitter)
+            attempt = 0
+            while True:
+                attempt += 1
+                state.breaker.before()
+                try:
+                    result = f(*args, **kwargs)
+                except BaseException as e:
+                    wait = _next_delay(state, e, attempt, tries, next(delays), logger)
+                    if wait is None or (
+                        wait > Config.RETRY_MAX_BLOCKING_SECONDS and _in_event_loop()
+                    ):
+                        raise
+                    time.sleep(wait)
+                else:
+                    state.breaker.success()
+                    return result
+
+        return wrapper
 
     return retry_decorator
 
 
 def retry_call(
     f,
+    endpoint: str,
     fargs=None,
     fkwargs=None,
-    exceptions=Exception,
-    tries=-1,
-    delay=0,
-    max_delay=None,
-    backoff=1,
+    tries: int = 2,
+    delay: float = 0,
+    max_delay: Optional[float] = None,
+    backoff: float = 1,
     jitter=0,
-    logger=logging_logger,
+    logger: Optional[logging.Logger] = logging_logger,
 ):
     """
-    Calls a function and re-executes it if it failed.
+    Calls a function and re-executes it if it failed, see retry.
 
     :param f: the function to execute.
     :param fargs: the positional arguments of the function to execute.
     :param fkwargs: the named arguments of the function to execute.
-    :param exceptions: an exception or a tuple of exceptions to catch. default: Exception.
-    :param tries: the maximum number of attempts. default: -1 (infinite).
-    :param delay: initial delay between attempts. default: 0.
-    :param max_delay: the maximum value of delay. default: None (no limit).
-    :param backoff: multiplier applied to delay between attempts. default: 1 (no backoff).
-    :param jitter: extra seconds added to delay between attempts. default: 0.
-                   fixed if a number, random if a range tuple (min, max)
-    :param logger: logger.warning(fmt, error, delay) will be called on failed attempts.
-                   default: retry.logging_logger. if None, logging is disabled.
-    :returns: the result of the f function.
+    :returns: the result of the f function, or its coroutine if f is async.
     """
     args = fargs if fargs else list()
     kwargs = fkwargs if fkwargs else dict()
-    return __retry_internal(
-        partial(f, *args, **kwargs),
-        exceptions,
-        tries,
-        delay,
-        max_delay,
-        backoff,
-        jitter,
-        logger,
-    )
+    return retry(endpoint, tries, delay, max_delay, backoff, jitter, logger)(f)(*args, **kwargs)
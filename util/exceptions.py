@@ -68,3 +68,23 @@ class BrokerDownException(BaseException):
     def __init__(self, message):
         self.message = message
         super().__init__(self.message)
+
+
+class RateLimitExceededException(BaseException):
+    def __init__(self, message, retry_after=None):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class CircuitOpenException(BaseException):
+    def __init__(self, message, retry_after=None):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+
+class FleetProtocolException(BaseException):
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,160 @@
+import asyncio
+from datetime import datetime
+from typing import List, NoReturn, Optional
+
+from broker.cache import BrokerCache
+from broker.transport import HedgedSession
+from util import Config
+from util.metrics import Metrics
+
+PREFIX = "newcoinbot"
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+def _line(name: str, value: float, **labels) -> str:
+    if labels:
+        label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+        return f"{PREFIX}_{name}{{{label_str}}} {value}"
+    return f"{PREFIX}_{name} {value}"
+
+
+def _header(name: str, kind: str, description: str) -> List[str]:
+    return [
+        f"# HELP {PREFIX}_{name} {description}",
+        f"# TYPE {PREFIX}_{name} {kind}",
+    ]
+
+
+def render(bots: List) -> str:
+    """
+    Current state of the bots and the latency histograms in Prometheus text format.
+    Quantiles cover the samples since the last periodic report, _sum and _count never reset.
+    """
+    now = datetime.now()
+    lines = []
+
+    lines += _header("loops_total", "counter", "Main loop iterations")
+    lines.append(_line("loops_total", Config.total_iter))
+    lines += _header("frequency_seconds", "gauge", "Sleep between standard polls")
+    lines.append(_line("frequency_seconds", Config.FREQUENCY_SECONDS))
+    lines += _header("rate_limit", "gauge", "Request weight limit per minute")
+    lines.append(_line("rate_limit", Config.auto_rate_limit))
+
+    gauges = [
+        ("rate_weight", "Request weight used this minute, as last reported by the broker"),
+        ("seen_tickers", "Tickers seen since start"),
+        ("open_positions", "Open orders"),
+        ("unrealized_pnl", "Unrealized profit of open orders at the last seen prices"),
+        ("seconds_since_save", "Seconds since the state files were last written"),
+    ]
+    for name, description in gauges:
+        lines += _header(name, "gauge", description)
+        for bot in bots:
+            value = _bot_value(bot, name, now)
+            if value is not None:
+                labels = {"account": bot.account} if bot.account is not None else {}
+                lines.append(_line(name, value, broker=bot.broker.brokerType, **labels))
+
+    hedging = [
+        (bot.broker.brokerType, bot.broker.session)
+        for bot in bots
+        if isinstance(getattr(bot.broker, "session", None), HedgedSession)
+    ]
+    if hedging:
+        lines += _header("hedged_requests_total", "counter", "Hedgeable requests by outcome")
+        for broker, session in hedging:
+            lines.append(_line("hedged_requests_total", session.requests, broker=broker, outcome="sent"))
+            lines.append(_line("hedged_requests_total", session.hedged, broker=broker, outcome="hedged"))
+            lines.append(_line("hedged_requests_total", session.hedge_wins, broker=broker, outcome="hedge_won"))
+            lines.append(_line("hedged_requests_total", session.skipped, broker=broker, outcome="skipped"))
+
+    caching = [
+        (bot.broker.brokerType, bot.broker.cache)
+        for bot in bots
+        if isinstance(getattr(bot.broker, "cache", None), BrokerCache)
+    ]
+    if caching:
+        lines += _header("broker_cache_requests_total", "counter", "Coalesced broker requests by outcome")
+        for broker, cache in caching:
+            lines.append(_line("broker_cache_requests_total", cache.hits, broker=broker, outcome="hit"))
+            lines.append(_line("broker_cache_requests_total", cache.shared, broker=broker, outcome="shared"))
+            lines.append(_line("broker_cache_requests_total", cache.misses, broker=broker, outcome="fetched"))
+
+    lines += _header("stage_seconds", "summary", "Latency of each stage of the bot loop")
+    for broker in Metrics.brokers():
+        for stage in Metrics.stages(broker):
+            h = Metrics.histogram(broker, stage)
+            for q in QUANTILES:
+                lines.append(
+                    _line("stage_seconds", h.percentile(q * 100), broker=broker, stage=stage, quantile=q)
+                )
+            lines.append(_line("stage_seconds_sum", h.lifetime_total, broker=broker, stage=stage))
+            lines.append(_line("stage_seconds_count", h.lifetime_count, broker=broker, stage=stage))
+
+    return "\n".join(lines) + "\n"
+
+
+def _bot_value(bot, name: str, now: datetime) -> Optional[float]:
+    if name == "rate_weight":
+        return bot.rate_weight
+    elif name == "seen_tickers":
+        return len(bot.ticker_seen_dict)
+    elif name == "open_positions":
+        return len(bot.open_orders)
+    elif name == "unrealized_pnl":
+        return sum(
+            (bot.last_prices[key] - order.price) * order.size
+            for key, order in bot.open_orders.items()
+            if key in bot.last_prices
+        )
+    elif name == "seconds_since_save":
+        return None if bot.last_saved is None else (now - bot.last_saved).total_seconds()
+
+
+class MetricsServer:
+    """
+    Minimal HTTP server on the bot's event loop.  Only answers GET /metrics; each request is
+    rendered from in-memory state so it never waits on the brokers.
+    """
+
+    def __init__(self, bots: List, host: str = "127.0.0.1", port: int = 9108) -> NoReturn:
+        self.bots = bots
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> NoReturn:
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        Config.NOTIFICATION_SERVICE.info(
+            f"Serving metrics on http://{self.host}:{self.port}/metrics"
+        )
+
+    def close(self) -> NoReturn:
+        if self.server is not None:
+            self.server.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> NoReturn:
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # drain the headers, the body is never used
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", render(self.bots)
+            else:
+                status, body = "404 Not Found", "not found\n"
+
+            data = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,68 @@
+from datetime import datetime
+from pathlib import Path
+from time import time
+from typing import List, NoReturn, Optional, Set, Tuple
+
+from util import Config
+
+Event = Tuple[float, int, str, str, float, str]
+
+
+class FlightRecorder:
+    """
+    Fixed-size ring of the last events of a bot: (timestamp, iteration, event, symbol, value,
+    detail).  Recording is a tuple store into a preallocated list, so it can stay on for every
+    iteration and only be written out when something goes wrong.
+    """
+
+    def __init__(self, name: str, size: int = 4096, out_dir: Optional[Path] = None) -> NoReturn:
+        self.name = name
+        self.size = size
+        self.out_dir = out_dir or Config.ROOT_DIR.joinpath("logs")
+        self.iteration = 0
+        self._buffer: List[Optional[Event]] = [None] * size
+        self._next = 0
+        # (symbol, reason) pairs already dumped by dump_once
+        self._dumped: Set[Tuple[str, str]] = set()
+
+    def record(self, event: str, symbol: str = "", value: float = 0.0, detail: str = "") -> NoReturn:
+        self._buffer[self._next % self.size] = (time(), self.iteration, event, symbol, value, detail)
+        self._next += 1
+
+    def events(self) -> List[Event]:
+        """
+        Recorded events, oldest first
+        """
+        if self._next <= self.size:
+            return self._buffer[: self._next]
+        i = self._next % self.size
+        return self._buffer[i:] + self._buffer[:i]
+
+    def dump(self, reason: str = "ON_DEMAND") -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        now = datetime.now()
+        path = self.out_dir.joinpath(
+            f"flight_{self.name}_{now.strftime('%Y%m%d-%H%M%S-%f')}.log"
+        )
+        with open(path, "w") as f:
+            f.write(f"# {self.name} {reason} at {now} (iteration {self.iteration})\n")
+            for ts, iteration, event, symbol, value, detail in self.events():
+                f.write(
+                    f"{datetime.fromtimestamp(ts).isoformat(timespec='microseconds')}\t{iteration}\t"
+                    f"{event}\t{symbol}\t{value}\t{detail}\n"
+                )
+        Config.NOTIFICATION_SERVICE.get_service("VERBOSE_FILE").error(
+            f"[{self.name}]\tFlight recorder dumped to {path} ({reason})"
+        )
+        return path
+
+    def dump_once(self, reason: str, symbol: str, detail: str = "") -> Optional[Path]:
+        """
+        Dumps only the first time symbol fails for detail, so a failure retried on every
+        iteration (e.g. a sell below the minimum notional) leaves one dump instead of one per try
+        """
+        key = (symbol, detail)
+        if key in self._dumped:
+            return None
+        self._dumped.add(key)
+        return self.dump(reason)
@@ -0,0 +1,120 @@
+import gc
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, NoReturn, Optional, Tuple
+
+from util.metrics import Metrics
+
+
+class LatencyMode:
+    """
+    Keeps the cyclic GC off the hot path (LATENCY_MODE_ENABLED).  Everything loaded at startup
+    is frozen out of the collector, collections are made rarer, and while a hold is taken
+    (FRONTLOAD window, order submission) none run at all; the work is done in the quiet time
+    between polls instead.  GC pauses are recorded as the gc_pause stage either way.
+    """
+
+    enabled = False
+    deferred = 0
+
+    _holds = 0
+    _lock = threading.Lock()
+    _started: Dict[int, float] = {}
+    _saved_threshold: Optional[Tuple[int, int, int]] = None
+
+    @classmethod
+    def watch(cls) -> NoReturn:
+        if cls._callback not in gc.callbacks:
+            gc.callbacks.append(cls._callback)
+
+    @classmethod
+    def _callback(cls, phase: str, info: Dict) -> NoReturn:
+        if phase == "start":
+            cls._started[threading.get_ident()] = perf_counter()
+        else:
+            start = cls._started.pop(threading.get_ident(), None)
+            if start is not None:
+                Metrics.record("ALL", "gc_pause", perf_counter() - start)
+
+    @staticmethod
+    def _timed_collect() -> float:
+        start = perf_counter()
+        gc.collect()
+        return perf_counter() - start
+
+    @classmethod
+    def enable(cls, thresholds: List[int]) -> str:
+        """
+        Freezes the heap as it is now and raises the collection thresholds, returns the cost of
+        a full collection before and after
+        """
+        before = cls._timed_collect()
+        gc.freeze()
+        after = cls._timed_collect()
+        cls._saved_threshold = gc.get_threshold()
+        gc.set_threshold(*thresholds)
+        cls.watch()
+        cls.enabled = True
+        return (
+            f"GC: froze [{gc.get_freeze_count()}] objects, full collection [{before * 1000:.2f}] ms "
+            f"before, [{after * 1000:.2f}] ms after, thresholds {list(gc.get_threshold())}"
+        )
+
+    @classmethod
+    def disable(cls) -> NoReturn:
+        cls.enabled = False
+        with cls._lock:
+            cls._holds = 0
+        gc.enable()
+        gc.unfreeze()
+        if cls._saved_threshold is not None:
+            gc.set_threshold(*cls._saved_threshold)
+            cls._saved_threshold = None
+        if cls._callback in gc.callbacks:
+            gc.callbacks.remove(cls._callback)
+
+    @classmethod
+    @contextmanager
+    def hold(cls) -> Iterator[None]:
+        """
+        No collections until the outermost hold, of any thread, is released
+        """
+        if not cls.enabled:
+            yield
+            return
+        with cls._lock:
+            cls._holds += 1
+            gc.disable()
+        try:
+            yield
+        finally:
+            with cls._lock:
+                cls._holds = max(cls._holds - 1, 0)
+                if cls._holds == 0 and cls.enabled:
+                    gc.enable()
+
+    @classmethod
+    def collect(cls) -> bool:
+        """
+        Runs the collections put off by holds, meant for the quiet time between polls.  False
+        while a hold is taken.
+        """
+        if not cls.enabled:
+            return False
+        with cls._lock:
+            if cls._holds:
+                return False
+        cls.deferred += 1
+        gc.collect()
+        return True
+
+    @classmethod
+    def report(cls) -> str:
+        h = Metrics.histogram("ALL", "gc_pause")
+        counts = [s["collections"] for s in gc.get_stats()]
+        return (
+            f"GC: latency mode [{'on' if cls.enabled else 'off'}], collections per generation {counts}, "
+            f"[{cls.deferred}] in quiet periods, pause p99 [{h.percentile(99) * 1000:.2f}] ms "
+            f"max [{h.max * 1000:.2f}] ms"
+        )
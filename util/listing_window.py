@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, NoReturn, Optional, Tuple
+
+import numpy as np
+
+BINS = 60
+
+
+class ListingWindow:
+    """
+    Persistent histogram of the second of the minute at which new symbols went live.  A
+    listing is only known to have happened between the poll that did not see it and the poll
+    that did, so its weight is spread evenly over that interval.
+    """
+
+    def __init__(self, file: Optional[Path] = None) -> NoReturn:
+        self.file = file
+        self.counts = np.zeros(BINS)
+        self.listings = 0
+        if file is not None and file.exists():
+            with open(file, "r") as f:
+                data = json.load(f)
+            self.counts = np.array(data["counts"], dtype=float)
+            self.listings = data["listings"]
+
+    @classmethod
+    def combine(cls, windows: Iterable["ListingWindow"]) -> "ListingWindow":
+        combined = cls()
+        for w in windows:
+            combined.counts += w.counts
+            combined.listings += w.listings
+        return combined
+
+    def record(self, last_poll: Optional[datetime], observed: datetime, count: int = 1) -> bool:
+        """
+        False if the previous poll is unknown or over a minute old, which says nothing about
+        the offset
+        """
+        if last_poll is None:
+            return False
+        span = (observed - last_poll).total_seconds()
+        if span <= 0 or span >= BINS:
+            return False
+
+        start = last_poll.second + last_poll.microsecond / 1e6
+        edges = np.arange(int(start), int(start + span) + 1)
+        overlap = np.minimum(edges + 1, start + span) - np.maximum(edges, start)
+        np.add.at(self.counts, edges % BINS, count * overlap / span)
+        self.listings += count
+        return True
+
+    def window(self, coverage: float = 0.9) -> Optional[Tuple[int, int]]:
+        """
+        (first second, length) of the shortest run of seconds, wrapping around the minute,
+        that holds coverage of the recorded listings
+        """
+        total = self.counts.sum()
+        if total <= 0:
+            return None
+        # mass[length - 1][start] is the mass of the length seconds from start
+        wrapped = np.concatenate([self.counts, self.counts])
+        cumulative = np.concatenate([[0.0], np.cumsum(wrapped)])
+        starts = np.arange(BINS)
+        for length in range(1, BINS + 1):
+            mass = cumulative[starts + length] - cumulative[starts]
+            if mass.max() >= coverage * total - 1e-9:
+                return int(mass.argmax()), length
+        return 0, BINS
+
+    def density(self) -> List[float]:
+        """
+        Share of the busiest second for every second of the minute, smoothed over its neighbours
+        """
+        smoothed = (np.roll(self.counts, 1) + 2 * self.counts + np.roll(self.counts, -1)) / 4
+        peak = smoothed.max()
+        return (smoothed / peak).tolist() if peak > 0 else [1.0] * BINS
+
+    def save(self) -> NoReturn:
+        if self.file is None:
+            return
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.file, "w") as f:
+            json.dump({"listings": self.listings, "counts": self.counts.round(6).tolist()}, f)
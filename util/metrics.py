@@ -0,0 +1,149 @@
+import math
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, NoReturn, Tuple
+
+# order of the stages in Bot.run_async, used for reports
+STAGES = [
+    "loop",
+    "loop_lag",
+    "gc_pause",
+    "iteration",
+    "ticker_fetch",
+    "diff",
+    "price_fetch",
+    "exit_evaluation",
+    "order_placement",
+    "notification",
+    "save",
+]
+
+
+class Histogram:
+    """
+    Log-bucketed latency histogram with a fixed number of buckets, so memory does not grow
+    with the number of samples.  Each bucket is growth times wider than the previous one,
+    which bounds the relative error of a percentile to (growth - 1).
+    """
+
+    def __init__(
+        self, min_value: float = 1e-6, max_value: float = 120, growth: float = 1.05
+    ) -> NoReturn:
+        self.min_value = min_value
+        self._log_growth = math.log(growth)
+        self.growth = growth
+        self.buckets = int(math.log(max_value / min_value) / self._log_growth) + 2
+        self.counts = [0] * self.buckets
+        # never reset, for exporters that expect monotonic counters
+        self.lifetime_count = 0
+        self.lifetime_total = 0.0
+        self.reset()
+
+    def reset(self) -> NoReturn:
+        for i in range(self.buckets):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value: float) -> NoReturn:
+        if value <= self.min_value:
+            i = 0
+        else:
+            i = min(
+                int(math.log(value / self.min_value) / self._log_growth) + 1,
+                self.buckets - 1,
+            )
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.lifetime_count += 1
+        self.lifetime_total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper bound of the bucket holding the p-th percentile, capped at the max seen
+        """
+        if self.count == 0:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                if i == self.buckets - 1:
+                    # overflow bucket has no upper bound
+                    return self.max
+                return min(self.min_value * self.growth ** i, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "mean": self.mean,
+        }
+
+
+class Metrics:
+    """
+    Process-wide registry of stage latency histograms, keyed by (broker, stage)
+    """
+
+    histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    @classmethod
+    def histogram(cls, broker: str, stage: str) -> Histogram:
+        try:
+            return cls.histograms[(broker, stage)]
+        except KeyError:
+            h = cls.histograms[(broker, stage)] = Histogram()
+            return h
+
+    @classmethod
+    def record(cls, broker: str, stage: str, seconds: float) -> NoReturn:
+        cls.histogram(broker, stage).record(seconds)
+
+    @classmethod
+    @contextmanager
+    def time(cls, broker: str, stage: str) -> Iterator[None]:
+        h = cls.histogram(broker, stage)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            h.record(perf_counter() - start)
+
+    @classmethod
+    def brokers(cls) -> List[str]:
+        return sorted({broker for broker, _ in cls.histograms})
+
+    @classmethod
+    def stages(cls, broker: str) -> List[str]:
+        stages = [stage for b, stage in cls.histograms if b == broker]
+        return sorted(stages, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s))
+
+    @classmethod
+    def report(cls, broker: str, reset: bool = False) -> str:
+        lines = [
+            f"[{broker}] LATENCY (ms):\n\t{'stage':<16}{'count':>8}{'p50':>10}{'p99':>10}{'max':>10}"
+        ]
+        for stage in cls.stages(broker):
+            h = cls.histograms[(broker, stage)]
+            if h.count == 0:
+                continue
+            lines.append(
+                f"\t{stage:<16}{h.count:>8}{h.percentile(50) * 1000:>10.2f}"
+                f"{h.percentile(99) * 1000:>10.2f}{h.max * 1000:>10.2f}"
+            )
+            if reset:
+                h.reset()
+        return "\n".join(lines)
@@ -14,6 +14,54 @@ class Ticker(BaseModel):
     quote_ticker: str
 
 
+def _ms(start: Optional[datetime], end: Optional[datetime]) -> str:
+    if start is None or end is None:
+        return "?"
+    return f"{(end - start).total_seconds() * 1000:.0f}"
+
+
+class EntryTrace(BaseModel):
+    """
+    When each step of an entry happened.  filled is the fill time reported by the exchange,
+    None if the order response carries none.
+    """
+
+    observed: Optional[datetime] = None
+    decided: Optional[datetime] = None
+    sent: Optional[datetime] = None
+    acked: Optional[datetime] = None
+    filled: Optional[datetime] = None
+
+    def summary(self) -> str:
+        """
+        Stages that were not measured are left out, the total runs to the fill if it is known
+        and to the ack otherwise
+        """
+        stages = [
+            ("decide", self.observed, self.decided),
+            ("send", self.decided, self.sent),
+            ("ack", self.sent, self.acked),
+            ("fill", self.sent, self.filled),
+        ]
+        parts = ", ".join(
+            f"{name} {_ms(start, end)}" for name, start, end in stages if start is not None and end is not None
+        )
+        return f"{_ms(self.observed, self.filled or self.acked)} ms ({parts})"
+
+
+class ExitTrace(BaseModel):
+    triggered: Optional[datetime] = None
+    sent: Optional[datetime] = None
+    acked: Optional[datetime] = None
+
+    def summary(self) -> str:
+        return "{total} ms (send {send}, ack {ack})".format(
+            total=_ms(self.triggered, self.acked),
+            send=_ms(self.triggered, self.sent),
+            ack=_ms(self.sent, self.acked),
+        )
+
+
 class Order(BaseModel):
     broker: str
     ticker: Ticker
@@ -31,9 +79,13 @@ class Order(BaseModel):
     trailing_stop_loss_max: float
     trailing_stop_loss: float
 
+    entry_trace: Optional[EntryTrace] = None
+
 
 class Sold(Order):
     profit: float
     profit_percent: float
     reason: str
     sold_datetime: datetime
+
+    exit_trace: Optional[ExitTrace] = None
@@ -0,0 +1,116 @@
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from time import monotonic
+from typing import List, NoReturn, Optional
+
+from util import Config
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread (the event loop's by default) from a background thread and
+    writes the result in collapsed-stack format, one "frame;frame;frame count" line per unique
+    stack, which flamegraph.pl, speedscope and inferno read directly.  Frames under a Bot are
+    rooted at the bot's broker so each broker gets its own tower in the graph.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.005,
+        seconds: float = 30,
+        iterations: int = 0,
+        out_dir: Optional[Path] = None,
+        thread_id: Optional[int] = None,
+    ) -> NoReturn:
+        self.interval = interval
+        self.seconds = seconds
+        self.iterations = iterations
+        self.out_dir = out_dir or Config.ROOT_DIR.joinpath("logs")
+        self.thread_id = thread_id or threading.main_thread().ident
+
+        self.samples: Counter = Counter()
+        self.brokers: set = set()
+        self.last_file: Optional[Path] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._start_iter = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def trigger(self, *args) -> NoReturn:
+        """
+        Start a profile unless one is running.  Accepts the (signum, frame) of a signal handler.
+        """
+        if self.running:
+            return
+        self.samples = Counter()
+        self.brokers = set()
+        self._stop.clear()
+        self._start_iter = Config.total_iter
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        Config.NOTIFICATION_SERVICE.info(
+            "Profiling for [{}]".format(
+                f"{self.iterations} iterations" if self.iterations else f"{self.seconds} seconds"
+            )
+        )
+
+    def stop(self) -> Optional[Path]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.last_file
+
+    def _done(self, started: float) -> bool:
+        if self.iterations:
+            return Config.total_iter - self._start_iter >= self.iterations
+        return monotonic() - started >= self.seconds
+
+    def _run(self) -> NoReturn:
+        started = monotonic()
+        while not self._stop.wait(self.interval) and not self._done(started):
+            self.sample()
+        self.last_file = self.write()
+        Config.NOTIFICATION_SERVICE.info(f"Profile written to [{self.last_file}]")
+
+    def sample(self) -> NoReturn:
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+
+        stack: List[str] = []
+        broker = None
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+            if broker is None and code.co_filename.endswith("bot.py"):
+                bot = frame.f_locals.get("self")
+                broker = getattr(getattr(bot, "broker", None), "brokerType", None)
+            frame = frame.f_back
+
+        if broker is not None:
+            stack.append(broker)
+            self.brokers.add(broker)
+        stack.reverse()
+        self.samples[";".join(stack)] += 1
+
+    def write(self) -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        tag = "-".join(sorted(self.brokers)) or "ALL"
+        path = self.out_dir.joinpath(
+            "profile_{}_iter{}-{}_{}.folded".format(
+                tag,
+                self._start_iter,
+                Config.total_iter,
+                datetime.now().strftime("%Y%m%d-%H%M%S"),
+            )
+        )
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+from typing import Iterable, NoReturn
+
+from util import Config
+from util.listing_window import ListingWindow
+
+
+def in_frontload(current_time: datetime) -> bool:
+    """
+    True while inside the FRONTLOAD window, which may wrap around the start of a minute, and
+    enough weight is left to keep polling back to back
+    """
+    return (
+        current_time.second - Config.FRONTLOAD_START
+    ) % 60 <= Config.FRONTLOAD_DURATION and Config.auto_rate_current_weight < (
+        Config.auto_rate_limit * 0.9
+    )
+
+
+def seconds_until_frontload(current_time: datetime) -> float:
+    return (Config.FRONTLOAD_START - current_time.second) % 60 - current_time.microsecond / 1e6
+
+
+def frontload_gap(current_time: datetime) -> float:
+    """
+    Pause between FRONTLOAD polls.  Back to back where listings are most likely, up to
+    ADAPTIVE_FRONTLOAD_MAX_GAP seconds at the edges of the window.
+    """
+    if Config.frontload_density is None:
+        return 0
+    return Config.ADAPTIVE_FRONTLOAD_MAX_GAP * (
+        1 - Config.frontload_density[current_time.second]
+    )
+
+
+def adapt_frontload(windows: Iterable[ListingWindow]) -> NoReturn:
+    """
+    Moves the FRONTLOAD window onto the seconds that held ADAPTIVE_FRONTLOAD_COVERAGE of the
+    listings seen so far, once there are ADAPTIVE_FRONTLOAD_MIN_LISTINGS of them
+    """
+    if not Config.ADAPTIVE_FRONTLOAD_ENABLED:
+        return
+    combined = ListingWindow.combine(windows)
+    if (
+        combined.listings < Config.ADAPTIVE_FRONTLOAD_MIN_LISTINGS
+        or combined.listings == Config.frontload_listings
+    ):
+        return
+    Config.frontload_listings = combined.listings
+
+    # in_frontload also covers the second after the window, where the poll that detects a
+    # listing from its last second runs
+    start, length = combined.window(Config.ADAPTIVE_FRONTLOAD_COVERAGE)
+    if (start, length) != (Config.FRONTLOAD_START, Config.FRONTLOAD_DURATION):
+        Config.NOTIFICATION_SERVICE.info(
+            f"Moving FRONTLOAD window to [{start}] + [{length}] seconds from "
+            f"[{combined.listings}] listings"
+        )
+    Config.FRONTLOAD_START, Config.FRONTLOAD_DURATION = start, length
+    Config.frontload_density = combined.density()
+
+
+def relax_frequency(current_time: datetime) -> NoReturn:
+    """
+    Tracks the peak weight of each minute.  When a whole minute peaked under half of the
+    intervention threshold, undo one AUTO_INCREASE_AMOUNT step of a previous increase.
+    """
+    if Config.auto_rate_base_frequency is None:
+        Config.auto_rate_base_frequency = Config.FREQUENCY_SECONDS
+
+    minute = current_time.replace(second=0, microsecond=0)
+    if Config.auto_rate_minute is not None and minute != Config.auto_rate_minute:
+        quiet = (
+            Config.auto_rate_peak_weight
+            < Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100 / 2
+        )
+        if (
+            Config.AUTO_INCREASE_FREQUENCY
+            and quiet
+            and Config.FREQUENCY_SECONDS > Config.auto_rate_base_frequency
+        ):
+            Config.FREQUENCY_SECONDS = max(
+                Config.FREQUENCY_SECONDS - Config.AUTO_INCREASE_AMOUNT,
+                Config.auto_rate_base_frequency,
+            )
+            Config.NOTIFICATION_SERVICE.info(
+                f"Decreasing FREQUENCY to [{Config.FREQUENCY_SECONDS}] seconds"
+            )
+        Config.auto_rate_peak_weight = 0
+
+    Config.auto_rate_minute = minute
+    Config.auto_rate_peak_weight = max(
+        Config.auto_rate_peak_weight, Config.auto_rate_current_weight
+    )
+
+
+def exit_interval(ages: Iterable[float]) -> float:
+    """
+    Seconds until the next exit check, given the age in seconds of every open position.
+    EXIT_FAST_INTERVAL_MS while the youngest is under EXIT_FAST_SECONDS old, then doubling every
+    EXIT_DECAY_SECONDS up to EXIT_SLOW_INTERVAL_SECONDS.  Never so often that the price checks
+    take more than EXIT_RATE_SHARE_PERCENTAGE of the rate limit.
+    """
+    ages = list(ages)
+    slow = Config.EXIT_SLOW_INTERVAL_SECONDS
+    if not ages:
+        return slow
+
+    fast = Config.EXIT_FAST_INTERVAL_MS / 1000
+    past_fast = max(min(ages) - Config.EXIT_FAST_SECONDS, 0)
+    interval = min(fast * 2 ** (past_fast / Config.EXIT_DECAY_SECONDS), slow)
+
+    # one price request per position and check
+    checks_per_minute = Config.auto_rate_limit * Config.EXIT_RATE_SHARE_PERCENTAGE / 100 / len(ages)
+    return max(interval, 60 / max(checks_per_minute, 1e-9))
+
+
+def get_sleep_time(current_time: datetime) -> int:
+    relax_frequency(current_time)
+
+    if (
+        Config.auto_rate_current_weight
+        >= Config.auto_rate_limit * Config.RATE_INTERVENTION_PERCENTAGE / 100
+    ):
+        increase_time = True
+        minute = current_time.replace(second=0, microsecond=0)
+        if Config.auto_rate_current_weight >= Config.auto_rate_limit * 0.95:
+            resume_time = minute + timedelta(minutes=1)
+            Config.NOTIFICATION_SERVICE.info("Bot request count above [95%] of rate limit")
+
+            if current_time.minute != Config.auto_rate_increased_minute:
+                Config.auto_rate_increased_minute = current_time.minute
+                increase_time = True
+            else:
+                increase_time = False
+
+        else:
+            if Config.FRONTLOAD_ENABLED:
+                resume_time = minute.replace(
+                    second=Config.FRONTLOAD_START,
+                    microsecond=500000 if Config.FRONTLOAD_START else 0,
+                )
+                if resume_time <= current_time:
+                    resume_time += timedelta(minutes=1)
+            else:
+                resume_time = minute + timedelta(minutes=1)
+            Config.NOTIFICATION_SERVICE.info(f"Bot request count above [{Config.RATE_INTERVENTION_PERCENTAGE}%] of "
+                                             f"rate limit")
+
+        sleep_time = min(max((resume_time - current_time).seconds, 1), 59)
+
+        if Config.AUTO_INCREASE_FREQUENCY and increase_time:
+            Config.NOTIFICATION_SERVICE.info(
+                f"Increasing FREQUENCY from [{Config.FREQUENCY_SECONDS}] to "
+                f"[{Config.FREQUENCY_SECONDS + Config.AUTO_INCREASE_AMOUNT}] seconds"
+            )
+            Config.FREQUENCY_SECONDS += Config.AUTO_INCREASE_AMOUNT
+
+        Config.NOTIFICATION_SERVICE.info(
+            "Sleeping for [{}] seconds until [{}] to avoid exceeding rate limits\n".format(
+                sleep_time, resume_time
+            )
+        )
+    elif (Config.FRONTLOAD_START - current_time.second) % 60 < Config.FREQUENCY_SECONDS:
+        sleep_time = (Config.FRONTLOAD_START - current_time.second) % 60
+    else:
+        sleep_time = Config.FREQUENCY_SECONDS
+
+    Config.NOTIFICATION_SERVICE.debug("Sleeping for [{}] seconds\n".format(sleep_time))
+    return min(max(sleep_time, 1), 59)
@@ -18,6 +18,8 @@ class Util:
     FORMAT = "[%(levelname)s] %(asctime)s: %(message)s"
     VERBOSE_FORMAT = "%(asctime)s: %(message)s"
     DATE_FORMAT = None
+    # hash of what dump_json last wrote to each file
+    _written: Dict[str, int] = {}
 
     @staticmethod
     def setup_logging(name, level="INFO", fmt=FORMAT, verbose_fmt=VERBOSE_FORMAT):
@@ -108,8 +110,14 @@ class Util:
                 for key, value in obj.items():
                     res[key] = value.dict()
 
-            with open(file.absolute(), "w") as f:
-                json.dump(res, f, indent=4, default=json_serial)
+            text = json.dumps(res, indent=4, default=json_serial)
+            path = str(file.absolute())
+            # the state is saved every iteration but rarely changes, only rewrite it when it does
+            if Util._written.get(path) == hash(text) and file.exists():
+                return
+            with open(path, "w") as f:
+                f.write(text)
+            Util._written[path] = hash(text)
 
     @staticmethod
     def percent_change(value: float, percent: float) -> float:
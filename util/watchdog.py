@@ -0,0 +1,97 @@
+import asyncio
+import sys
+import threading
+import traceback
+from pathlib import Path
+from time import monotonic
+from typing import List, NoReturn, Optional, Tuple
+
+from util import Config
+from util.metrics import Metrics
+
+
+class LoopWatchdog:
+    """
+    Measures event loop scheduling lag with a heartbeat task.  A sidecar thread watches the
+    heartbeat and, when the loop has not come back for threshold seconds, grabs the loop
+    thread's stack so the blocking call can be named while it is still blocking.
+    """
+
+    def __init__(self, threshold: float = 1.0, interval: float = 0.1) -> NoReturn:
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: List[Tuple[float, str]] = []
+
+        self._beat = monotonic()
+        self._loop_thread: Optional[int] = None
+        self._reported = False
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> NoReturn:
+        """
+        Must be called from the thread running the event loop
+        """
+        self._loop_thread = threading.get_ident()
+        self._beat = monotonic()
+        self._task = asyncio.get_event_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> NoReturn:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    async def _heartbeat(self) -> NoReturn:
+        while True:
+            expected = monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = monotonic()
+            lag = max(now - expected, 0.0)
+            self._beat = now
+            Metrics.record("ALL", "loop_lag", lag)
+            if self._reported:
+                self._reported = False
+                Config.NOTIFICATION_SERVICE.warning(
+                    f"Event loop was blocked for [{round(lag, 3)}] seconds"
+                )
+
+    def _watch(self) -> NoReturn:
+        while not self._stop.wait(self.interval):
+            blocked = monotonic() - self._beat - self.interval
+            if blocked > self.threshold and not self._reported:
+                self._reported = True
+                stack = self.capture()
+                if stack is None:
+                    continue
+                culprit = self.culprit(stack)
+                self.stalls.append((blocked, culprit))
+                Config.NOTIFICATION_SERVICE.warning(
+                    f"Event loop blocked for more than [{round(blocked, 3)}] seconds in [{culprit}]:\n"
+                    + "".join(traceback.format_list(stack))
+                )
+
+    def capture(self) -> Optional[traceback.StackSummary]:
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        return traceback.extract_stack(frame)
+
+    @staticmethod
+    def culprit(stack: traceback.StackSummary) -> str:
+        """
+        Innermost frame of the bot's own code, with the frame it was calling into if any
+        """
+        root = str(Config.ROOT_DIR)
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i].filename.startswith(root) and "site-packages" not in stack[i].filename:
+                name = f"{Path(stack[i].filename).relative_to(root)}:{stack[i].name}"
+                if i < len(stack) - 1:
+                    name += f" -> {stack[-1].name}"
+                return name
+        return stack[-1].name